@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from activities import overviews
+
+
+class Command(BaseCommand):
+    help = 'Recompute the progress overview of every user from their activities'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(written):
+            self.stdout.write(f'{written} overviews written ({time.perf_counter() - started:.1f}s)')
+
+        written = overviews.rebuild(progress)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} overviews in {time.perf_counter() - started:.1f}s'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:40
+
+from django.db import migrations
+
+
+def clear_overviews(apps, schema_editor):
+    # Rows were only written by seed_data, possibly several per user: fill_overviews() writes them again
+    UserOverview = apps.get_model('activities', 'UserOverview')
+    UserOverview.user_activities.through.objects.all()._raw_delete(schema_editor.connection.alias)
+    UserOverview.objects.all()._raw_delete(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # Apart from the schema changes of 0011: on PostgreSQL the deleted rows leave deferred
+    # foreign key checks pending until the commit, and ALTER TABLE refuses to run before it
+
+    dependencies = [
+        ('activities', '0009_alter_testhistory_lesson_alter_testhistory_student'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_overviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0010_clear_useroverviews'),
+        ('modules', '0010_module_deleted_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='useroverview',
+            name='user_activities',
+        ),
+        migrations.AddField(
+            model_name='useroverview',
+            name='average_progress',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useroverview',
+            name='completed_modules_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useroverview',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useroverview',
+            name='modules_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='useroverview',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='useroverview',
+            name='last_module_learned_id',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='modules.module'),
+        ),
+        migrations.AlterField(
+            model_name='useroverview',
+            name='user_id',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='overview', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
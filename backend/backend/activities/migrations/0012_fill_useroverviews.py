@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:40
+
+from django.db import migrations
+from django.db.models import Avg, Count, Max, OuterRef, Q, Subquery
+
+
+def fill_overviews(apps, schema_editor):
+    # One row per user with activities, as activities.overviews.refresh() computes it
+    Activity = apps.get_model('activities', 'Activity')
+    UserOverview = apps.get_model('activities', 'UserOverview')
+    last_module = Activity.objects.filter(student_id=OuterRef('student_id')).order_by('-date_updated', '-id').values('modules_id')[:1]
+    rows = Activity.objects.values('student_id').annotate(
+        modules_count=Count('id'),
+        completed_modules_count=Count('id', filter=Q(progress=100)),
+        average_progress=Avg('progress'),
+        last_activity_at=Max('date_updated'),
+        last_module=Subquery(last_module),
+    ).order_by('student_id')
+    UserOverview.objects.bulk_create([
+        UserOverview(
+            user_id_id=row['student_id'],
+            last_module_learned_id_id=row['last_module'],
+            modules_count=row['modules_count'],
+            completed_modules_count=row['completed_modules_count'],
+            average_progress=round(row['average_progress'], 1),
+            last_activity_at=row['last_activity_at'],
+        )
+        for row in rows.iterator(chunk_size=2000)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0011_useroverview_projection'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_overviews, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from users.models import User
 from modules.models import Module, Lesson
 
@@ -8,15 +8,31 @@ class Activity(models.Model):
     modules_id = models.ForeignKey(Module, on_delete=models.CASCADE)
     progress = models.IntegerField(default=0)
     date_created = models.DateTimeField(auto_now_add=True, editable=False)
-    date_updated = models.DateTimeField(auto_now_add=True, editable=False)
+    # Time of the last progress, which makes the module the user's last one
+    date_updated = models.DateTimeField(auto_now=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        from . import overviews
+
+        # The overview changes with the activity or not at all
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Activity, instance=self)):
+            super().save(*args, **kwargs)
+            overviews.refresh([self.student_id_id], using=self._state.db)
 
 
 class UserOverview(models.Model):
-    user_id = models.ForeignKey(User, on_delete=models.CASCADE)
-    last_module_learned_id = models.ForeignKey(Module, on_delete=models.CASCADE)
-    user_activities = models.ManyToManyField(Activity)
+    """
+    Progress summary of a user, maintained from their activities by
+    activities.overviews, so reading it needs no aggregation
+    """
+    user_id = models.OneToOneField(User, on_delete=models.CASCADE, related_name='overview')
+    last_module_learned_id = models.ForeignKey(Module, on_delete=models.SET_NULL, null=True, blank=True)
+    modules_count = models.PositiveIntegerField(default=0)
+    completed_modules_count = models.PositiveIntegerField(default=0)
+    average_progress = models.FloatField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True, editable=False)
-    date_updated = models.DateTimeField(auto_now_add=True, editable=False)
+    date_updated = models.DateTimeField(auto_now=True, editable=False)
 
 
 class TestHistory(models.Model):
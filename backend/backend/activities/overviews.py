@@ -0,0 +1,97 @@
+"""
+Maintenance of UserOverview, the progress summary of each user.
+
+An overview holds what would otherwise be aggregated from the user's
+activities on every read: the modules they started and completed, their
+average progress and the module they worked on last. It is recomputed for
+the users whose activities change, in the transaction of the change:
+
+- Activity.save() refreshes the user's overview, creating it on their first
+  progress;
+- deleting activities refreshes the existing overviews (activities/signals.py
+  for Model.delete(), backend.purge for chunked deletes);
+- bulk writes, which bypass both, call refresh() themselves (seed_data).
+
+rebuild() recomputes the overview of every user, see the rebuild_overviews
+command. Each refresh reads the activities of its users from the database
+it writes to, never from a replica that may lag behind.
+"""
+from django.db import router
+from django.db.models import Avg, Count, Max, OuterRef, Q, Subquery
+from users.models import User
+from .models import Activity, UserOverview
+
+CHUNK_SIZE = 2000
+FIELDS = ('last_module_learned_id', 'modules_count', 'completed_modules_count', 'average_progress', 'last_activity_at', 'date_updated')
+
+
+def summaries(user_ids, using):
+    """Unsaved overviews of user_ids, aggregated from their activities in one query"""
+    last_module = Activity.objects.filter(student_id=OuterRef('student_id')).order_by('-date_updated', '-id').values('modules_id')[:1]
+    rows = Activity.objects.using(using).filter(student_id__in=user_ids).values('student_id').annotate(
+        modules_count=Count('id'),
+        completed_modules_count=Count('id', filter=Q(progress=100)),
+        average_progress=Avg('progress'),
+        last_activity_at=Max('date_updated'),
+        last_module=Subquery(last_module),
+    ).order_by()
+    totals = {row['student_id']: row for row in rows}
+    # Users without activities get an empty overview
+    empty = {'last_module': None, 'modules_count': 0, 'completed_modules_count': 0, 'average_progress': 0, 'last_activity_at': None}
+    return [
+        UserOverview(
+            user_id_id=user_id,
+            last_module_learned_id_id=row['last_module'],
+            modules_count=row['modules_count'],
+            completed_modules_count=row['completed_modules_count'],
+            average_progress=round(row['average_progress'], 1),
+            last_activity_at=row['last_activity_at'],
+        )
+        for user_id, row in ((user_id, totals.get(user_id, empty)) for user_id in user_ids)
+    ]
+
+
+def _write(user_ids, using):
+    overviews = summaries(user_ids, using)
+    # One upsert per chunk, the date_created of existing rows is kept
+    UserOverview.objects.using(using).bulk_create(
+        overviews, update_conflicts=True, unique_fields=['user_id'], update_fields=list(FIELDS)
+    )
+    return len(overviews)
+
+
+def refresh(user_ids, create=True, using=None):
+    """
+    Recompute the overviews of user_ids, CHUNK_SIZE users per query. Without
+    create only existing overviews are updated: a user deleted together with
+    their activities must not get a new one. Returns how many were written.
+    """
+    using = using or router.db_for_write(UserOverview)
+    user_ids = sorted(set(user_ids))
+    written = 0
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = user_ids[start:start + CHUNK_SIZE]
+        if not create:
+            chunk = list(UserOverview.objects.using(using).filter(user_id__in=chunk).values_list('user_id', flat=True))
+        if chunk:
+            written += _write(chunk, using)
+    return written
+
+
+def rebuild(progress=None):
+    """
+    Recompute the overview of every user, CHUNK_SIZE users at a time in id
+    order. progress(written) is called after every chunk. Returns how many
+    were written.
+    """
+    using = router.db_for_write(UserOverview)
+    written = 0
+    last_id = 0
+    while True:
+        ids = list(User._base_manager.using(using).filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return written
+        written += _write(ids, using)
+        last_id = ids[-1]
+        if progress:
+            progress(written)
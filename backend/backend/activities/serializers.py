@@ -16,7 +16,10 @@ class ActivitySerializer(ModelSerializer):
 class UserOverviewSerializer(ModelSerializer):
     class Meta:
         model = UserOverview
-        fields = ['id', 'user_id', 'user_activities', 'last_module_learned_id']
+        fields = [
+            'id', 'user_id', 'last_module_learned_id', 'modules_count', 'completed_modules_count', 'average_progress',
+            'last_activity_at', 'date_updated'
+        ]
 
 
 class TestHistorySerializer(ModelSerializer):
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from . import overviews
+from .models import Activity
+
+
+@receiver(post_delete, sender=Activity)
+def refresh_overview(sender, instance, using, **kwargs):
+    """
+    Saves refresh the overview in Activity.save(); deletes run in the
+    collector's transaction, which this joins
+    """
+    overviews.refresh([instance.student_id_id], create=False, using=using)
@@ -1,3 +1,64 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from rest_framework_simplejwt.tokens import RefreshToken
+from activities.models import Activity, UserOverview
+from modules.models import Module
+from users.models import User
+from backend.testing import SeededTestCase
 
-# Create your tests here.
+
+class UserOverviewTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = User.objects.get(username='student_alice')
+        self.token = RefreshToken.for_user(self.student).access_token
+
+    def post(self, url):
+        return self.client.post(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def assertOverviewMatchesActivities(self, user):
+        activities = Activity.objects.filter(student_id=user)
+        overview = UserOverview.objects.get(user_id=user)
+        self.assertEqual(overview.modules_count, activities.count())
+        self.assertEqual(overview.completed_modules_count, activities.filter(progress=100).count())
+        self.assertEqual(overview.last_module_learned_id_id, activities.order_by('-date_updated', '-id').first().modules_id_id)
+        return overview
+
+    def test_progress_updates_the_overview_in_the_same_transaction(self):
+        module = Module.objects.filter(activity__student_id=self.student).first()
+        Activity.objects.filter(student_id=self.student, modules_id=module).delete()
+        lesson = module.lessons.order_by('order').first()
+        response = self.post(f'/api/student/modules/{module.id}/lessons/{lesson.id}/progress')
+        self.assertEqual(response.status_code, 200)
+        overview = self.assertOverviewMatchesActivities(self.student)
+        self.assertEqual(overview.last_module_learned_id_id, module.id)
+
+        # A failed refresh takes the progress back with it
+        exam = module.lessons.filter(lesson_type='exam').first()
+        with mock.patch('activities.overviews.refresh', side_effect=RuntimeError):
+            response = self.client.post(
+                f'/api/exam/{exam.id}/submit', {'answers': {}}, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertLess(Activity.objects.get(student_id=self.student, modules_id=module).progress, 100)
+
+    def test_deleted_activities_leave_the_overview(self):
+        activity = Activity.objects.filter(student_id=self.student).first()
+        response = self.client.delete(f'/api/activities/{activity.id}/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 204)
+        self.assertOverviewMatchesActivities(self.student)
+
+    def test_rebuild_writes_one_overview_per_user(self):
+        UserOverview.objects.update(modules_count=0, last_module_learned_id=None)
+        call_command('rebuild_overviews', stdout=StringIO())
+        self.assertEqual(UserOverview.objects.count(), User.objects.count())
+        self.assertOverviewMatchesActivities(self.student)
+        teacher = User.objects.get(username='teacher_john')
+        self.assertEqual(UserOverview.objects.get(user_id=teacher).modules_count, 0)
+
+    def test_overviews_are_read_in_one_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/overviews/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('user_activities', response.json()[0])
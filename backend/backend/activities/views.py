@@ -2,7 +2,7 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from django.db.models import Count, Avg
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
@@ -17,18 +17,21 @@ from .serializers import (
     UserOverviewSerializer
 )
 from modules.models import Module, Lesson
+from backend import metrics
 
 # Create your views here.
 
 
 class ActivityView(ModelViewSet):
-    queryset = Activity.objects.all()
+    # Activities of soft deleted modules are left for backend.purge
+    queryset = Activity.objects.filter(modules_id__deleted_at=None)
     serializer_class = ActivitySerializer
     permission_classes = [IsAuthenticated]
 
 
-class UserOverviewView(ModelViewSet):
-    queryset = UserOverview.objects.all()
+class UserOverviewView(ReadOnlyModelViewSet):
+    """Read only: the rows are maintained from the activities (see activities.overviews)"""
+    queryset = UserOverview.objects.order_by('id')
     serializer_class = UserOverviewSerializer
     permission_classes = [IsAuthenticated]
 
@@ -43,35 +46,38 @@ def student_stats(request):
     user = request.user
     
     # Get all student's activities
-    activities = Activity.objects.filter(student_id=user)
+    activities = Activity.objects.filter(student_id=user, modules_id__deleted_at=None)
     
-    # Get active modules (progress < 100)
-    active_modules_count = activities.filter(progress__lt=100).count()
+    # Same activities with their module and its lesson count loaded in the same query
+    activities_with_modules = activities.select_related('modules_id').annotate(
+        module_lessons_count=Count('modules_id__lessons')
+    )
     
-    # Get completed modules count
-    completed_modules_count = activities.filter(progress=100).count()
-    
-    # Get last module learned (most recently updated activity)
-    last_activity = activities.order_by('-date_updated').first()
-    last_module_data = None
-    if last_activity:
-        last_module = last_activity.modules_id
-        last_module_data = {
-            'id': last_module.id,
-            'title': last_module.title,
-            'description': last_module.description,
-            'cover_image': last_module.cover_image,
-            'progress': last_activity.progress,
-            'lessons_count': last_module.lessons.count()
-        }
+    # Module counts and last module learned, kept up to date by activities.overviews
+    overview = UserOverview.objects.filter(user_id=user).first()
+    completed_modules_count = overview.completed_modules_count if overview else 0
+    active_modules_count = overview.modules_count - completed_modules_count if overview else 0
+    last_module_id = overview.last_module_learned_id_id if overview else None
     
     # Get total lessons completed (approximation based on progress)
     total_lessons = 0
     lessons_completed = 0
-    for activity in activities:
-        module_lessons_count = activity.modules_id.lessons.count()
+    last_module_data = None
+    for activity in activities_with_modules:
+        module_lessons_count = activity.module_lessons_count
         total_lessons += module_lessons_count
         lessons_completed += int((activity.progress / 100) * module_lessons_count)
+        if activity.modules_id_id == last_module_id:
+            last_module = activity.modules_id
+            last_module_data = {
+                'id': last_module.id,
+                'title': last_module.title,
+                'description': last_module.description,
+                'cover_image': last_module.cover_image,
+                'cover_image_srcset': last_module.cover_image_srcset,
+                'progress': activity.progress,
+                'lessons_count': module_lessons_count
+            }
     
     # Get monthly activity for last 6 months
     six_months_ago = timezone.now() - timedelta(days=180)
@@ -116,7 +122,9 @@ def get_exam_history(request):
     user = request.user
     
     # Get all test histories for this student
-    test_histories = TestHistory.objects.filter(student=user).select_related('lesson', 'lesson__module_id')
+    test_histories = TestHistory.objects.filter(student=user).exclude(
+        lesson__module_id__deleted_at__isnull=False
+    ).select_related('lesson', 'lesson__module_id')
     
     # Format the response
     history_data = []
@@ -150,7 +158,7 @@ def update_lesson_progress(request, module_id, lesson_id):
     """
     try:
         # Get the lesson and module
-        lesson = Lesson.objects.get(id=lesson_id, module_id=module_id)
+        lesson = Lesson.objects.visible().get(id=lesson_id, module_id=module_id)
         module = Module.objects.get(id=module_id)
         
         # Get all lessons in the module to calculate progress
@@ -179,6 +187,9 @@ def update_lesson_progress(request, module_id, lesson_id):
         if not created and activity.progress < progress:
             activity.progress = progress
             activity.save()
+            metrics.progress_updates_total.inc(result='advanced')
+        else:
+            metrics.progress_updates_total.inc(result='created' if created else 'unchanged')
         
         return Response({
             'success': True,
@@ -216,7 +227,7 @@ def submit_exam_answers(request, lesson_id):
     """
     try:
         # Get the lesson (exam)
-        lesson = Lesson.objects.get(id=lesson_id, lesson_type='exam')
+        lesson = Lesson.objects.visible().select_related('lesson_content').get(id=lesson_id, lesson_type='exam')
         
         # Get answers from request
         answers = request.data.get('answers', {})
@@ -287,6 +298,7 @@ def submit_exam_answers(request, lesson_id):
                 progress=100
             )
         
+        metrics.exam_submissions_total.inc(result='submitted')
         return Response({
             'success': True,
             'message': 'Exam answers submitted successfully',
@@ -296,11 +308,13 @@ def submit_exam_answers(request, lesson_id):
         }, status=status.HTTP_200_OK)
         
     except Lesson.DoesNotExist:
+        metrics.exam_submissions_total.inc(result='not_found')
         return Response({
             'success': False,
             'error': 'Exam not found'
         }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
+        metrics.exam_submissions_total.inc(result='error')
         return Response({
             'success': False,
             'error': str(e)
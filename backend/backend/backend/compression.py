@@ -0,0 +1,59 @@
+"""
+gzip and brotli encoding of response bodies.
+
+brotli is optional: without the Brotli package only gzip is offered.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+# Quick levels for responses compressed per request, best levels for payloads compressed once and cached
+GZIP_LEVEL = 6
+GZIP_BEST_LEVEL = 9
+BROTLI_QUALITY = 5
+BROTLI_BEST_QUALITY = 11
+
+
+def available_encodings():
+    """Encodings this server can produce, preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """Map every coding of an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(request):
+    """Best encoding accepted by the client, None when it only accepts identity"""
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_BEST_QUALITY if best else BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_BEST_LEVEL if best else GZIP_LEVEL, mtime=0)
@@ -0,0 +1,62 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Per-request routing state, set by ReplicaRoutingMiddleware.
+# Outside of a request (shell, management commands) every query goes to the primary.
+_replica_allowed = ContextVar('replica_allowed', default=False)
+_has_written = ContextVar('has_written', default=False)
+
+
+def begin_request(replica_allowed):
+    """Reset routing state at the start of a request"""
+    _replica_allowed.set(replica_allowed)
+    _has_written.set(False)
+
+
+def end_request():
+    """Clear routing state and report whether the request wrote to the primary"""
+    wrote = _has_written.get()
+    _replica_allowed.set(False)
+    _has_written.set(False)
+    return wrote
+
+
+def pin_to_primary():
+    """Send every remaining read of the current request to the primary"""
+    _replica_allowed.set(False)
+
+
+class ReplicaRouter:
+    """
+    Route reads to a read replica and writes to the primary (`default`).
+
+    Reads only go to a replica when the current request allows it, the request
+    has not written anything yet and no transaction is open on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not _replica_allowed.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Read your own writes for the rest of the request
+        _replica_allowed.set(False)
+        _has_written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,28 @@
+import json
+from django.http import HttpResponse
+from rest_framework.views import exception_handler as drf_exception_handler
+
+
+# Every 401 of the API has the same body, encoded once
+AUTHENTICATION_REQUIRED = json.dumps({
+    'error': 'Authentication required',
+    'code': 'authentication_required',
+    'message': 'Token is invalid or expired',
+    'redirect': '/login'
+}).encode('utf-8')
+
+
+def exception_handler(exc, context):
+    """
+    DRF exception handler returning the canonical authentication error for
+    every 401 (missing, invalid or expired token, wrong token credentials).
+    The headers of the original response, WWW-Authenticate first of all, are kept.
+    """
+    response = drf_exception_handler(exc, context)
+    if response is not None and response.status_code == 401:
+        canonical = HttpResponse(AUTHENTICATION_REQUIRED, content_type='application/json', status=401)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                canonical[header] = value
+        return canonical
+    return response
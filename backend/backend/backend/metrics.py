@@ -0,0 +1,266 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Every process adds to its own values. When METRICS_DIR is set (use one shared
+directory for all gunicorn workers, emptied when the master starts) the values
+live in a memory-mapped file per process, and the exposition sums the files of
+all processes. Without METRICS_DIR the values are kept in memory.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from django.conf import settings
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, math.inf)
+
+_INITIAL_FILE_SIZE = 1024 * 1024
+
+
+def _read_values(data):
+    """Yield (key, value) pairs from the bytes of a metrics file"""
+    used = struct.unpack_from('i', data, 0)[0]
+    position = 8
+    while position < used:
+        key_length = struct.unpack_from('i', data, position)[0]
+        key = data[position + 4:position + 4 + key_length].decode('utf-8')
+        position += 4 + key_length
+        position += (8 - position % 8) % 8
+        yield key, struct.unpack_from('d', data, position)[0]
+        position += 8
+
+
+class MmapedValues:
+    """
+    Float values stored in a memory-mapped file.
+
+    Layout: the number of used bytes, then entries of key length, key padded to
+    8 bytes and the double value. Readers only read up to the used bytes, so
+    other processes never see a half written entry.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+            size = _INITIAL_FILE_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions = {}
+        self._used = struct.unpack_from('i', self._map, 0)[0]
+        if self._used == 0:
+            self._used = 8
+            struct.pack_into('i', self._map, 0, self._used)
+        else:
+            position = 8
+            for key, _ in _read_values(self._map):
+                position += 4 + len(key.encode('utf-8'))
+                position += (8 - position % 8) % 8
+                self._positions[key] = position
+                position += 8
+
+    def _add_key(self, key):
+        encoded = key.encode('utf-8')
+        padding = (8 - (4 + len(encoded)) % 8) % 8
+        entry = struct.pack(f'i{len(encoded) + padding}sd', len(encoded), encoded + b' ' * padding, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        self._positions[key] = self._used + len(entry) - 8
+        self._used += len(entry)
+        struct.pack_into('i', self._map, 0, self._used)
+
+    def add(self, key, amount):
+        if key not in self._positions:
+            self._add_key(key)
+        position = self._positions[key]
+        struct.pack_into('d', self._map, position, struct.unpack_from('d', self._map, position)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class MetricsStore:
+    """Values of the current process, reopened after a fork so workers never share a file"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._values = None
+
+    def _process_values(self):
+        if self._pid != os.getpid():
+            directory = getattr(settings, 'METRICS_DIR', None)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                self._values = MmapedValues(os.path.join(directory, f'metrics_{os.getpid()}.db'))
+            else:
+                self._values = {}
+            self._pid = os.getpid()
+        return self._values
+
+    def add(self, key, amount):
+        with self._lock:
+            values = self._process_values()
+            if isinstance(values, dict):
+                values[key] = values.get(key, 0.0) + amount
+            else:
+                values.add(key, amount)
+
+    def collect(self):
+        """Sum the values of every process"""
+        with self._lock:
+            values = self._process_values()
+            if isinstance(values, dict):
+                return dict(values)
+
+        totals = {}
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics_*.db')):
+            with open(path, 'rb') as metrics_file:
+                for key, value in _read_values(metrics_file.read()):
+                    totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+store = MetricsStore()
+REGISTRY = {}
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def _key(self, sample, labels):
+        """Storage key of a sample, cached because building it costs more than the update"""
+        cache_key = (sample, tuple(labels.items()))
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = json.dumps([self.name, sample, sorted(labels.items())])
+            self._keys[cache_key] = key
+        return key
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        store.add(self._key(self.name, labels), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        # Buckets are stored as plain counts and made cumulative when exposed
+        for bound in self.buckets:
+            if value <= bound:
+                store.add(self._key(f'{self.name}_bucket', {**labels, 'le': bound}), 1)
+                break
+        store.add(self._key(f'{self.name}_sum', labels), value)
+        store.add(self._key(f'{self.name}_count', labels), 1)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def generate_latest():
+    """Render every metric in the Prometheus text format"""
+    samples = {}
+    for key, value in store.collect().items():
+        name, sample, labels = json.loads(key)
+        samples.setdefault(name, []).append((sample, labels, value))
+
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        metric_samples = samples.get(name, [])
+
+        if metric.type == 'counter':
+            for _, labels, value in sorted(metric_samples, key=lambda s: s[1]):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+
+        series = {}
+        for sample, labels, value in metric_samples:
+            le = next((v for k, v in labels if k == 'le'), None)
+            series_labels = tuple((k, v) for k, v in labels if k != 'le')
+            entry = series.setdefault(series_labels, {'buckets': {}, 'sum': 0.0})
+            if sample.endswith('_bucket'):
+                entry['buckets'][le] = value
+            elif sample.endswith('_sum'):
+                entry['sum'] = value
+        for series_labels, entry in sorted(series.items()):
+            cumulative = 0.0
+            for bound in metric.buckets:
+                cumulative += entry['buckets'].get(bound, 0.0)
+                bucket_labels = [*series_labels, ('le', _format_value(bound))]
+                lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}')
+            lines.append(f'{name}_sum{_format_labels(series_labels)} {_format_value(entry["sum"])}')
+            lines.append(f'{name}_count{_format_labels(series_labels)} {_format_value(cumulative)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics
+
+http_requests_total = Counter(
+    'http_requests_total', 'HTTP requests by URL name, method and status code', ['view', 'method', 'status']
+)
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds', 'HTTP request duration by URL name', ['view']
+)
+db_query_duration_seconds = Histogram(
+    'db_query_duration_seconds', 'Database query duration by URL name', ['view'], buckets=DB_BUCKETS
+)
+progress_updates_total = Counter(
+    'progress_updates_total', 'Lesson progress updates by result', ['result']
+)
+exam_submissions_total = Counter(
+    'exam_submissions_total', 'Exam submissions by result', ['result']
+)
+login_attempts_total = Counter(
+    'login_attempts_total', 'Login attempts by result', ['result']
+)
+cache_requests_total = Counter(
+    'cache_requests_total', 'Cache lookups by cache name and result', ['cache', 'result']
+)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup of the named cache"""
+    cache_requests_total.inc(cache=cache, result='hit' if hit else 'miss')
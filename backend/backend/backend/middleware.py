@@ -1,30 +1,162 @@
-from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import AccessToken
-from django.http import HttpResponse
-import json
+from django.conf import settings
+from . import compression
+from . import db_router
+from . import metrics
+from . import profiling
+from contextlib import ExitStack
+from math import ceil
+from time import perf_counter, time
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+import random
 
 
-class JWTAuthenticationMiddleware(MiddlewareMixin):
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
     """
-    Middleware to handle JWT authentication and provide consistent 401 responses
+    Middleware to send reads of safe requests to the read replicas.
+
+    A request that writes pins the client to the primary for
+    REPLICA_PIN_SECONDS so it reads its own writes while the replicas catch
+    up. The pin is a cookie, and also the REPLICA_PIN_HEADER header with the
+    time it ends, for clients that don't send cookies: they send the header
+    back with their next requests.
     """
-    
+
+    def process_request(self, request):
+        pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES or self.pinned_by_header(request)
+        db_router.begin_request(request.method in SAFE_METHODS and not pinned)
+
+    def pinned_by_header(self, request):
+        header = 'HTTP_' + settings.REPLICA_PIN_HEADER.upper().replace('-', '_')
+        try:
+            pin_until = float(request.META.get(header, 0))
+        except ValueError:
+            return False
+        # Never longer than the server sets it for, give or take the second it is rounded up by
+        now = time()
+        return now < pin_until <= now + settings.REPLICA_PIN_SECONDS + 1
+
     def process_response(self, request, response):
-        # If response is 401 Unauthorized, ensure consistent JSON format for API requests
-        if response.status_code == 401:
-            # For API requests, return a consistent JSON response
-            if request.path.startswith('/api/'):
-                # Check if it's already a JSON response with detail
-                content = response.content.decode('utf-8') if hasattr(response, 'content') else ''
-                if '"detail":' in content or not response.get('Content-Type', '').startswith('application/json'):
-                    return JsonResponse({
-                        'error': 'Authentication required',
-                        'code': 'authentication_required',
-                        'message': 'Token is invalid or expired',
-                        'redirect': '/login'
-                    }, status=401)
-        
-        return response
\ No newline at end of file
+        wrote = db_router.end_request()
+        if settings.DATABASE_REPLICAS and (wrote or request.method not in SAFE_METHODS):
+            response[settings.REPLICA_PIN_HEADER] = str(ceil(time() + settings.REPLICA_PIN_SECONDS))
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+
+class RequestProfilingMiddleware:
+    """
+    Middleware to profile requests: wall time, DB time, query count, duplicate
+    queries, render time and response size.
+
+    Staff users get the numbers as a Server-Timing header by sending the
+    REQUEST_PROFILING_HEADER header. A REQUEST_PROFILING_SAMPLE_RATE share of
+    all requests is profiled for the logs only.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.REQUEST_PROFILING_HEADER.upper().replace('-', '_')
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        requested = self.header in request.META
+        sampled = self.sample_rate and random.random() < self.sample_rate
+        if not (requested or sampled):
+            return self.get_response(request)
+
+        response, profile = profiling.profile_request(self.get_response, request)
+        expose = requested and self.is_staff(request)
+        if expose:
+            response['Server-Timing'] = profile.server_timing()
+        if expose or sampled:
+            profiling.log_profile(profile, request, response)
+        return response
+
+    def is_staff(self, request):
+        """Whether the user DRF authenticated in the view is staff: DRF sets it on request.user too"""
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class MetricsMiddleware:
+    """
+    Middleware to count requests and time them and their database queries,
+    labelled by the URL name of the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        durations = []
+
+        def time_query(execute, sql, params, many, context):
+            started = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                durations.append(perf_counter() - started)
+
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(time_query))
+            response = self.get_response(request)
+        elapsed = perf_counter() - started
+
+        view = getattr(getattr(request, 'resolver_match', None), 'url_name', None) or 'unmatched'
+        metrics.http_requests_total.inc(view=view, method=request.method, status=str(response.status_code))
+        metrics.http_request_duration_seconds.observe(elapsed, view=view)
+        for duration in durations:
+            metrics.db_query_duration_seconds.observe(duration, view=view)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Middleware to compress GET responses of COMPRESSION_MIN_SIZE bytes or more
+    with brotli or gzip, whichever the client accepts.
+
+    Only GET responses are compressed: they never echo back secrets sent by the
+    client, which keeps compression side channels (BREACH) out of login and
+    password requests. Responses that already carry a Content-Encoding (cached
+    precompressed payloads) are sent untouched.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method != 'GET'
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.COMPRESSION_MIN_SIZE
+            or not response.get('Content-Type', '').startswith(compression.COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request)
+        if encoding is None:
+            return response
+        compressed = compression.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(compressed))
+        return response
@@ -0,0 +1,86 @@
+"""
+Cache of rendered API payloads, stored together with their gzip and brotli
+encodings so a hit is sent as is, without rendering or compressing.
+
+Every entry is keyed with a version stamp kept in the cache itself; any change
+to modules, lessons or authors bumps it (see modules/signals.py), which drops
+all entries at once. The invalidation only reaches every worker process when
+CACHES['default'] is shared by them (Redis, Memcached, file or database
+cache). The LocMem default is private to each process, where a change would
+leave the other workers' payloads stale: entries are then only kept
+PAYLOAD_CACHE_LOCAL_TIMEOUT seconds.
+"""
+import time
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.settings import api_settings
+from . import compression
+from . import metrics
+
+
+VERSION_KEY = 'payload-cache:version'
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Unique start value, so entries of an evicted version can never come back
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Drop every cached payload"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def timeout():
+    """Seconds payloads are cached, short when the cache is private to this process"""
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+        return min(settings.PAYLOAD_CACHE_LOCAL_TIMEOUT, settings.PAYLOAD_CACHE_TIMEOUT)
+    return settings.PAYLOAD_CACHE_TIMEOUT
+
+
+def _cache_key(name, key):
+    return f'payload-cache:{_version()}:{name}:{key}'
+
+
+def _response(request, payload):
+    encoding = compression.choose_encoding(request)
+    if encoding not in payload:
+        encoding = None
+    response = HttpResponse(payload[encoding], content_type=api_settings.DEFAULT_RENDERER_CLASSES[0].media_type)
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    if len(payload) > 1:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def get_response(request, name, key):
+    """Response for a cached payload, None on a miss"""
+    payload = cache.get(_cache_key(name, key))
+    metrics.record_cache(name, payload is not None)
+    if payload is None:
+        return None
+    return _response(request, payload)
+
+
+def store_response(request, name, key, data):
+    """Render data, cache it with its compressed encodings and return the response"""
+    content = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+    payload = {None: content}
+    if len(content) >= settings.COMPRESSION_MIN_SIZE:
+        for encoding in compression.available_encodings():
+            compressed = compression.compress(content, encoding, best=True)
+            if len(compressed) < len(content):
+                payload[encoding] = compressed
+    cache.set(_cache_key(name, key), payload, timeout())
+    return _response(request, payload)
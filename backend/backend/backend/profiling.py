@@ -0,0 +1,110 @@
+import json
+import logging
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from django.db import connections
+
+
+logger = logging.getLogger('backend.profiling')
+
+# Profile of the request being handled, None when the request is not profiled
+_current_profile = ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    """Timings and query statistics collected for one request"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.wall_time = 0.0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.queries = 0
+        self.statements = {}
+        self.response_bytes = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing every query"""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.queries += 1
+            key = (sql, str(params))
+            self.statements[key] = self.statements.get(key, 0) + 1
+
+    @property
+    def duplicate_queries(self):
+        """Queries repeating an earlier query with the same parameters"""
+        return sum(count - 1 for count in self.statements.values())
+
+    @property
+    def similar_queries(self):
+        """Queries repeating an earlier query with other parameters, usually an N+1 pattern"""
+        counts = {}
+        for (sql, _), count in self.statements.items():
+            counts[sql] = counts.get(sql, 0) + count
+        return sum(count - 1 for count in counts.values())
+
+    def server_timing(self):
+        return ', '.join([
+            f'total;dur={self.wall_time * 1000:.2f}',
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'dup;desc="{self.duplicate_queries} duplicate, {self.similar_queries} similar queries"',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'resp;desc="{self.response_bytes} bytes"',
+        ])
+
+    def as_dict(self, request, response):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(getattr(request, 'resolver_match', None), 'url_name', None),
+            'status': response.status_code,
+            'wall_ms': round(self.wall_time * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'queries': self.queries,
+            'duplicate_queries': self.duplicate_queries,
+            'similar_queries': self.similar_queries,
+            'render_ms': round(self.render_time * 1000, 2),
+            'response_bytes': self.response_bytes,
+        }
+
+
+def profile_request(get_response, request):
+    """Run the request with query and render instrumentation, return the response and its profile"""
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = get_response(request)
+    finally:
+        _current_profile.reset(token)
+
+    profile.wall_time = perf_counter() - profile.started
+    if not getattr(response, 'streaming', False):
+        profile.response_bytes = len(response.content)
+    return response, profile
+
+
+@contextmanager
+def timing_render():
+    """Add the time spent in the block to the render time of the current profile, used by the renderers"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        profile.render_time += perf_counter() - started
+
+
+def log_profile(profile, request, response):
+    """Write the profile as one JSON log line"""
+    logger.info(json.dumps(profile.as_dict(request, response)))
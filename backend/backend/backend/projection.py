@@ -0,0 +1,153 @@
+"""
+Serializer-free fast path for read endpoints.
+
+A Projection reads a ModelSerializer's fields once and maps query rows
+(values_list) straight to output dicts, skipping DRF's per-object field
+machinery. The output is identical to serializer.data: values that DRF would
+change (datetimes) go through the serializer field's own to_representation,
+values DRF returns unchanged are copied.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, fields, relations, serializers
+from rest_framework.settings import api_settings
+
+
+# Fields whose to_representation returns database values of these types unchanged
+PASSTHROUGH_FIELDS = (
+    fields.CharField,
+    fields.ChoiceField,
+    fields.IntegerField,
+    fields.BooleanField,
+    # Decoded by the database field already
+    fields.JSONField,
+    relations.PrimaryKeyRelatedField,
+)
+
+_projections = {}
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation with the time zone looked up once, not per value.
+    Returns a factory called at the start of every projection.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return lambda: field.to_representation
+
+    def factory():
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+    return factory
+
+
+class Projection:
+    """Output of serializer_class for every row of a queryset, built from values_list rows"""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer_class.Meta.model
+        self.pk_name = self.model._meta.pk.name
+        self.names = list(serializer.fields)
+        self.lookups = []
+        self.columns = []
+        self.nested = []
+
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                self.nested.append((name, projection_for(type(field.child)), relation.field.name))
+            elif isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+                # Not the bare field name: it would replace a default ordering on the related model
+                self.add_column(name, f'{field.source}__pk', None)
+            elif isinstance(field, PASSTHROUGH_FIELDS) and not isinstance(field, relations.RelatedField):
+                self.add_column(name, field.source.replace('.', '__'), None)
+            elif isinstance(field, fields.DateTimeField):
+                self.add_column(name, field.source.replace('.', '__'), datetime_converter(field))
+            elif isinstance(field, (fields.DateField, fields.DecimalField)):
+                self.add_column(name, field.source.replace('.', '__'), lambda field=field: field.to_representation)
+            else:
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name}: {type(field).__name__} has no projection'
+                )
+
+        # Rows are matched to their nested rows by primary key
+        self.pk_index = self.lookups.index(self.pk_name) if self.pk_name in self.lookups else None
+        if self.nested and self.pk_index is None:
+            self.pk_index = len(self.lookups)
+            self.lookups.append(self.pk_name)
+
+    def add_column(self, name, lookup, converter):
+        """converter: None to copy the value, else a factory returning the function converting it"""
+        self.lookups.append(lookup)
+        self.columns.append((name, converter))
+
+    def bind_columns(self):
+        return [(name, converter and converter()) for name, converter in self.columns]
+
+    def rows(self, queryset):
+        return queryset.prefetch_related(None).values_list(*self.lookups)
+
+    def project(self, queryset):
+        """Output of serializer_class(queryset, many=True).data"""
+        rows = list(self.rows(queryset))
+        parents = queryset.prefetch_related(None).values(self.pk_name)
+        nested = [
+            (name, projection.project_grouped(relation, parents) if rows else {})
+            for name, projection, relation in self.nested
+        ]
+
+        columns = self.bind_columns()
+        output = []
+        for row in rows:
+            item = {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(columns, row)
+            }
+            if nested:
+                for name, grouped in nested:
+                    item[name] = grouped.get(row[self.pk_index], [])
+                # Back to the field order of the serializer
+                item = {name: item[name] for name in self.names}
+            output.append(item)
+        return output
+
+    def project_one(self, queryset):
+        """Output of serializer_class(queryset.get()).data"""
+        output = self.project(queryset)
+        if not output:
+            raise self.model.DoesNotExist(f'{self.model.__name__} matching query does not exist.')
+        return output[0]
+
+    def project_grouped(self, relation, parents):
+        """Output for the rows of every parent (a values() subquery), keyed by parent id, in default model order"""
+        queryset = self.model._default_manager.filter(**{f'{relation}__in': parents})
+        rows = queryset.values_list(*self.lookups, f'{relation}__pk')
+
+        columns = self.bind_columns()
+        grouped = {}
+        for row in rows:
+            item = {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(columns, row)
+            }
+            grouped.setdefault(row[-1], []).append(item)
+        return grouped
+
+
+def projection_for(serializer_class):
+    """Projection of serializer_class, built on first use"""
+    projection = _projections.get(serializer_class)
+    if projection is None:
+        projection = _projections[serializer_class] = Projection(serializer_class)
+    return projection
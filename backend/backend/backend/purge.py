@@ -0,0 +1,217 @@
+"""
+Fast deletion of users and modules with everything that depends on them.
+
+Model.delete() makes Django's collector load every dependent row into
+memory (activities, test histories, lessons...) because Lesson and Activity
+have post_delete receivers, which rules out its fast-delete path. A module
+with 50k activities then takes minutes. Here the dependents are found from
+the model relations like the collector does, but deleted leaves first with
+plain DELETE ... WHERE pk IN (...) statements of CHUNK_SIZE rows, never
+loaded as objects and without signals. What the receivers would do is done
+per chunk instead: the overviews of the students of deleted activities are
+refreshed in the chunk's transaction, and payload_cache is invalidated once
+at the end. SET_NULL relations are cleared with UPDATE statements.
+
+Objects with PURGE_SYNC_LIMIT rows or more to delete are soft deleted:
+deleted_at is set, which hides a module at once (its default manager skips
+it) and deactivates a user, and the rows are purged in a background thread
+after the commit, or by the purge_deleted command (run it from cron to
+finish purges a restarted worker left behind).
+
+Lesson bodies are shared by revisions and deltas point at their base with
+PROTECT, so deleting lessons leaves their bodies behind: purge_deleted also
+deletes the bodies no revision or other body refers to.
+"""
+import logging
+import threading
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL, Exists, OuterRef
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+
+_purging = threading.Lock()
+
+
+class PurgeError(Exception):
+    pass
+
+
+def plan(queryset):
+    """
+    (model, queryset, field) steps deleting the rows of queryset and
+    everything cascading from them, dependents first. Steps with a field
+    set that field to null in their rows instead of deleting them.
+    """
+    steps = []
+    for relation in get_candidate_relations_to_delete(queryset.model._meta):
+        on_delete = relation.field.remote_field.on_delete
+        if on_delete is DO_NOTHING:
+            continue
+        related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': queryset}).order_by()
+        if on_delete is SET_NULL:
+            steps.append((relation.related_model, related, relation.field.name))
+            continue
+        if on_delete is not CASCADE:
+            raise PurgeError(f'{relation.related_model.__name__}.{relation.field.name} does not cascade, use delete()')
+        steps.extend(plan(related))
+    steps.append((queryset.model, queryset, None))
+    return steps
+
+
+def count(queryset, limit):
+    """Rows purge(queryset) would delete or update, counted up to limit"""
+    total = 0
+    for _, rows, _ in plan(queryset):
+        total += rows[:limit - total].count()
+        if total >= limit:
+            break
+    return total
+
+
+def purge(queryset, progress=None):
+    """
+    Delete the rows of queryset and their dependents in chunks, each chunk in
+    its own transaction unless called inside one. progress(model, deleted) is
+    called after every chunk. Returns the number of rows deleted per table.
+    """
+    from activities import overviews
+    from activities.models import Activity
+    from . import payload_cache
+
+    using = router.db_for_write(queryset.model)
+    deleted = {}
+    for model, rows, field in plan(queryset):
+        if field is not None:
+            # Updated rows leave the queryset
+            while True:
+                with transaction.atomic(using=using):
+                    ids = list(rows.using(using).values_list('pk', flat=True)[:CHUNK_SIZE])
+                    if ids:
+                        model._base_manager.using(using).filter(pk__in=ids).update(**{field: None})
+                if not ids:
+                    break
+            continue
+
+        table = model._meta.db_table
+        deleted.setdefault(table, 0)
+        while True:
+            with transaction.atomic(using=using):
+                if model is Activity:
+                    chunk = list(rows.using(using).values_list('pk', 'student_id')[:CHUNK_SIZE])
+                    ids = [pk for pk, _ in chunk]
+                else:
+                    ids = list(rows.using(using).values_list('pk', flat=True)[:CHUNK_SIZE])
+                if ids:
+                    model._base_manager.using(using).filter(pk__in=ids)._raw_delete(using)
+                    if model is Activity:
+                        # As the post_delete receiver would
+                        overviews.refresh([student for _, student in chunk], create=False, using=using)
+            if not ids:
+                break
+            deleted[table] += len(ids)
+            if progress:
+                progress(model, deleted[table])
+    # The deletes sent no post_delete signals
+    payload_cache.invalidate()
+    return deleted
+
+
+def delete(obj):
+    """
+    Delete obj (a user or module) now when it has few dependents, else soft
+    delete it and purge it in the background. Returns True when it is gone.
+    """
+    queryset = type(obj)._base_manager.filter(pk=obj.pk)
+    if count(queryset, settings.PURGE_SYNC_LIMIT) < settings.PURGE_SYNC_LIMIT:
+        with transaction.atomic():
+            purge(queryset)
+        return True
+
+    obj.soft_delete()
+    transaction.on_commit(start_background_purge)
+    return False
+
+
+def soft_deleted():
+    """Querysets of the soft deleted rows of every model that has them"""
+    from modules.models import Module
+    from users.models import User
+
+    return [
+        User._base_manager.filter(deleted_at__isnull=False),
+        Module._base_manager.filter(deleted_at__isnull=False),
+    ]
+
+
+def purge_deleted(progress=None):
+    """
+    Purge every soft deleted row, then the unused lesson bodies. Returns the
+    number of rows deleted per table.
+    """
+    total = {}
+    for queryset in soft_deleted():
+        # The rows deleted until now: rows soft deleted meanwhile are left for the next run
+        queryset = queryset.model._base_manager.filter(pk__in=list(queryset.values_list('pk', flat=True)))
+        for table, deleted in purge(queryset, progress).items():
+            total[table] = total.get(table, 0) + deleted
+    for table, deleted in purge_lesson_bodies(progress).items():
+        total[table] = total.get(table, 0) + deleted
+    return total
+
+
+def unused_lesson_bodies():
+    """The lesson bodies no revision has and no other body is a delta against"""
+    from modules.models import LessonBody, LessonRevision
+
+    return LessonBody.objects.filter(
+        ~Exists(LessonRevision.objects.filter(body=OuterRef('pk'))),
+        ~Exists(LessonBody.objects.filter(base=OuterRef('pk'))),
+    ).order_by()
+
+
+def purge_lesson_bodies(progress=None):
+    """
+    Delete the unused lesson bodies in chunks, then the bases they leave
+    unused, until every body left is used. Returns the number of rows deleted.
+    """
+    from modules.models import LessonBody
+
+    using = router.db_for_write(LessonBody)
+    table = LessonBody._meta.db_table
+    deleted = 0
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                ids = list(unused_lesson_bodies().using(using).values_list('pk', flat=True)[:CHUNK_SIZE])
+                # Checked again by the DELETE: a revision saved meanwhile may use one of them
+                count = unused_lesson_bodies().using(using).filter(pk__in=ids)._raw_delete(using) if ids else 0
+        except IntegrityError:
+            # A revision saved meanwhile in a concurrent transaction: left for the next run
+            break
+        if not count:
+            break
+        deleted += count
+        if progress:
+            progress(LessonBody, deleted)
+    return {table: deleted}
+
+
+def _purge_in_background():
+    try:
+        with _purging:
+            purge_deleted()
+    except Exception:
+        logger.exception('Purging soft deleted rows failed, purge_deleted will finish it')
+    finally:
+        connections.close_all()
+
+
+def start_background_purge():
+    if not settings.PURGE_IN_BACKGROUND:
+        return
+    threading.Thread(target=_purge_in_background, name='purge', daemon=True).start()
+
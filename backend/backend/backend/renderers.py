@@ -0,0 +1,59 @@
+"""
+orjson based renderer and parser for DRF.
+
+Output is byte-identical to rest_framework's JSONRenderer with the default
+compact and unicode settings: values orjson does not know (Decimals, lazy
+strings, querysets...) are encoded by DRF's own JSONEncoder. Datetimes,
+dates and UUIDs are encoded natively, datetimes keep their microseconds.
+
+Rendering time is added to the profile of profiled requests (see
+profiling.py), cached payloads included since payload_cache renders with it.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from . import profiling
+
+
+_encoder = JSONEncoder()
+
+# Same escaping as JSONRenderer, so the output is safe inside <script> tags
+_LINE_SEPARATOR = '\u2028'.encode('utf-8')
+_PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        with profiling.timing_render():
+            return self._render(data, accepted_media_type)
+
+    def _render(self, data, accepted_media_type):
+        options = self.options
+        if accepted_media_type and 'indent' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+
+        content = orjson.dumps(data, default=_encoder.default, option=options)
+        if _LINE_SEPARATOR in content or _PARAGRAPH_SEPARATOR in content:
+            content = content.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return content
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
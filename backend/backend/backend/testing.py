@@ -0,0 +1,22 @@
+"""
+Base test case of the API tests, shared by the tests of every app.
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+
+# Seeding hashes a password per user: the fast hasher keeps the tests quick
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SeededTestCase(TestCase):
+    """Runs every test on a fresh seed_data dataset"""
+
+    # Options of seed_data before each test, None for tests that seed themselves
+    seed_options = {}
+
+    def setUp(self):
+        if self.seed_options is not None:
+            self.seed(**self.seed_options)
+
+    def seed(self, **options):
+        call_command('seed_data', stdout=StringIO(), **options)
@@ -0,0 +1,518 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+import traceback
+import uuid
+from collections import Counter
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, SimpleTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Count
+from django.urls import get_resolver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from activities.models import Activity, UserOverview
+from modules.models import Lesson, LessonBody, LessonContent, Module
+from modules.serializers import LessonSerializer, ModuleWithLessonsSerializer, ModuleWithProgressSerializer
+from users.models import User
+from users.management.commands.benchmark_api import Command as BenchmarkCommand, iter_routes
+from . import metrics, payload_cache, purge
+from .projection import Projection, projection_for
+from .db_router import ReplicaRouter
+from .middleware import ReplicaRoutingMiddleware
+from .renderers import ORJSONParser, ORJSONRenderer
+from .testing import SeededTestCase
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.routed = []
+
+    def view(self, write=False):
+        def handler(request):
+            if write:
+                self.router.db_for_write(Module)
+            self.routed.append(self.router.db_for_read(Module))
+            return HttpResponse()
+        return ReplicaRoutingMiddleware(handler)
+
+    def test_get_reads_from_replica(self):
+        response = self.view()(self.factory.get('/api/modules/overview'))
+        self.assertEqual(self.routed, ['replica_1'])
+        self.assertNotIn('db_primary_pin', response.cookies)
+
+    def test_write_pins_rest_of_request_and_client_to_primary(self):
+        response = self.view(write=True)(self.factory.post('/api/student/modules/1/lessons/1/progress'))
+        self.assertEqual(self.routed, [DEFAULT_DB_ALIAS])
+        self.assertEqual(response.cookies['db_primary_pin']['max-age'], 5)
+        self.assertAlmostEqual(int(response['X-DB-Pin-Until']), time.time() + 5, delta=1)
+
+    def test_pinned_client_reads_from_primary(self):
+        request = self.factory.get('/api/modules/overview')
+        request.COOKIES['db_primary_pin'] = '1'
+        self.view()(request)
+        self.assertEqual(self.routed, [DEFAULT_DB_ALIAS])
+
+    def test_pin_header_works_without_cookies(self):
+        now = time.time()
+        for pin_until, routed in ((now + 5, DEFAULT_DB_ALIAS), (now - 1, 'replica_1'), (now + 3600, 'replica_1'), ('x', 'replica_1')):
+            with self.subTest(pin_until=pin_until):
+                self.routed = []
+                self.view()(self.factory.get('/api/student/stats', HTTP_X_DB_PIN_UNTIL=str(pin_until)))
+                self.assertEqual(self.routed, [routed])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Module), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        response = self.view(write=True)(self.factory.post('/api/modules/'))
+        self.assertEqual(self.routed, [DEFAULT_DB_ALIAS])
+        self.assertNotIn('db_primary_pin', response.cookies)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_output_matches_json_renderer(self):
+        data = {
+            'title': 'Sejarah Madura \u2028 \u2713',
+            'price': Decimal('12.50'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Lesson'),
+            'scores': [1, 2.5, None, True],
+            'nested': {'a': [], 'b': {}},
+            1: 'number key'
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(BytesIO('{"answers": {"1": "Ya"}}'.encode())), {'answers': {'1': 'Ya'}})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"answers": NaN}'))
+
+
+class ProjectionTests(SeededTestCase):
+    seed_options = {'modules': 3, 'lessons_per_module': 3}
+
+    def assertSameOutput(self, serialized, projected):
+        self.assertEqual(JSONRenderer().render(projected), JSONRenderer().render(serialized))
+
+    def test_lessons_match_serializer(self):
+        lessons = Lesson.objects.select_related('lesson_content').order_by('id')
+        self.assertSameOutput(LessonSerializer(lessons, many=True).data, projection_for(LessonSerializer).project(lessons))
+
+    def test_modules_with_lessons_match_serializer(self):
+        modules = Module.objects.order_by('id')
+        projection = projection_for(ModuleWithLessonsSerializer)
+        with self.assertNumQueries(2):
+            projected = projection.project(modules)
+        self.assertSameOutput(ModuleWithLessonsSerializer(modules, many=True).data, projected)
+
+        module = modules.first()
+        self.assertSameOutput(ModuleWithLessonsSerializer(module).data, projection.project_one(Module.objects.filter(id=module.id)))
+        with self.assertRaises(Module.DoesNotExist):
+            projection.project_one(Module.objects.filter(id=0))
+
+    def test_method_fields_have_no_projection(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Projection(ModuleWithProgressSerializer)
+
+
+class PurgeTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = RefreshToken.for_user(User.objects.get(username='admin')).access_token
+        self.module = Module.objects.annotate(activities=Count('activity')).order_by('-activities').first()
+
+    def delete(self, url):
+        return self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_module_is_deleted_without_loading_its_rows(self):
+        lesson_ids = list(self.module.lessons.values_list('id', flat=True))
+        student_ids = list(Activity.objects.filter(modules_id=self.module).values_list('student_id', flat=True))
+        self.assertTrue(student_ids)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.delete(f'/api/admin/modules/{self.module.id}/delete')
+        self.assertEqual(response.status_code, 200)
+        # Only primary keys are read, in chunks, besides the overview totals of their students
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'activities_' in q['sql']]
+        self.assertTrue(selects)
+        keys = r'SELECT (COUNT|"activities_\w+"\."(id" AS "pk"|student_id_id" AS "student_id"|user_id_id" AS "user_id"))'
+        self.assertTrue(all(re.match(keys, sql) for sql in selects), selects)
+
+        self.assertFalse(Module._base_manager.filter(id=self.module.id).exists())
+        self.assertFalse(Lesson.objects.filter(id__in=lesson_ids).exists())
+        self.assertFalse(LessonContent.objects.filter(lesson_id__in=lesson_ids).exists())
+        self.assertFalse(Activity.objects.filter(modules_id=self.module.id).exists())
+        self.assertFalse(UserOverview.objects.filter(last_module_learned_id=self.module.id).exists())
+        self.assertEqual(Module.objects.count(), 4)
+        # The overviews of the students no longer count the module
+        for overview in UserOverview.objects.filter(user_id__in=student_ids):
+            self.assertEqual(overview.modules_count, Activity.objects.filter(student_id=overview.user_id_id).count())
+
+    @override_settings(PURGE_SYNC_LIMIT=1)
+    def test_large_objects_are_soft_deleted_then_purged(self):
+        teacher = self.module.author
+        titles = list(teacher.modules.values_list('title', flat=True))
+        response = self.delete(f'/api/admin/users/{teacher.id}/delete')
+        self.assertEqual(response.status_code, 202)
+
+        # Gone for everyone at once
+        teacher.refresh_from_db()
+        self.assertFalse(teacher.is_active)
+        self.assertFalse(Module.objects.filter(author=teacher).exists())
+        overview = self.client.get('/api/modules/overview').json()['modules']
+        self.assertFalse({module['title'] for module in overview} & set(titles))
+        self.assertEqual(self.delete(f'/api/admin/users/{teacher.id}/delete').status_code, 404)
+        # The titles are free again
+        Module.objects.create(title=titles[0], author=User.objects.get(username='teacher_jane'), deadline=timezone.now())
+
+        output = StringIO()
+        call_command('purge_deleted', stdout=output)
+        self.assertIn('activities_activity: ', output.getvalue())
+        self.assertFalse(User.objects.filter(id=teacher.id).exists())
+        self.assertEqual(Module._base_manager.filter(author_id=teacher.id).count(), 0)
+        self.assertFalse(Activity.objects.filter(modules_id__author_id=teacher.id).exists())
+        self.assertEqual(Module.objects.filter(title__in=titles).count(), 1)
+
+    def test_unused_lesson_bodies_are_purged(self):
+        lesson, other = self.module.lessons.filter(lesson_type='lesson').order_by('order')[:2]
+        # A chain of deltas, and a body shared with a lesson that stays
+        for line in ('Satu.', 'Dua.'):
+            lesson.content = lesson.content + f'\n{line}\n'
+            lesson.save()
+        shared = other.content
+        other.content = shared + '\nTiga.\n'
+        other.save()
+        kept = Lesson.objects.exclude(module_id=self.module).filter(lesson_type='lesson').first()
+        kept.content = shared
+        kept.save()
+        bodies = set(LessonBody.objects.filter(revisions__lesson__module_id=self.module).values_list('pk', flat=True))
+        self.assertTrue(LessonBody.objects.filter(pk__in=bodies, base__isnull=False).exists())
+        self.assertEqual(self.delete(f'/api/admin/modules/{self.module.id}/delete').status_code, 200)
+
+        output = StringIO()
+        call_command('purge_deleted', stdout=output)
+        self.assertIn('modules_lessonbody: ', output.getvalue())
+        left = set(LessonBody.objects.filter(pk__in=bodies).values_list('pk', flat=True))
+        self.assertEqual(left, {kept.lesson_content.content_hash})
+        self.assertFalse(purge.unused_lesson_bodies().exists())
+        self.assertEqual(kept.revisions.last().body.get_content(), shared)
+
+    @override_settings(PURGE_SYNC_LIMIT=1)
+    def test_lessons_of_a_soft_deleted_module_are_hidden(self):
+        lesson = self.module.lessons.order_by('order').first()
+        detail = f'/api/modules/{self.module.id}/lessons/{lesson.id}'
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+        self.assertEqual(self.client.get(detail, **auth).status_code, 200)
+        self.assertEqual(self.delete(f'/api/admin/modules/{self.module.id}/delete').status_code, 202)
+
+        lesson_ids = {item['id'] for item in self.client.get('/api/lessons/', **auth).json()}
+        self.assertTrue(lesson_ids)
+        self.assertFalse(lesson_ids & set(Lesson._base_manager.filter(module_id=self.module.id).values_list('id', flat=True)))
+        self.assertEqual(self.client.get(f'/api/lessons/{lesson.id}/', **auth).status_code, 404)
+        self.assertEqual(self.client.get(detail, **auth).status_code, 404)
+        self.assertEqual(self.client.post(f'{detail}/progress', **auth).status_code, 404)
+        exam = Lesson.objects.filter(module_id=self.module.id, lesson_type='exam').first()
+        response = self.client.post(f'/api/exam/{exam.id}/submit', {'answers': {}}, content_type='application/json', **auth)
+        self.assertEqual(response.status_code, 404)
+        # Still there for the purge
+        self.assertTrue(Lesson.objects.filter(module_id=self.module.id).exists())
+        activities = self.client.get('/api/activities/', **auth).json()
+        self.assertFalse([activity for activity in activities if activity['modules_id'] == self.module.id])
+
+    def test_duplicate_title_is_a_validation_error(self):
+        token = RefreshToken.for_user(self.module.author).access_token
+        response = self.client.post('/api/modules/', {
+            'title': self.module.title, 'description': 'x', 'deadline': timezone.now().isoformat()
+        }, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+def normalize_sql(sql):
+    """Replace literal values so repeated queries with different parameters compare equal"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((?:\?, )*\?\)', 'IN (...)', sql)
+
+
+class QueryRecorder:
+    """Database execute wrapper keeping every query together with the code that ran it"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = [
+            frame for frame in traceback.extract_stack()[:-1]
+            if frame.filename.startswith(str(settings.BASE_DIR))
+            and 'site-packages' not in frame.filename
+            and frame.filename not in (__file__, str(settings.BASE_DIR / 'manage.py'))
+        ]
+        self.queries.append((sql, stack))
+        return execute(sql, params, many, context)
+
+
+@override_settings(
+    DATABASE_REPLICAS=[],
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CHUNKED_UPLOAD_DIR=tempfile.mkdtemp(),
+    IMAGE_DERIVATIVES=False
+)
+class QueryCountTests(SeededTestCase):
+    """
+    Every endpoint must run the same number of queries on a dataset ten times bigger.
+
+    Endpoints and their requests come from the benchmark_api command, so a route
+    added there is guarded here too.
+    """
+
+    seed_options = None
+    DATASET = {'students': 5, 'teachers': 1, 'modules': 3, 'lessons_per_module': 3, 'activities_per_student': 2}
+    SCALE = 10
+
+    def record(self, scale):
+        self.seed(
+            students=self.DATASET['students'] * scale,
+            teachers=self.DATASET['teachers'],
+            modules=self.DATASET['modules'] * scale,
+            lessons_per_module=self.DATASET['lessons_per_module'] * scale,
+            activities_per_student=self.DATASET['activities_per_student'] * scale
+        )
+        benchmark = BenchmarkCommand()
+        client = Client(raise_request_exception=False)
+        recorded = {}
+        for endpoint in benchmark.build_endpoints():
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response, _ = benchmark.call(client, endpoint)
+            # A server error runs whatever queries came before it
+            self.assertLess(response.status_code, 500, f'{endpoint["key"]} at scale {scale}')
+            recorded[endpoint['key']] = recorder.queries
+        return recorded
+
+    def describe_growth(self, small, large):
+        """List the queries that ran more often on the bigger dataset, with the code that ran them"""
+        before = Counter(normalize_sql(sql) for sql, _ in small)
+        after = Counter(normalize_sql(sql) for sql, _ in large)
+        lines = [f'{len(small)} queries -> {len(large)} queries']
+        for sql, count in after.items():
+            if count > before[sql]:
+                stack = next(stack for query, stack in large if normalize_sql(query) == sql)
+                lines.append(f'\n{before[sql]} -> {count} times: {sql}')
+                lines.extend(f'  {frame.filename}:{frame.lineno} in {frame.name}' for frame in stack)
+        return '\n'.join(lines)
+
+    def test_query_count_does_not_grow_with_data(self):
+        small = self.record(1)
+        large = self.record(self.SCALE)
+
+        self.assertEqual(small.keys(), large.keys())
+        for key in small:
+            with self.subTest(endpoint=key):
+                self.assertLessEqual(len(large[key]), len(small[key]), self.describe_growth(small[key], large[key]))
+
+    def test_every_route_is_covered(self):
+        self.seed()
+        covered = {endpoint['route'] for endpoint in BenchmarkCommand().build_endpoints()}
+        routes = {route for route in iter_routes(get_resolver().url_patterns) if not route.startswith('media/')}
+        self.assertEqual(routes - covered, set())
+
+
+class AuthenticationErrorTests(SeededTestCase):
+    seed_options = None
+    CANONICAL = {
+        'error': 'Authentication required',
+        'code': 'authentication_required',
+        'message': 'Token is invalid or expired',
+        'redirect': '/login'
+    }
+
+    def test_missing_and_invalid_tokens_get_canonical_response(self):
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer invalid'}):
+            with self.subTest(headers=headers):
+                response = self.client.get('/api/student/stats', **headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+                self.assertEqual(response.json(), self.CANONICAL)
+
+    def test_wrong_login_keeps_its_message(self):
+        self.seed()
+        response = self.client.post('/api/login/', {'username': 'student_alice', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {'message': 'Nama pengguna atau kata sandi salah'})
+
+
+class CompressionTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = User.objects.get(username='student_alice')
+        self.lesson = Lesson.objects.first()
+        self.url = f'/api/modules/{self.lesson.module_id_id}/lessons/{self.lesson.id}'
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.student).access_token}'}
+
+    def test_cached_payload_is_sent_precompressed(self):
+        identity = self.client.get(self.url, **self.headers)
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertIn('Accept-Encoding', identity['Vary'])
+
+        with self.assertNumQueries(1):  # the JWT user only
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate', **self.headers)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        self.assertLess(len(response.content), len(identity.content))
+
+    def test_content_changes_invalidate_cached_payloads(self):
+        self.client.get(self.url, **self.headers)
+        self.lesson.title = 'Judul Baru'
+        self.lesson.save()
+        self.assertEqual(self.client.get(self.url, **self.headers).json()['lesson']['title'], 'Judul Baru')
+
+    def test_per_process_cache_keeps_payloads_briefly(self):
+        # Another worker's LocMem cache would not see the invalidation
+        self.assertEqual(payload_cache.timeout(), settings.PAYLOAD_CACHE_LOCAL_TIMEOUT)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(payload_cache.timeout(), settings.PAYLOAD_CACHE_TIMEOUT)
+
+    def test_catalogue_with_progress_is_not_cached(self):
+        self.client.get('/api/modules/overview')
+        response = self.client.get('/api/modules/overview', **self.headers)
+        progress = [module['progress'] for module in response.json()['modules']]
+        self.assertTrue(any(progress))
+
+    def test_dynamic_responses_compressed_above_threshold(self):
+        # The student has progress, so the catalogue is rendered for them
+        response = self.client.get('/api/modules/overview', HTTP_ACCEPT_ENCODING='gzip', **self.headers)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['success'], True)
+
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/modules/overview', HTTP_ACCEPT_ENCODING='gzip', **self.headers)
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/api/modules/overview', HTTP_ACCEPT_ENCODING='gzip;q=0', **self.headers)
+        self.assertNotIn('Content-Encoding', response)
+
+
+class RequestProfilingTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.get(username='admin')
+        self.student = User.objects.get(username='student_alice')
+
+    def get(self, user, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get('/api/modules/overview', HTTP_AUTHORIZATION=f'Bearer {token}', **headers)
+
+    def test_staff_gets_server_timing(self):
+        with self.assertLogs('backend.profiling', 'INFO') as logs:
+            response = self.get(self.admin, HTTP_X_PROFILE='1')
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'render;dur=', 'duplicate', f'{len(response.content)} bytes'):
+            self.assertIn(metric, timing)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'modules-overview')
+        self.assertGreater(line['queries'], 0)
+        self.assertGreater(line['render_ms'], 0)
+
+    def test_token_is_decoded_once(self):
+        with mock.patch.object(JWTAuthentication, 'get_validated_token', autospec=True,
+                               side_effect=JWTAuthentication.get_validated_token) as validate:
+            with self.assertLogs('backend.profiling', 'INFO'):
+                self.assertIn('Server-Timing', self.get(self.admin, HTTP_X_PROFILE='1'))
+        self.assertEqual(validate.call_count, 1)
+
+    def test_not_profiled_without_header_or_for_students(self):
+        self.assertNotIn('Server-Timing', self.get(self.admin))
+        self.assertNotIn('Server-Timing', self.get(self.student, HTTP_X_PROFILE='1'))
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_logged_without_header(self):
+        with self.assertLogs('backend.profiling', 'INFO') as logs:
+            response = self.get(self.student, HTTP_X_PROFILE='1')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['status'], 200)
+
+
+class MetricsTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.get(username='admin')
+        self.student = User.objects.get(username='student_alice')
+        self.metrics_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(metrics, 'store', metrics.MetricsStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_metrics(self, user):
+        token = RefreshToken.for_user(user).access_token
+        return self.client.get('/api/admin/metrics', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_admin_gets_request_login_and_query_metrics(self):
+        self.client.post('/api/login/', {'username': 'student_alice', 'password': 'wrong'})
+        self.client.post('/api/login/', {'username': 'student_alice', 'password': 'student123'})
+        response = self.get_metrics(self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('login_attempts_total{result="failure"} 1', text)
+        self.assertIn('login_attempts_total{result="success"} 1', text)
+        self.assertIn('http_requests_total{method="POST",status="401",view="login"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{view="login"} 2', text)
+        self.assertIn('db_query_duration_seconds_bucket{view="login",le="+Inf"}', text)
+
+    def test_students_cannot_read_metrics(self):
+        self.assertEqual(self.get_metrics(self.student).status_code, 403)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.003, 0.02, 20):
+            metrics.http_request_duration_seconds.observe(value, view='test')
+        text = metrics.generate_latest()
+        self.assertIn('http_request_duration_seconds_bucket{view="test",le="0.005"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",le="0.025"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",le="10"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",le="+Inf"} 3', text)
+        self.assertIn('http_request_duration_seconds_count{view="test"} 3', text)
+
+    def test_values_of_all_processes_are_summed(self):
+        key = metrics.exam_submissions_total._key('exam_submissions_total', {'result': 'submitted'})
+        for pid, amount in ((1, 2), (2, 3)):
+            values = metrics.MmapedValues(os.path.join(self.metrics_dir, f'metrics_{pid}.db'))
+            values.add(key, amount)
+            values.close()
+        with override_settings(METRICS_DIR=self.metrics_dir):
+            metrics.exam_submissions_total.inc(result='submitted')
+            text = metrics.generate_latest()
+        self.assertIn('exam_submissions_total{result="submitted"} 6', text)
+
+    def test_mmaped_values_grow_and_reopen(self):
+        path = os.path.join(self.metrics_dir, 'metrics_1.db')
+        values = metrics.MmapedValues(path)
+        for number in range(50000):
+            values.add(f'key-{number}', number)
+        values.close()
+        values = metrics.MmapedValues(path)
+        values.add('key-49999', 1)
+        values.close()
+        with open(path, 'rb') as metrics_file:
+            stored = dict(metrics._read_values(metrics_file.read()))
+        self.assertEqual(len(stored), 50000)
+        self.assertEqual(stored['key-49999'], 50000)
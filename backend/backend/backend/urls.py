@@ -1,6 +1,5 @@
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -13,7 +12,8 @@ from users.views import (
     RegisterView,
     get_user_profile,
     update_user_profile,
-    change_password
+    change_password,
+    published_headlines
 )
 from modules.views import (
     ModuleView,
@@ -22,6 +22,7 @@ from modules.views import (
     teacher_modules,
     module_detail_with_lessons,
     lesson_detail,
+    bulk_lessons,
     teacher_stats
 )
 from activities.views import (
@@ -32,11 +33,17 @@ from activities.views import (
     get_exam_history,
     update_lesson_progress
 )
-from modules.views_upload import upload_image
+from modules.views_upload import create_upload_session, upload_image, upload_session
+from modules.views_archive import export_modules, import_modules
+from modules.views_media import serve_media
+from modules.views_search import search_content
 from users.views_admin import (
     admin_dashboard_stats,
+    admin_metrics,
     get_all_users,
+    export_users,
     create_user,
+    provision_users,
     update_user,
     delete_user,
     change_user_password,
@@ -65,8 +72,12 @@ urlpatterns = [
     # Specific module endpoints must come BEFORE router.urls to avoid conflicts
     path('api/modules/overview', modules_overview, name='modules-overview'),
     path('api/modules/teacher', teacher_modules, name='teacher-modules'),
+    path('api/modules/export', export_modules, name='modules-export'),
+    path('api/modules/import', import_modules, name='modules-import'),
+    path('api/search', search_content, name='search'),
     path('api/modules/<int:module_id>/detail', module_detail_with_lessons, name='module-detail-with-lessons'),
     path('api/modules/<int:module_id>/lessons/<int:lesson_id>', lesson_detail, name='lesson-detail'),
+    path('api/modules/<int:module_id>/lessons/bulk', bulk_lessons, name='module-lessons-bulk'),
     path('api/teacher/stats', teacher_stats, name='teacher-stats'),
     path('api/student/stats', student_stats, name='student-stats'),
     path('api/student/exam-history', get_exam_history, name='student-exam-history'),
@@ -77,14 +88,21 @@ urlpatterns = [
     path('api/user/profile/', get_user_profile, name='user-profile'),
     path('api/user/profile/update/', update_user_profile, name='update-user-profile'),
     path('api/user/password/change/', change_password, name='change-password'),
+    # Landing page headlines, public
+    path('api/headlines', published_headlines, name='headlines'),
     # Exam endpoints
     path('api/exam/<int:lesson_id>/submit', submit_exam_answers, name='submit-exam-answers'),
     # File upload endpoint
     path('api/upload/image', upload_image, name='upload-image'),
+    path('api/upload/image/sessions', create_upload_session, name='upload-image-sessions'),
+    path('api/upload/image/sessions/<str:upload_id>', upload_session, name='upload-image-session'),
         # Admin endpoints
     path('api/admin/stats', admin_dashboard_stats, name='admin-stats'),
+    path('api/admin/metrics', admin_metrics, name='admin-metrics'),
     path('api/admin/users', get_all_users, name='admin-get-all-users'),
+    path('api/admin/users/export', export_users, name='admin-export-users'),
     path('api/admin/users/create', create_user, name='admin-create-user'),
+    path('api/admin/users/provision', provision_users, name='admin-provision-users'),
     path('api/admin/users/<int:user_id>/update', update_user, name='admin-update-user'),
     path('api/admin/users/<int:user_id>/delete', delete_user, name='admin-delete-user'),
     path('api/admin/users/<int:user_id>/change-password', change_user_password, name='admin-change-user-password'),
@@ -96,8 +114,6 @@ urlpatterns = [
     path('api/admin/headlines/<int:headline_id>/delete', delete_headline, name='admin-delete-headline'),
     # Router URLs (will match /api/modules, /api/modules/<id>, etc.)
     path('api/', include(router.urls)),
-]
-
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Uploaded media, in production sent by the front proxy (MEDIA_ACCEL)
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', serve_media, name='media'),
+]
\ No newline at end of file
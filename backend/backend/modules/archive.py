@@ -0,0 +1,332 @@
+"""
+Export and import of modules with their lessons and uploaded images as a zip archive.
+
+Layout:
+    manifest.json     format, version and counts
+    modules.ndjson    one module per line
+    lessons.ndjson    one lesson (or exam) per line, with its content
+    media/uploads/... the uploaded images the modules and lessons reference
+
+Links to uploaded images are stored as media://uploads/<name> and rewritten to
+the importing site's MEDIA_URL. Imported images are stored by content hash like
+uploads, so an image the site already has is not stored twice; a media member
+that is not an image within the upload size limits fails the import, and so
+do manifest lines longer than ARCHIVE_LINE_MAX_SIZE or manifests larger than
+ARCHIVE_DATA_MAX_SIZE once decompressed. Export
+yields the archive in chunks as it is written (zipfile streams members with
+data descriptors), so memory use does not grow with the catalogue; import
+inserts in batches of BATCH_SIZE.
+"""
+import hashlib
+import json
+import re
+import zipfile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+from backend import payload_cache
+from . import images
+from .models import Lesson, Module
+from .uploads import content_path, save_upload, sniff_image_type
+
+
+FORMAT = 'taneyan-modules'
+VERSION = 1
+BATCH_SIZE = 1000
+# Bytes collected before a chunk of the archive is yielded
+CHUNK_SIZE = 64 * 1024
+
+MODULE_FIELDS = ('id', 'title', 'description', 'deadline', 'cover_image', 'is_published')
+LESSON_FIELDS = ('module_id', 'title', 'lesson_type', 'order', 'duration_minutes', 'is_published')
+
+MEDIA_REFERENCE = re.compile(
+    r'(?:https?://[^\s"\'()<>]+?)?' + re.escape(settings.MEDIA_URL) + r'(uploads/[\w\-][\w.\-]*)'
+)
+ARCHIVE_REFERENCE = re.compile(r'media://(uploads/[\w\-][\w.\-]*)')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class _Sink:
+    """Write-only file collecting what zipfile writes until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _unlink(value, media):
+    """Replace links to uploaded images with media:// references, collecting their paths"""
+    if not value:
+        return value
+
+    def replace(match):
+        media.add(match[1])
+        return f'media://{match[1]}'
+    return MEDIA_REFERENCE.sub(replace, value)
+
+
+def _relink(value, media_url, media, renamed):
+    """Replace media:// references with links to the images' content-addressed paths, collecting them"""
+    if not value:
+        return value
+
+    def replace(match):
+        path = renamed[match[1]][0] if match[1] in renamed else match[1]
+        media.add(path)
+        return f'{media_url}{path}'
+    return ARCHIVE_REFERENCE.sub(replace, value)
+
+
+def _hash_media(archive):
+    """
+    (content-addressed path, digest, extension) of every image in the archive,
+    by its exported path. Members that are not PNG, JPEG, GIF or WebP images,
+    are larger than IMAGE_UPLOAD_MAX_SIZE or take the media past
+    ARCHIVE_MEDIA_MAX_SIZE are rejected: the sizes are counted while reading,
+    those in the zip directory can be forged.
+    """
+    renamed = {}
+    total = 0
+    for name in archive.namelist():
+        if not name.startswith('media/uploads/') or name.endswith('/'):
+            continue
+        digest = hashlib.sha256()
+        size = 0
+        with archive.open(name) as member:
+            header = member.read(16)
+            # The stored extension is the sniffed one: a file served as .html or .svg could run scripts
+            extension = sniff_image_type(header)
+            if extension is None:
+                raise ArchiveError(f'{name} is not a PNG, JPEG, GIF or WebP image')
+            chunk = header
+            while chunk:
+                digest.update(chunk)
+                size += len(chunk)
+                total += len(chunk)
+                if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+                    raise ArchiveError(f'{name} is larger than {settings.IMAGE_UPLOAD_MAX_SIZE} bytes')
+                if total > settings.ARCHIVE_MEDIA_MAX_SIZE:
+                    raise ArchiveError(f'The images of the archive are larger than {settings.ARCHIVE_MEDIA_MAX_SIZE} bytes')
+                chunk = member.read(CHUNK_SIZE)
+        path = name[len('media/'):]
+        renamed[path] = (content_path(digest.hexdigest(), extension), digest.hexdigest(), extension)
+    return renamed
+
+
+def _line(data):
+    return (json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def export_archive(modules):
+    """Yield the bytes of the archive of the modules queryset"""
+    modules = modules.order_by('id')
+    lessons = Lesson.objects.filter(module_id__in=modules.values('id')).order_by('module_id', 'order')
+    sink = _Sink()
+    media = set()
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('manifest.json', json.dumps({
+            'format': FORMAT,
+            'version': VERSION,
+            'modules': modules.count(),
+            'lessons': lessons.count(),
+        }))
+
+        with archive.open('modules.ndjson', 'w') as member:
+            for values in modules.values_list(*MODULE_FIELDS).iterator(chunk_size=BATCH_SIZE):
+                module = dict(zip(MODULE_FIELDS, values))
+                module['description'] = _unlink(module['description'], media)
+                module['cover_image'] = _unlink(module['cover_image'], media)
+                member.write(_line(module))
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+
+        with archive.open('lessons.ndjson', 'w') as member:
+            rows = lessons.values_list(*LESSON_FIELDS, 'lesson_content__content').iterator(chunk_size=BATCH_SIZE)
+            for *values, content in rows:
+                lesson = dict(zip(LESSON_FIELDS, values))
+                lesson['content'] = _unlink(content or '', media)
+                member.write(_line(lesson))
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+
+        for path in sorted(media):
+            if not default_storage.exists(path):
+                continue
+            with default_storage.open(path) as source, archive.open(f'media/{path}', 'w') as member:
+                for chunk in source.chunks():
+                    member.write(chunk)
+                    if sink.size >= CHUNK_SIZE:
+                        yield sink.drain()
+
+    yield sink.drain()
+
+
+class _Manifests:
+    """
+    Reads the JSON members of an archive, counting the bytes decompressed:
+    the sizes in the zip directory can be forged, and a small member may
+    inflate to gigabytes.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.size = 0
+
+    def _lines(self, name):
+        with self.archive.open(name) as member:
+            while True:
+                line = member.readline(settings.ARCHIVE_LINE_MAX_SIZE + 1)
+                if not line:
+                    return
+                if len(line) > settings.ARCHIVE_LINE_MAX_SIZE:
+                    raise ArchiveError(f'{name} has a line longer than {settings.ARCHIVE_LINE_MAX_SIZE} bytes')
+                self.size += len(line)
+                if self.size > settings.ARCHIVE_DATA_MAX_SIZE:
+                    raise ArchiveError(f'The data of the archive is larger than {settings.ARCHIVE_DATA_MAX_SIZE} bytes')
+                yield line
+
+    def json(self, name):
+        return json.loads(b''.join(self._lines(name)))
+
+    def ndjson(self, name):
+        for line in self._lines(name):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(items):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_archive(file, author, media_url=None):
+    """
+    Create the modules of an archive, authored by author, with their lessons
+    and images. Modules whose title is taken are skipped with their lessons.
+    media_url prefixes links to the imported images (default MEDIA_URL).
+    """
+    media_url = media_url or settings.MEDIA_URL
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ArchiveError('Not a zip archive')
+
+    with archive:
+        manifests = _Manifests(archive)
+        try:
+            manifest = manifests.json('manifest.json')
+        except ArchiveError:
+            raise
+        except (KeyError, ValueError):
+            raise ArchiveError('The archive has no valid manifest.json')
+        if manifest.get('format') != FORMAT or manifest.get('version') != VERSION:
+            raise ArchiveError(f'Unsupported archive format {manifest.get("format")} {manifest.get("version")}')
+
+        modules = {}  # Exported id -> created module
+        orders = set()  # (exported module id, order) of the lessons read
+        lesson_types = {lesson_type for lesson_type, _ in Lesson.LESSON_TYPE_CHOICES}
+        skipped = []
+        media = set()
+        lessons_count = 0
+        renamed = _hash_media(archive)
+
+        try:
+            with transaction.atomic():
+                for batch in _batches(manifests.ndjson('modules.ndjson')):
+                    taken = set(Module.objects.filter(title__in=[m['title'] for m in batch]).values_list('title', flat=True))
+                    created = []
+                    for data in batch:
+                        if data['title'] in taken:
+                            skipped.append(data['title'])
+                            continue
+                        taken.add(data['title'])
+                        cover_image = _relink(data['cover_image'], media_url, media, renamed)
+                        created.append((data['id'], Module(
+                            title=data['title'],
+                            description=_relink(data['description'], media_url, media, renamed),
+                            deadline=parse_datetime(data['deadline']),
+                            cover_image=cover_image,
+                            # Derivatives of images already on this site, new images get theirs below
+                            cover_image_srcset=images.srcset(cover_image),
+                            is_published=data['is_published'],
+                            author=author,
+                        )))
+                    Module.objects.bulk_create([module for _, module in created])
+                    modules.update(created)
+
+                for batch in _batches(manifests.ndjson('lessons.ndjson')):
+                    for data in batch:
+                        if data['lesson_type'] not in lesson_types:
+                            raise ArchiveError(f'Invalid lesson type {data["lesson_type"]!r}')
+                        if not isinstance(data['order'], int) or (data['module_id'], data['order']) in orders:
+                            raise ArchiveError(f'Module {data["module_id"]} has no unique order {data["order"]!r} for each lesson')
+                        orders.add((data['module_id'], data['order']))
+                    lessons = [
+                        Lesson(
+                            module_id=modules[data['module_id']],
+                            title=data['title'],
+                            lesson_type=data['lesson_type'],
+                            order=data['order'],
+                            duration_minutes=data['duration_minutes'],
+                            is_published=data['is_published'],
+                            content=_relink(data['content'], media_url, media, renamed),
+                        )
+                        for data in batch
+                        if data['module_id'] in modules
+                    ]
+                    Lesson.objects.bulk_create(lessons)
+                    lessons_count += len(lessons)
+        except ArchiveError:
+            raise
+        except IntegrityError:
+            raise ArchiveError('The archive data does not fit the database constraints')
+        except (KeyError, TypeError, ValueError) as e:
+            raise ArchiveError(f'Invalid archive data: {e}')
+
+        # Content-addressed paths, an existing file is the same image
+        media_count = 0
+        sources = {path: (exported, digest, extension) for exported, (path, digest, extension) in renamed.items()}
+        for path in sorted(media):
+            if path in sources and not default_storage.exists(path):
+                exported, digest, extension = sources[path]
+                with archive.open(f'media/{exported}') as source:
+                    save_upload(File(source), extension, digest)
+                media_count += 1
+
+    if modules:
+        # Bulk inserts send no post_save signals
+        payload_cache.invalidate()
+
+    return {
+        'modules': len(modules),
+        'lessons': lessons_count,
+        'media': media_count,
+        'skipped': skipped,
+    }
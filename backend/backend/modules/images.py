@@ -0,0 +1,188 @@
+"""
+Resized WebP/AVIF derivatives of uploaded images.
+
+After an upload, a pool of worker processes writes copies of the image at
+each of WIDTHS (never wider than the original) in every supported format,
+with EXIF, ICC and other metadata stripped, next to the original:
+
+    uploads/<name>.png           the original
+    uploads/<name>-320w.webp     derivatives
+    uploads/<name>-srcset.json   widths built per format, written last
+
+Modules and users pointing at the upload then get a srcset map (format ->
+srcset string) in cover_image_srcset / profile_photo_srcset, filled in when
+they are saved or, if the derivatives were still being built, when the
+worker is done. Pillow is optional: without it IMAGE_DERIVATIVES is off and
+the maps stay empty. The build_image_derivatives command backfills them.
+"""
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+from multiprocessing import get_context
+from threading import Lock
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+WIDTHS = (320, 640, 1280)
+QUALITY = {'webp': 80, 'avif': 60}
+
+UPLOAD_REFERENCE = re.compile(re.escape(settings.MEDIA_URL) + r'(uploads/[\w\-]+\.(?:jpe?g|png|gif|webp))$')
+DERIVATIVE = re.compile(r'^(.+)-(?:\d+w\.(?:webp|avif)|srcset\.json)$')
+
+_pool = None
+_pool_lock = Lock()
+
+
+def is_available():
+    return Image is not None and settings.IMAGE_DERIVATIVES
+
+
+def formats():
+    """Output formats, AVIF only when Pillow was built with it"""
+    return [fmt for fmt in QUALITY if features.check(fmt)]
+
+
+def upload_path(url):
+    """Storage path of the upload url points to, None for any other url"""
+    match = UPLOAD_REFERENCE.search(url or '')
+    return match[1] if match else None
+
+
+def derivative_path(path, width, fmt):
+    return f'{os.path.splitext(path)[0]}-{width}w.{fmt}'
+
+
+def manifest_path(path):
+    return f'{os.path.splitext(path)[0]}-srcset.json'
+
+
+def original_stem(path):
+    """Path without extension of the original image, for originals and their derivatives alike"""
+    match = DERIVATIVE.match(path)
+    return match[1] if match else os.path.splitext(path)[0]
+
+
+def read_manifest(path):
+    try:
+        with default_storage.open(manifest_path(path)) as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def srcset(url, manifest=None):
+    """{"webp": "<url> 320w, <url> 640w", ...} for an uploaded image url, {} when there are no derivatives"""
+    path = upload_path(url)
+    if path is None:
+        return {}
+    manifest = manifest or read_manifest(path)
+    if not manifest:
+        return {}
+    base = url[:-len(os.path.basename(path))]
+    return {
+        fmt: ', '.join(f'{base}{os.path.basename(derivative_path(path, width, fmt))} {width}w' for width in widths)
+        for fmt, widths in manifest.items()
+    }
+
+
+def _write(name, data):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def build(path):
+    """Write the derivatives of the image at path, returns the manifest. Runs in the worker processes."""
+    with default_storage.open(path) as source:
+        image = Image.open(source)
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    # Nothing of the original's metadata is passed on to the derivatives
+    image.info = {}
+
+    widths = sorted({width for width in WIDTHS if width < image.width} | {min(image.width, WIDTHS[-1])})
+    manifest = {}
+    for width in widths:
+        if width == image.width:
+            resized = image
+        else:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt in formats():
+            output = BytesIO()
+            resized.save(output, fmt.upper(), quality=QUALITY[fmt])
+            _write(derivative_path(path, width, fmt), output.getvalue())
+            manifest.setdefault(fmt, []).append(width)
+
+    _write(manifest_path(path), json.dumps(manifest).encode())
+    return manifest
+
+
+def apply(path, manifest):
+    """Fill in the srcset map of the modules and users showing the image at path"""
+    from backend import payload_cache
+    from users.models import User
+    from .models import Module
+
+    updated = 0
+    suffix = settings.MEDIA_URL + path
+    for model, field in ((Module, 'cover_image'), (User, 'profile_photo')):
+        urls = set(model.objects.filter(**{f'{field}__endswith': suffix}).values_list(field, flat=True))
+        for url in urls:
+            updated += model.objects.filter(**{field: url}).update(**{f'{field}_srcset': srcset(url, manifest)})
+    if updated:
+        # Updates send no post_save signals
+        payload_cache.invalidate()
+    return updated
+
+
+def _built(path, future):
+    try:
+        apply(path, future.result())
+    except Exception:
+        logger.exception('Building the derivatives of %s failed', path)
+    finally:
+        # Runs in the pool's management thread, which keeps no connection open
+        connections.close_all()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking a threaded server process is unsafe
+            _pool = ProcessPoolExecutor(
+                settings.IMAGE_DERIVATIVE_WORKERS, mp_context=get_context('spawn'), initializer=django.setup
+            )
+        return _pool
+
+
+def schedule(path):
+    """Build the derivatives of an uploaded image in the background"""
+    if not is_available():
+        return
+    if settings.IMAGE_DERIVATIVE_WORKERS <= 0:
+        try:
+            apply(path, build(path))
+        except Exception:
+            logger.exception('Building the derivatives of %s failed', path)
+        return
+    _get_pool().submit(build, path).add_done_callback(partial(_built, path))
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from modules import images
+from modules.models import Module
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Build the resized derivatives of uploaded cover images and profile photos and fill in their srcset maps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Image processes, 0 to build in this process')
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have derivatives')
+
+    def handle(self, *args, **options):
+        if not images.is_available():
+            raise CommandError('Image derivatives are off: install Pillow and set IMAGE_DERIVATIVES')
+
+        uploads = settings.MEDIA_URL + 'uploads/'
+        urls = [
+            *Module.objects.filter(cover_image__contains=uploads).values_list('cover_image', flat=True).distinct(),
+            *User.objects.filter(profile_photo__contains=uploads).values_list('profile_photo', flat=True).distinct(),
+        ]
+        paths = sorted({path for path in map(images.upload_path, urls) if path})
+
+        manifests = {}
+        missing = []
+        for path in paths:
+            manifest = None if options['force'] else images.read_manifest(path)
+            if manifest is not None:
+                manifests[path] = manifest
+            elif not default_storage.exists(path):
+                self.stdout.write(self.style.WARNING(f'Missing upload {path}'))
+            else:
+                missing.append(path)
+
+        built = failed = 0
+        pool = ProcessPoolExecutor(options['workers']) if options['workers'] else None
+        try:
+            results = pool.map(self.build, missing) if pool else map(self.build, missing)
+            for path, manifest in zip(missing, results):
+                if manifest is None:
+                    self.stdout.write(self.style.WARNING(f'Could not read {path} as an image'))
+                    failed += 1
+                else:
+                    manifests[path] = manifest
+                    built += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        updated = sum(images.apply(path, manifest) for path, manifest in manifests.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Built derivatives of {built} images ({len(manifests) - built} already built, {failed} failed), '
+            f'updated {updated} srcset maps'
+        ))
+
+    @staticmethod
+    def build(path):
+        try:
+            return images.build(path)
+        except (OSError, ValueError):
+            # Not an image Pillow can read
+            return None
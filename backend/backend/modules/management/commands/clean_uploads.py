@@ -0,0 +1,27 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from modules.uploads import UploadSession, unused_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete uploaded images (and their resized copies) no module, lesson or user links to, and expired resumable uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24, help='Keep files younger than this many hours')
+        parser.add_argument('--dry-run', action='store_true', help='List the files without deleting them')
+
+    def handle(self, *args, **options):
+        count = size = 0
+        for path in unused_uploads(options['min_age'] * 60 * 60):
+            count += 1
+            size += default_storage.size(path)
+            if options['dry_run']:
+                self.stdout.write(path)
+            else:
+                default_storage.delete(path)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{count} unused files, {size / 1024 / 1024:.1f}MB'))
+            return
+        UploadSession.delete_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} unused files, {size / 1024 / 1024:.1f}MB'))
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.db.models import Max
+from backend import payload_cache
 from modules.models import Module, Lesson
 
 
@@ -1039,25 +1039,15 @@ for shape in shapes:
                 exam_content = exam_content_templates.get(module.title)
                 
                 if exam_content:
-                    # Create the exam lesson
+                    # Create the exam lesson after the last lesson
                     exam_lesson = Lesson(
-                        module_id=module,
                         title=f"Final Exam - {module.title}",
                         content=exam_content,
                         lesson_type='exam',
-                        order=999,  # Place at the end
                         duration_minutes=120,
                         is_published=True
                     )
-                    exam_lesson.save()
-                    
-                    # Update the order to be the last lesson
-                    max_order = Lesson.objects.filter(module_id=module).aggregate(
-                        Max('order')
-                    )['order__max'] or 0
-                    
-                    exam_lesson.order = max_order + 1
-                    exam_lesson.save()
+                    Lesson.objects.append(module, [exam_lesson])
                     
                     self.stdout.write(
                         f'Created exam for module: {module.title}'
@@ -1072,6 +1062,10 @@ for shape in shapes:
                     f'Module already has exam: {module.title}'
                 )
         
+        if created_exams:
+            # Bulk inserts send no post_save signals
+            payload_cache.invalidate()
+
         self.stdout.write(
             f'Successfully created {created_exams} exams'
         )
\ No newline at end of file
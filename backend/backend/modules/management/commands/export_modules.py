@@ -0,0 +1,37 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from modules.archive import export_archive
+from modules.models import Module
+
+
+class Command(BaseCommand):
+    help = 'Write modules with their lessons, exams and uploaded images to a zip archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Archive file to write, - for stdout')
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these module ids')
+        parser.add_argument('--author', type=str, help='Only the modules of this username')
+
+    def handle(self, *args, **options):
+        modules = Module.objects.all()
+        if options['ids']:
+            modules = modules.filter(id__in=options['ids'])
+        if options['author']:
+            modules = modules.filter(author__username=options['author'])
+        if not modules.exists():
+            raise CommandError('No modules to export')
+
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        written = 0
+        try:
+            for chunk in export_archive(modules):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Exported {modules.count()} modules to {options["output"]} ({written / 1024 / 1024:.2f} MB)'
+            ))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from modules.archive import ArchiveError, import_archive
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Create the modules of an archive written by export_modules; modules whose title exists are skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', type=str, help='Archive file to import')
+        parser.add_argument('--author', type=str, required=True, help='Username of the teacher the modules belong to')
+        parser.add_argument('--media-url', type=str, help='Prefix of links to the imported images (default MEDIA_URL)')
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["author"]}" not found')
+
+        started = time.perf_counter()
+        try:
+            with open(options['archive'], 'rb') as archive:
+                result = import_archive(archive, author, options['media_url'])
+        except (OSError, ArchiveError) as e:
+            raise CommandError(str(e))
+
+        for title in result['skipped']:
+            self.stdout.write(self.style.WARNING(f'Skipped "{title}": a module with this title exists'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result["modules"]} modules, {result["lessons"]} lessons and {result["media"]} images '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from modules import rendering
+from modules.models import LessonContent
+
+
+class Command(BaseCommand):
+    help = 'Render the Markdown of every lesson into the rendered HTML cache, in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Rendering processes, 0 to render in this process')
+        parser.add_argument('--batch-size', type=int, default=500, help='Lessons read, rendered and cached per batch')
+        parser.add_argument('--force', action='store_true', help='Render lessons whose HTML is already cached')
+
+    def handle(self, *args, **options):
+        if not rendering.is_available():
+            raise CommandError('HTML rendering is off: install Markdown and set LESSON_HTML_RENDERING')
+
+        rows = (
+            LessonContent.objects.filter(lesson__lesson_type='lesson')
+            .values_list('content_hash', 'content')
+            .iterator(chunk_size=options['batch_size'])
+        )
+        pool = ProcessPoolExecutor(options['workers']) if options['workers'] else None
+        rendered = skipped = 0
+        try:
+            batch = {}
+            for digest, content in rows:
+                batch[digest or rendering.content_hash(content)] = content
+                if len(batch) >= options['batch_size']:
+                    done, cached = self.render_batch(batch, pool, options['force'])
+                    rendered, skipped = rendered + done, skipped + cached
+                    batch = {}
+            done, cached = self.render_batch(batch, pool, options['force'])
+            rendered, skipped = rendered + done, skipped + cached
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} lesson bodies, {skipped} already cached'))
+
+    def render_batch(self, batch, pool, force):
+        """Render the bodies of batch (content by hash) missing from the cache; returns (rendered, skipped)"""
+        cache = caches['rendered']
+        keys = {digest: rendering.cache_key(digest) for digest in batch}
+        cached = set() if force else set(cache.get_many(keys.values()))
+        missing = [digest for digest, key in keys.items() if key not in cached]
+        if not missing:
+            return 0, len(batch)
+
+        contents = [batch[digest] for digest in missing]
+        if pool is None:
+            html = map(rendering.render_html, contents)
+        else:
+            html = pool.map(rendering.render_html, contents, chunksize=16)
+        cache.set_many({keys[digest]: value for digest, value in zip(missing, html)}, None)
+        self.stdout.write(f'Rendered {len(missing)} lesson bodies')
+        return len(missing), len(batch) - len(missing)
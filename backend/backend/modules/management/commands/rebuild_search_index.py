@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from modules import search
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the full-text search documents of every module and lesson'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} modules and lessons'))
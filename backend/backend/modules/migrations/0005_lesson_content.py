@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_content(apps, schema_editor):
+    # One INSERT ... SELECT: the bodies never pass through Python
+    Lesson = apps.get_model('modules', 'Lesson')
+    LessonContent = apps.get_model('modules', 'LessonContent')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'INSERT INTO {quote(LessonContent._meta.db_table)} ({quote("lesson_id")}, {quote("content")}) '
+        f'SELECT {quote("id")}, {quote("content")} FROM {quote(Lesson._meta.db_table)}'
+    )
+
+
+def copy_content_back(apps, schema_editor):
+    Lesson = apps.get_model('modules', 'Lesson')
+    LessonContent = apps.get_model('modules', 'LessonContent')
+    for lesson_id, content in LessonContent.objects.values_list('lesson_id', 'content').iterator(chunk_size=1000):
+        Lesson.objects.filter(id=lesson_id).update(content=content)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0004_rename_author_id_module_author'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonContent',
+            fields=[
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lesson_content', serialize=False, to='modules.lesson')),
+                ('content', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(copy_content, reverse_code=copy_content_back),
+        # A default lets the column be added back to existing rows when migrating backwards
+        migrations.AlterField(
+            model_name='lesson',
+            name='content',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='lesson',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:10
+
+import hashlib
+from django.db import migrations, models
+
+
+def fill_content_hash(apps, schema_editor):
+    LessonContent = apps.get_model('modules', 'LessonContent')
+    batch = []
+    for lesson_content in LessonContent.objects.only('pk', 'content').iterator(chunk_size=1000):
+        lesson_content.content_hash = hashlib.sha256(lesson_content.content.encode('utf-8')).hexdigest()
+        batch.append(lesson_content)
+        if len(batch) == 1000:
+            LessonContent.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    LessonContent.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0005_lesson_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessoncontent',
+            name='content_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hash, reverse_code=migrations.RunPython.noop),
+    ]
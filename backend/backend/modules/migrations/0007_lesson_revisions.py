@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0006_lessoncontent_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonBody',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='modules.lessonbody')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LessonRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('body', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='revisions', to='modules.lessonbody')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='modules.lesson')),
+            ],
+            options={
+                'ordering': ['lesson', 'number'],
+                'unique_together': {('lesson', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0007_lesson_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='cover_image_srcset',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
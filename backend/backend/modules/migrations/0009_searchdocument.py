@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from modules import search
+
+
+def copy_documents(apps, schema_editor):
+    # INSERT ... SELECT as in 0005, the texts never pass through Python
+    Module = apps.get_model('modules', 'Module')
+    Lesson = apps.get_model('modules', 'Lesson')
+    LessonContent = apps.get_model('modules', 'LessonContent')
+    SearchDocument = apps.get_model('modules', 'SearchDocument')
+    quote = schema_editor.quote_name
+    documents = quote(SearchDocument._meta.db_table)
+    schema_editor.execute(
+        f'INSERT INTO {documents} ({quote("module_id")}, {quote("lesson_id")}, {quote("title")}, {quote("body")}) '
+        f'SELECT {quote("id")}, NULL, {quote("title")}, COALESCE({quote("description")}, \'\') '
+        f'FROM {quote(Module._meta.db_table)}'
+    )
+    schema_editor.execute(
+        f'INSERT INTO {documents} ({quote("module_id")}, {quote("lesson_id")}, {quote("title")}, {quote("body")}) '
+        f'SELECT l.{quote("module_id_id")}, l.{quote("id")}, l.{quote("title")}, COALESCE(c.{quote("content")}, \'\') '
+        f'FROM {quote(Lesson._meta.db_table)} l LEFT JOIN {quote(LessonContent._meta.db_table)} c '
+        f'ON c.{quote("lesson_id")} = l.{quote("id")}'
+    )
+
+
+def create_index(apps, schema_editor):
+    # After the copy: building the index once is faster than updating it per row
+    search.create_index(schema_editor, apps.get_model('modules', 'SearchDocument'))
+
+
+def drop_index(apps, schema_editor):
+    search.drop_index(schema_editor, apps.get_model('modules', 'SearchDocument'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0008_module_cover_image_srcset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('lesson', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='modules.lesson')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='modules.module')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('lesson', None)), fields=('module',), name='unique_module_search_document')],
+            },
+        ),
+        migrations.RunPython(copy_documents, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(create_index, reverse_code=drop_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modules', '0009_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='module',
+            name='title',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='module',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at', None)), fields=('title',), name='unique_module_title'),
+        ),
+    ]
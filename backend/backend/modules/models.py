@@ -1,34 +1,86 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Max, Q
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from users.models import User
+from . import images, rendering, revisions, search
+
+
+class ModuleQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Also add the modules to the search index"""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        search.index_modules(objs, replace=False)
+        return objs
+
+    def with_lesson_counts(self):
+        """Annotate lesson and exam counts so listing modules doesn't query them per module"""
+        return self.annotate(
+            lessons_count=Count('lessons', distinct=True),
+            exam_count=Count('lessons', filter=Q(lessons__lesson_type='exam'), distinct=True)
+        )
+
+
+class ModuleManager(models.Manager.from_queryset(ModuleQuerySet)):
+    def get_queryset(self):
+        # Soft deleted modules wait for backend.purge, hidden from everything but it
+        return super().get_queryset().filter(deleted_at=None)
 
 
 class Module(models.Model):
-    title = models.CharField(max_length=255, unique=True)
+    title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     deadline = models.DateTimeField()
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='modules')
     cover_image = models.URLField(max_length=500, blank=True, null=True)
+    # Resized copies of an uploaded cover image, format -> srcset (see modules.images)
+    cover_image_srcset = models.JSONField(default=dict, blank=True, editable=False)
     is_published = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True, editable=False)
     date_updated = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ModuleManager()
 
     class Meta:
         ordering = ['-date_created']
+        constraints = [
+            # A soft deleted module gives its title up right away
+            models.UniqueConstraint(fields=['title'], condition=Q(deleted_at=None), name='unique_module_title'),
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'cover_image' in update_fields:
+            self.cover_image_srcset = images.srcset(self.cover_image)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'cover_image_srcset'}
+        super().save(*args, **kwargs)
     
+    def soft_delete(self):
+        """Hide the module until backend.purge deletes it with its lessons and activities"""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
     def get_lessons_count(self):
         """Get the number of lessons in this module"""
+        if hasattr(self, 'lessons_count'):
+            return self.lessons_count
         return self.lessons.count()
     
     def has_exam(self):
         """Check if module has at least one exam lesson"""
+        if hasattr(self, 'exam_count'):
+            return self.exam_count > 0
         return self.lessons.filter(lesson_type='exam').exists()
     
     def get_exam_count(self):
         """Get the number of exam lessons in this module"""
+        if hasattr(self, 'exam_count'):
+            return self.exam_count
         return self.lessons.filter(lesson_type='exam').count()
     
     def clean(self):
@@ -43,6 +95,64 @@ class Module(models.Model):
                 )
 
 
+class LessonQuerySet(models.QuerySet):
+    def visible(self):
+        """Skip the lessons of soft deleted modules, which wait for backend.purge"""
+        return self.filter(module_id__deleted_at=None)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Also insert the bodies of lessons created with a content, and index the lessons"""
+        objs = super().bulk_create(objs, *args, **kwargs)
+        contents = LessonContent.objects.bulk_create(
+            [
+                LessonContent.for_content(lesson, lesson.__dict__.pop('_new_content'))
+                for lesson in objs
+                if '_new_content' in lesson.__dict__
+            ],
+            batch_size=kwargs.get('batch_size')
+        )
+        search.index_lessons(
+            objs, {lesson_content.lesson_id: lesson_content.content for lesson_content in contents}, replace=False
+        )
+        return objs
+
+    def reorder(self, module, lesson_ids):
+        """
+        Number the lessons of module 1, 2, ... in the order of lesson_ids, which
+        must list each of them once. Two statements whatever the number of lessons.
+        """
+        with transaction.atomic():
+            # Serializes concurrent reorders and appends of the module
+            Module.objects.select_for_update().filter(pk=module.pk).first()
+            lessons = {lesson.id: lesson for lesson in self.filter(module_id=module).only('id', 'order')}
+            if len(lesson_ids) != len(lessons) or set(lesson_ids) != set(lessons):
+                raise ValidationError('The order must list every lesson of the module exactly once.')
+
+            changed = []
+            for position, lesson_id in enumerate(lesson_ids, start=1):
+                lesson = lessons[lesson_id]
+                if lesson.order != position:
+                    lesson.order = position
+                    changed.append(lesson)
+            if changed:
+                # (module_id, order) is checked row by row, so a swap in one UPDATE
+                # collides: move the rows to distinct negative orders first.
+                # Unchanged rows keep positive orders and cannot collide with them.
+                self.filter(id__in=[lesson.id for lesson in changed]).update(order=-F('id'))
+                self.bulk_update(changed, ['order'])
+            return len(changed)
+
+    def append(self, module, lessons):
+        """Insert lessons after the last lesson of module, in one INSERT"""
+        with transaction.atomic():
+            Module.objects.select_for_update().filter(pk=module.pk).first()
+            last = self.filter(module_id=module).aggregate(Max('order'))['order__max'] or 0
+            for position, lesson in enumerate(lessons, start=last + 1):
+                lesson.module_id = module
+                lesson.order = position
+            return self.bulk_create(lessons)
+
+
 class Lesson(models.Model):
     LESSON_TYPE_CHOICES = [
         ('lesson', 'Lesson'),
@@ -51,7 +161,6 @@ class Lesson(models.Model):
     
     module_id = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='lessons')
     title = models.CharField(max_length=255)
-    content = models.TextField()  # Markdown content
     lesson_type = models.CharField(max_length=10, choices=LESSON_TYPE_CHOICES, default='lesson')
     order = models.IntegerField(default=0)
     duration_minutes = models.IntegerField(default=30, help_text="Estimated duration in minutes")
@@ -59,9 +168,167 @@ class Lesson(models.Model):
     date_created = models.DateTimeField(auto_now_add=True, editable=False)
     date_updated = models.DateTimeField(auto_now=True)
 
+    objects = LessonQuerySet.as_manager()
+
     class Meta:
         ordering = ['module_id', 'order']
         unique_together = ['module_id', 'order']
 
     def __str__(self):
-        return f"{self.module_id.title} - {self.title}"
\ No newline at end of file
+        return f"{self.module_id.title} - {self.title}"
+
+    @property
+    def content(self):
+        """
+        Markdown content, stored in LessonContent so list, ordering and count
+        queries never read it. Use select_related('lesson_content') when loading
+        lessons whose content is needed.
+        """
+        if '_new_content' in self.__dict__:
+            return self._new_content
+        try:
+            return self.lesson_content.content
+        except LessonContent.DoesNotExist:
+            return ''
+
+    @content.setter
+    def content(self, value):
+        # Written by save()
+        self._new_content = value
+
+    def stored_content_hash(self):
+        """Hash of the saved content, None when the lesson has none"""
+        if 'lesson_content' in self._state.fields_cache:
+            lesson_content = self._state.fields_cache['lesson_content']
+            return lesson_content and lesson_content.content_hash
+        return LessonContent.objects.filter(lesson=self).values_list('content_hash', flat=True).first()
+
+    def save(self, *args, **kwargs):
+        if '_new_content' not in self.__dict__:
+            return super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        # Before for_content(), which caches the new row on this lesson
+        stored_hash = None if adding else self.stored_content_hash()
+        lesson_content = LessonContent.for_content(self, self.__dict__.pop('_new_content'))
+        if not adding and lesson_content.content_hash == stored_hash:
+            # Same content: no new revision and no rewrite of the body
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            LessonRevision.record(self, lesson_content)
+            lesson_content.save(force_insert=adding, using=kwargs.get('using'))
+            self.lesson_content = lesson_content
+
+        if self.lesson_type == 'lesson':
+            rendering.prerender(lesson_content.content, lesson_content.content_hash)
+
+
+class LessonContent(models.Model):
+    """Markdown body of a lesson (JSON questions for exams), kept out of the lesson rows"""
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, primary_key=True, related_name='lesson_content')
+    content = models.TextField()  # Markdown content
+    # SHA-256 of content, the key of its rendered HTML (see rendering.py)
+    content_hash = models.CharField(max_length=64, default='')
+
+    @classmethod
+    def for_content(cls, lesson, content):
+        return cls(lesson=lesson, content=content, content_hash=rendering.content_hash(content))
+
+    def __str__(self):
+        return f"Content of {self.lesson}"
+
+
+class LessonBody(models.Model):
+    """
+    A lesson body, stored once however many revisions or lessons have it:
+    compressed in full, or as a delta against the body of the previous revision
+    """
+    content_hash = models.CharField(max_length=64, primary_key=True)
+    base = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    depth = models.PositiveIntegerField(default=0)  # Deltas between this body and a full one
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()  # Characters of the content
+
+    @classmethod
+    def store(cls, content, digest, previous=None):
+        """
+        The body with content, created as a delta against previous when that
+        is smaller. Called in the transaction saving the revision: the body
+        found is locked so that purge_lesson_bodies() cannot delete it first.
+        """
+        body = cls.objects.select_for_update().filter(content_hash=digest).first()
+        if body is not None:
+            return body
+
+        body = cls(content_hash=digest, data=revisions.compress(content), size=len(content))
+        if previous is not None and previous.depth < revisions.MAX_DELTA_DEPTH:
+            delta = revisions.encode_delta(previous.get_content(), content)
+            if len(delta) < len(body.data):
+                body.base, body.depth, body.data = previous, previous.depth + 1, delta
+        try:
+            # In a savepoint: a concurrent save of the same content may insert it first
+            with transaction.atomic():
+                body.save(force_insert=True)
+        except IntegrityError:
+            return cls.objects.get(content_hash=digest)
+        return body
+
+    def get_content(self):
+        chain = [self]
+        while chain[-1].base_id is not None:
+            chain.append(chain[-1].base)
+        content = revisions.decompress(chain[-1].data)
+        for body in reversed(chain[:-1]):
+            content = revisions.apply_delta(content, body.data)
+        return content
+
+
+class LessonRevision(models.Model):
+    """A saved version of a lesson's content"""
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    body = models.ForeignKey(LessonBody, on_delete=models.PROTECT, related_name='revisions')
+    date_created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        ordering = ['lesson', 'number']
+        unique_together = ['lesson', 'number']
+
+    def __str__(self):
+        return f"{self.lesson} - revision {self.number}"
+
+    @classmethod
+    def record(cls, lesson, lesson_content):
+        """Add the revision for lesson_content, called before it replaces the saved content"""
+        last = cls.objects.filter(lesson=lesson).select_related('body').order_by('-number').first()
+        if last is None:
+            # Lessons created before revisions existed: keep the replaced content as revision 1
+            current = LessonContent.objects.filter(lesson=lesson).values_list('content', 'content_hash').first()
+            if current is not None:
+                content, digest = current
+                body = LessonBody.store(content, digest or rendering.content_hash(content))
+                last = cls.objects.create(lesson=lesson, number=1, body=body)
+
+        body = LessonBody.store(lesson_content.content, lesson_content.content_hash, last and last.body)
+        return cls.objects.create(lesson=lesson, number=last.number + 1 if last else 1, body=body)
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of a module (lesson empty) or of a lesson, kept in sync
+    on save and indexed by the database's full-text search (see search.py)
+    """
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='+')
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['module'], condition=Q(lesson=None), name='unique_module_search_document'),
+        ]
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,191 @@
+"""
+Server-side rendering of lesson Markdown to sanitized HTML.
+
+Lessons are rendered when they are saved (and by the rebuild_lesson_html
+command) into the 'rendered' cache, keyed by the SHA-256 of the Markdown, so
+lessons with the same body share one entry and an edit never serves stale
+HTML. Code blocks are highlighted by Pygments with CSS classes; the frontend
+ships the matching stylesheet (pygmentize -S default -f html -a .codehilite).
+
+The Markdown package is optional: without it LESSON_HTML_RENDERING is off and
+lessons are only served as Markdown.
+"""
+import hashlib
+from html import escape
+from html.parser import HTMLParser
+from django.conf import settings
+from django.core.cache import caches
+from backend import metrics
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+
+# Bump when the rendered output changes, entries of older versions are then ignored
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite', 'tables', 'sane_lists']
+MARKDOWN_EXTENSION_CONFIGS = {
+    'codehilite': {'css_class': 'codehilite', 'guess_lang': False},
+}
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'del', 'div', 'dl', 'dt', 'em',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img', 'li', 'ol', 'p', 'pre', 's',
+    'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped together with their content
+DROPPED_TAGS = {'script', 'style', 'object', 'embed', 'template', 'textarea', 'select', 'title', 'noscript'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'iframe': {'src', 'width', 'height', 'title', 'frameborder', 'allowfullscreen'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'ol': {'start'},
+    'td': {'align'},
+    'th': {'align'},
+    # Pygments output
+    'code': {'class'},
+    'div': {'class'},
+    'pre': {'class'},
+    'span': {'class'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'http', 'https', 'mailto'}
+BOOLEAN_ATTRIBUTES = {'allowfullscreen'}
+# Lessons embed videos; iframes from anywhere else are dropped with their content
+EMBED_PREFIXES = (
+    'https://www.youtube.com/embed/',
+    'https://www.youtube-nocookie.com/embed/',
+    'https://player.vimeo.com/video/',
+)
+
+
+def is_available():
+    return markdown is not None and settings.LESSON_HTML_RENDERING
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _safe_url(url):
+    """Relative URLs and the allowed schemes only, so no javascript: or data: links"""
+    # Browsers ignore whitespace and control characters inside the scheme
+    normalized = ''.join(c for c in url if c > ' ').lower()
+    scheme, colon, _ = normalized.partition(':')
+    if not colon or any(c in scheme for c in '/?#'):
+        return True
+    return scheme in ALLOWED_SCHEMES
+
+
+def _allowed_embed(attrs):
+    src = dict(attrs).get('src') or ''
+    return src.startswith(EMBED_PREFIXES)
+
+
+class Sanitizer(HTMLParser):
+    """Keep the allowed tags and attributes, escape all text, drop everything else"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS or (tag == 'iframe' and (self.dropping or not _allowed_embed(attrs))):
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed:
+                continue
+            if value is None:
+                if name in BOOLEAN_ATTRIBUTES:
+                    parts.append(name)
+                continue
+            if name in URL_ATTRIBUTES and not _safe_url(value):
+                continue
+            parts.append(f'{name}="{escape(value)}"')
+        if tag == 'a':
+            parts.append('rel="nofollow noopener noreferrer"')
+        self.output.append(f'<{" ".join(parts)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS or (tag == 'iframe' and self.dropping):
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close the tags left open inside this one
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.output.append(f'</{self.open_tags.pop()}>')
+        return ''.join(self.output)
+
+
+def sanitize(html):
+    sanitizer = Sanitizer()
+    sanitizer.feed(html)
+    return sanitizer.close()
+
+
+def render_html(content):
+    """Sanitized HTML of Markdown content"""
+    html = markdown.markdown(
+        content,
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+        output_format='html',
+    )
+    return sanitize(html)
+
+
+def cache_key(digest):
+    return f'lesson-html:{RENDERER_VERSION}:{digest}'
+
+
+def prerender(content, digest=None):
+    """Render content into the cache, called when a lesson is saved"""
+    if not is_available():
+        return
+    digest = digest or content_hash(content)
+    caches['rendered'].set(cache_key(digest), render_html(content), None)
+
+
+def get_html(content, digest=None):
+    """HTML of content from the cache, rendered and cached on a miss"""
+    digest = digest or content_hash(content)
+    key = cache_key(digest)
+    html = caches['rendered'].get(key)
+    metrics.record_cache('lesson_html', html is not None)
+    if html is None:
+        html = render_html(content)
+        caches['rendered'].set(key, html, None)
+    return html
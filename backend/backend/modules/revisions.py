@@ -0,0 +1,56 @@
+"""
+Line deltas between lesson bodies.
+
+A delta is the zlib compressed JSON list of operations rebuilding the new text
+from the base text: [start, end] copies base lines start to end, a string is
+inserted as is. Lessons are mostly edited a few lines at a time, so a delta
+against the previous revision is a small fraction of the compressed text.
+"""
+import difflib
+import json
+import zlib
+
+
+# Deltas in a row before a body is stored in full again, bounding the work of reading one
+MAX_DELTA_DEPTH = 16
+
+
+def compress(text):
+    return zlib.compress(text.encode('utf-8'), 9)
+
+
+def decompress(data):
+    return zlib.decompress(data).decode('utf-8')
+
+
+def encode_delta(base, text):
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    operations = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j2 > j1:
+            operations.append(''.join(lines[j1:j2]))
+    return zlib.compress(json.dumps(operations, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def apply_delta(base, delta):
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(
+        operation if isinstance(operation, str) else ''.join(base_lines[operation[0]:operation[1]])
+        for operation in json.loads(zlib.decompress(delta))
+    )
+
+
+def unified_diff(old, new, old_label, new_label, context=3):
+    """Unified diff of two bodies and the number of added and removed lines"""
+    lines = list(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=old_label, tofile=new_label, n=context
+    ))
+    added = sum(1 for line in lines if line.startswith('+') and not line.startswith('+++'))
+    removed = sum(1 for line in lines if line.startswith('-') and not line.startswith('---'))
+    # Lines without a final newline would run into the next one
+    return ''.join(line if line.endswith('\n') else line + '\n' for line in lines), added, removed
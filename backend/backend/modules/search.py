@@ -0,0 +1,228 @@
+"""
+Full-text search over module titles and descriptions and lesson titles and content.
+
+Every module and lesson has a SearchDocument row, written when it is saved or
+bulk created and deleted with it. The database indexes those rows:
+
+- SQLite: the FTS5 table modules_search (external content, kept in sync by
+  triggers on the documents table), ranked with bm25.
+- PostgreSQL: a GIN index on the weighted tsvector of title and body, ranked
+  with ts_rank.
+
+Text is tokenized without stemming (FTS5 unicode61, PostgreSQL 'simple'),
+which suits Indonesian and English alike; every search term matches as a
+prefix, so "pemrog" finds "pemrograman". Titles weigh more than bodies.
+"""
+import re
+from html import escape
+from django.db import connection
+
+FTS_TABLE = 'modules_search'
+GIN_INDEX = 'modules_search_vector'
+CONFIG = 'simple'
+# bm25 / setweight weights of title and body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+MAX_TERMS = 8
+SNIPPET_WORDS = 24
+BATCH_SIZE = 1000
+
+# Marks of the matched terms, replaced by <mark> once the text is escaped
+START, STOP = '\x02', '\x03'
+TERM = re.compile(r'[^\W_]+')
+
+
+def terms(query):
+    """Lowercased words of query, the only part of it that reaches the database"""
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def highlight(text):
+    """Escape text for HTML and turn the match marks into <mark> tags"""
+    return escape(text or '', quote=False).replace(START, '<mark>').replace(STOP, '</mark>')
+
+
+def document(module=None, lesson=None, body=None):
+    from .models import SearchDocument
+
+    if lesson is not None:
+        return SearchDocument(
+            module_id=lesson.module_id_id, lesson_id=lesson.id, title=lesson.title,
+            body=lesson.content if body is None else body,
+        )
+    return SearchDocument(module_id=module.id, title=module.title, body=module.description or '')
+
+
+def index_modules(modules, replace=True):
+    """Add the documents of modules, replacing their current ones unless the modules were just created"""
+    from .models import SearchDocument
+
+    if replace:
+        SearchDocument.objects.filter(module_id__in=[module.id for module in modules], lesson=None).delete()
+    SearchDocument.objects.bulk_create([document(module=module) for module in modules], batch_size=BATCH_SIZE)
+
+
+def index_lessons(lessons, contents=None, replace=True):
+    """Like index_modules(); contents maps lesson ids to their content, lesson.content by default"""
+    from .models import SearchDocument
+
+    if replace:
+        SearchDocument.objects.filter(lesson_id__in=[lesson.id for lesson in lessons]).delete()
+    SearchDocument.objects.bulk_create(
+        [document(lesson=lesson, body=None if contents is None else contents.get(lesson.id, '')) for lesson in lessons],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def rebuild():
+    """Rewrite every document from the modules and lessons, returns how many were written"""
+    from .models import Lesson, Module, SearchDocument
+
+    SearchDocument.objects.all().delete()
+    count = 0
+    modules = Module.objects.only('id', 'title', 'description').order_by('id')
+    batch = []
+    for module in modules.iterator(chunk_size=BATCH_SIZE):
+        batch.append(document(module=module))
+        if len(batch) == BATCH_SIZE:
+            count += len(SearchDocument.objects.bulk_create(batch))
+            batch = []
+    count += len(SearchDocument.objects.bulk_create(batch))
+
+    lessons = Lesson.objects.visible().values_list('id', 'module_id', 'title', 'lesson_content__content').order_by('id')
+    batch = []
+    for lesson_id, module_id, title, content in lessons.iterator(chunk_size=BATCH_SIZE):
+        batch.append(SearchDocument(module_id=module_id, lesson_id=lesson_id, title=title, body=content or ''))
+        if len(batch) == BATCH_SIZE:
+            count += len(SearchDocument.objects.bulk_create(batch))
+            batch = []
+    count += len(SearchDocument.objects.bulk_create(batch))
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('title', weight='A', config=CONFIG)
+        + SearchVector('body', weight='B', config=CONFIG)
+    )
+
+
+def create_index(schema_editor, model):
+    """Create the full-text index of the SearchDocument model, used by the migration"""
+    table = model._meta.db_table
+    if schema_editor.connection.vendor == 'sqlite':
+        columns = 'title, body'
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        delete = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, old.title, old.body);"
+        insert = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, new.title, new.body);"
+        schema_editor.execute(f"CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        schema_editor.execute(f"CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        schema_editor.execute(f"CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END")
+        # Index the rows already in the table
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif schema_editor.connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+
+        # The same expression as _search_postgresql(), so the planner uses the index
+        schema_editor.add_index(model, GinIndex(search_vector(), name=GIN_INDEX))
+
+
+def drop_index(schema_editor, model):
+    if schema_editor.connection.vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+
+
+def _visible(user):
+    """SQL condition and parameters: published content, plus everything for staff and a teacher's own modules, never soft deleted modules"""
+    if user.is_staff:
+        return 'm.deleted_at IS NULL', []
+    return 'm.deleted_at IS NULL AND ((m.is_published AND (d.lesson_id IS NULL OR l.is_published)) OR m.author_id = %s)', [user.id]
+
+
+def _search_sqlite(words, user, kind, limit, offset):
+    from .models import Lesson, Module, SearchDocument
+
+    match = ' '.join(f'"{word}"*' for word in words)
+    visible, visible_params = _visible(user)
+    if kind is not None:
+        visible += ' AND d.lesson_id IS NULL' if kind == 'module' else ' AND d.lesson_id IS NOT NULL'
+    sql = f"""
+        SELECT d.module_id, d.lesson_id, m.title,
+               highlight({FTS_TABLE}, 0, %s, %s),
+               snippet({FTS_TABLE}, 1, %s, %s, '…', {SNIPPET_WORDS}),
+               bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank
+        FROM {FTS_TABLE}
+        JOIN {SearchDocument._meta.db_table} d ON d.id = {FTS_TABLE}.rowid
+        JOIN {Module._meta.db_table} m ON m.id = d.module_id
+        LEFT JOIN {Lesson._meta.db_table} l ON l.id = d.lesson_id
+        WHERE {FTS_TABLE} MATCH %s AND {visible}
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [START, STOP, START, STOP, match, *visible_params, limit, offset])
+        # bm25 is lower for better matches
+        return [(*row[:5], -row[5]) for row in cursor.fetchall()]
+
+
+def _search_postgresql(words, user, kind, limit, offset):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+    from django.db.models import Q
+    from .models import SearchDocument
+
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=CONFIG)
+    vector = search_vector()
+    documents = SearchDocument.objects.annotate(search=vector).filter(search=query, module__deleted_at=None)
+    if not user.is_staff:
+        documents = documents.filter(
+            Q(module__is_published=True) & (Q(lesson=None) | Q(lesson__is_published=True))
+            | Q(module__author=user)
+        )
+    if kind is not None:
+        documents = documents.filter(lesson__isnull=kind == 'module')
+    rows = documents.annotate(
+        rank=SearchRank(vector, query, weights=[0.0, 0.0, BODY_WEIGHT / TITLE_WEIGHT, 1.0]),
+        title_highlight=SearchHeadline('title', query, config=CONFIG, start_sel=START, stop_sel=STOP, highlight_all=True),
+        snippet=SearchHeadline(
+            'body', query, config=CONFIG, start_sel=START, stop_sel=STOP,
+            max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2, fragment_delimiter=' … ', max_fragments=2,
+        ),
+    ).order_by('-rank', 'id').values_list('module_id', 'lesson_id', 'module__title', 'title_highlight', 'snippet', 'rank')
+    return list(rows[offset:offset + limit])
+
+
+def search(query, user, kind=None, limit=20, offset=0):
+    """Best matches of query first, as dicts for the API; kind 'module' or 'lesson' limits the results to one type"""
+    words = terms(query)
+    if not words:
+        return []
+    if connection.vendor == 'postgresql':
+        rows = _search_postgresql(words, user, kind, limit, offset)
+    else:
+        rows = _search_sqlite(words, user, kind, limit, offset)
+
+    return [
+        {
+            'type': 'module' if lesson_id is None else 'lesson',
+            'id': module_id if lesson_id is None else lesson_id,
+            'module_id': module_id,
+            'module_title': module_title,
+            'title': highlight(title),
+            'snippet': highlight(snippet),
+            'rank': round(rank, 6),
+        }
+        for module_id, lesson_id, module_title, title, snippet, rank in rows
+    ]
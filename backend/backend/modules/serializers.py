@@ -1,23 +1,65 @@
-from rest_framework.serializers import ModelSerializer, SerializerMethodField, CharField
+from rest_framework.serializers import ModelSerializer, SerializerMethodField, CharField, IntegerField
+from . import rendering
 from .models import (
     Lesson,
+    LessonRevision,
     Module
 )
 
 
 class LessonSerializer(ModelSerializer):
+    """Serializer for a lesson with its content, load lessons with select_related('lesson_content')"""
+    content = CharField(source='lesson_content.content', read_only=True)
+
     class Meta:
         model = Lesson
         fields = ["id", "title", "content", "lesson_type", "order", "duration_minutes", "is_published", "module_id", "date_created", "date_updated"]
         read_only_fields = ["id", "date_created", "date_updated"]
 
 
+class LessonSummarySerializer(ModelSerializer):
+    """Serializer for lessons in lists, without the content"""
+    class Meta:
+        model = Lesson
+        fields = ["id", "title", "lesson_type", "order", "duration_minutes", "is_published", "module_id", "date_created", "date_updated"]
+        read_only_fields = ["id", "date_created", "date_updated"]
+
+
 class LessonCreateUpdateSerializer(ModelSerializer):
     """Serializer for creating and updating lessons"""
+    content = CharField()
+
     class Meta:
         model = Lesson
         fields = ["title", "content", "lesson_type", "order", "duration_minutes", "is_published", "module_id"]
 
+    def update(self, instance, validated_data):
+        """Re-saving what is stored (content compared by hash) writes nothing and keeps the caches"""
+        content = validated_data.get('content')
+        if content is not None and rendering.content_hash(content) == instance.stored_content_hash():
+            del validated_data['content']
+        if all(getattr(instance, name) == value for name, value in validated_data.items()):
+            return instance
+        return super().update(instance, validated_data)
+
+
+class LessonImportSerializer(ModelSerializer):
+    """A lesson added by the bulk endpoint, which sets its module and order"""
+    content = CharField()
+
+    class Meta:
+        model = Lesson
+        fields = ["title", "content", "lesson_type", "duration_minutes", "is_published"]
+
+
+class LessonRevisionSerializer(ModelSerializer):
+    content_hash = CharField(source='body.content_hash', read_only=True)
+    size = IntegerField(source='body.size', read_only=True)
+
+    class Meta:
+        model = LessonRevision
+        fields = ["number", "content_hash", "size", "date_created"]
+
 
 class ModuleSerializer(ModelSerializer):
     author_name = CharField(source='author.full_name', read_only=True)
@@ -28,7 +70,7 @@ class ModuleSerializer(ModelSerializer):
     class Meta:
         model = Module
         fields = ["id", "title", "description", "deadline", "author", "author_name", 
-                  "cover_image", "is_published", "lessons_count", "has_exam", "exam_count", 
+                  "cover_image", "cover_image_srcset", "is_published", "lessons_count", "has_exam", "exam_count", 
                   "date_created", "date_updated"]
         read_only_fields = ["id", "author_name", "lessons_count", "has_exam", "exam_count", 
                             "date_created", "date_updated"]
@@ -46,12 +88,12 @@ class ModuleSerializer(ModelSerializer):
 class ModuleWithLessonsSerializer(ModelSerializer):
     """Serializer for module with nested lessons"""
     author_name = CharField(source='author.full_name', read_only=True)
-    lessons = LessonSerializer(many=True, read_only=True)
+    lessons = LessonSummarySerializer(many=True, read_only=True)
     
     class Meta:
         model = Module
         fields = ["id", "title", "description", "deadline", "author", "author_name", 
-                  "cover_image", "is_published", "lessons", "date_created", "date_updated"]
+                  "cover_image", "cover_image_srcset", "is_published", "lessons", "date_created", "date_updated"]
 
 
 class ModuleWithProgressSerializer(ModelSerializer):
@@ -65,7 +107,7 @@ class ModuleWithProgressSerializer(ModelSerializer):
     class Meta:
         model = Module
         fields = ["id", "title", "description", "deadline", "author", "author_name", 
-                  "cover_image", "is_published", "lessons_count", "has_exam", "exam_count", 
+                  "cover_image", "cover_image_srcset", "is_published", "lessons_count", "has_exam", "exam_count", 
                   "date_created", "date_updated", "progress"]
         read_only_fields = ["id", "author_name", "lessons_count", "has_exam", "exam_count", 
                             "date_created", "date_updated"]
@@ -81,6 +123,10 @@ class ModuleWithProgressSerializer(ModelSerializer):
     
     def get_progress(self, obj):
         """Get user's progress for this module"""
+        # Views listing many modules load the user's progress once, keyed by module id
+        progress_by_module = self.context.get('progress_by_module')
+        if progress_by_module is not None:
+            return progress_by_module.get(obj.id, 0)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             # Import here to avoid circular imports
@@ -99,7 +145,7 @@ class ModuleCreateUpdateSerializer(ModelSerializer):
     
     class Meta:
         model = Module
-        fields = ["id", "title", "description", "deadline", "cover_image", "is_published"]
+        fields = ["id", "title", "description", "deadline", "cover_image", "cover_image_srcset", "is_published"]
     
     def validate_cover_image(self, value):
         """
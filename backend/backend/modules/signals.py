@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from backend import payload_cache
+from users.models import User
+from . import search
+from .models import Module, Lesson
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_payloads(sender, **kwargs):
+    """Cached catalogue, module and lesson payloads are stale after any content change"""
+    payload_cache.invalidate()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_payloads(sender, instance, created, update_fields=None, **kwargs):
+    """Payloads show the names of module authors, other user saves leave them"""
+    if update_fields is not None and 'full_name' not in update_fields:
+        return
+    # Unknown for users not loaded with their name: taken as changed
+    loaded = getattr(instance, '_loaded_full_name', None)
+    instance._loaded_full_name = instance.full_name
+    if not created and loaded != instance.full_name and Module.objects.filter(author=instance).exists():
+        payload_cache.invalidate()
+
+
+@receiver(post_save, sender=Module)
+def index_module(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'title', 'description'} & set(update_fields):
+        search.index_modules([instance])
+
+
+@receiver(post_save, sender=Lesson)
+def index_lesson(sender, instance, update_fields=None, **kwargs):
+    """Content changes always save the lesson without update_fields (see Lesson.save)"""
+    if update_fields is None or 'title' in update_fields:
+        search.index_lessons([instance])
@@ -1,3 +1,649 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from modules import images, rendering
+from modules.archive import export_archive
+from modules.models import Lesson, LessonBody, LessonContent, LessonRevision, Module
+from modules.uploads import UploadSession
+from users.models import User
+from users.management.commands.benchmark_api import PNG_BYTES
+from backend import payload_cache
+from backend.testing import SeededTestCase
 
-# Create your tests here.
+
+class LessonContentTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.filter(lesson_type='lesson').select_related('module_id__author').first()
+        self.teacher = self.lesson.module_id.author
+
+    def api(self, method, url, **kwargs):
+        token = RefreshToken.for_user(self.teacher).access_token
+        return getattr(self.client, method)(url, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json', **kwargs)
+
+    def test_lists_never_read_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            lessons = self.api('get', '/api/lessons/').json()
+            module = self.api('get', f'/api/modules/{self.lesson.module_id_id}/detail').json()['module']
+        self.assertNotIn('lessoncontent', ' '.join(query['sql'] for query in queries))
+        self.assertNotIn('content', lessons[0])
+        self.assertNotIn('content', module['lessons'][0])
+
+    def test_detail_reads_content(self):
+        data = self.api('get', f'/api/modules/{self.lesson.module_id_id}/lessons/{self.lesson.id}').json()
+        self.assertEqual(data['lesson']['content'], self.lesson.content)
+        self.assertNotIn('content', data['all_lessons'][0])
+        self.assertEqual(self.api('get', f'/api/lessons/{self.lesson.id}/').json()['content'], self.lesson.content)
+
+    def test_create_and_update_write_content(self):
+        created = self.api('post', '/api/lessons/', data={
+            'title': 'Baru', 'content': '# Baru', 'lesson_type': 'lesson', 'order': 99, 'module_id': self.lesson.module_id_id
+        })
+        self.assertEqual(created.status_code, 201)
+        lesson = Lesson.objects.get(title='Baru')
+        self.assertEqual(lesson.content, '# Baru')
+
+        self.api('patch', f'/api/lessons/{lesson.id}/', data={'content': '# Diubah'})
+        self.assertEqual(LessonContent.objects.get(lesson=lesson).content, '# Diubah')
+
+
+class LessonRevisionTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.filter(lesson_type='lesson').select_related('module_id__author').first()
+        self.teacher = self.lesson.module_id.author
+        self.url = f'/api/lessons/{self.lesson.id}/'
+
+    def api(self, method, url, user=None, **kwargs):
+        token = RefreshToken.for_user(user or self.teacher).access_token
+        return getattr(self.client, method)(url, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json', **kwargs)
+
+    def test_edits_are_stored_as_deltas(self):
+        original = self.lesson.content
+        edited = original.replace('\n', '\nBaris baru.\n', 1)
+        self.api('patch', self.url, data={'content': edited})
+
+        # The seeded content is kept as revision 1, the edit is a delta against it
+        first, second = LessonRevision.objects.filter(lesson=self.lesson).select_related('body')
+        self.assertEqual(second.body.base_id, first.body.content_hash)
+        self.assertLess(len(second.body.data), len(edited))
+        self.assertEqual(first.body.get_content(), original)
+        self.assertEqual(second.body.get_content(), edited)
+
+        # Reverting reuses the stored body
+        self.api('patch', self.url, data={'content': original})
+        self.assertEqual(LessonRevision.objects.filter(lesson=self.lesson).count(), 3)
+        self.assertEqual(LessonBody.objects.filter(revisions__lesson=self.lesson).distinct().count(), 2)
+
+    def test_body_inserted_concurrently_is_reused(self):
+        content = 'Isi yang sama\n'
+        stored = LessonBody.store(content, rendering.content_hash(content))
+        # Another save inserts the body between the lookup and the insert
+        with mock.patch('modules.models.LessonBody.objects.filter', return_value=LessonBody.objects.none()):
+            body = LessonBody.store(content, stored.content_hash)
+        self.assertEqual(body.get_content(), content)
+        self.assertEqual(LessonBody.objects.filter(content_hash=stored.content_hash).count(), 1)
+
+    def test_unchanged_save_writes_nothing(self):
+        self.api('patch', self.url, data={'content': self.lesson.content + '!'})
+        version = payload_cache._version()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api('patch', self.url, data={'content': self.lesson.content + '!', 'title': self.lesson.title})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+        self.assertEqual(payload_cache._version(), version)
+        self.assertEqual(LessonRevision.objects.filter(lesson=self.lesson).count(), 2)
+
+    def test_diff(self):
+        self.api('patch', self.url, data={'content': 'satu\ndua\ntiga\n'})
+        self.api('patch', self.url, data={'content': 'satu\nDUA\ntiga\n'})
+        data = self.api('get', f'{self.url}revisions/3/diff/', data={'context': 0}).json()
+        self.assertEqual((data['from'], data['to'], data['added'], data['removed']), (2, 3, 1, 1))
+        self.assertEqual(data['diff'], '--- revision 2\n+++ revision 3\n@@ -2 +2 @@\n-dua\n+DUA\n')
+
+        revisions = self.api('get', f'{self.url}revisions/').json()['revisions']
+        self.assertEqual([r['number'] for r in revisions], [1, 2, 3])
+        self.assertEqual(self.api('get', f'{self.url}revisions/9/diff/').status_code, 404)
+
+        student = User.objects.filter(role__name='Student').first()
+        self.assertEqual(self.api('get', f'{self.url}revisions/', user=student).status_code, 403)
+
+
+class BulkLessonTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.module = Module.objects.filter(lessons__isnull=False).select_related('author').first()
+        self.url = f'/api/modules/{self.module.id}/lessons/bulk'
+        self.ids = list(self.module.lessons.order_by('order').values_list('id', flat=True))
+
+    def post(self, data, user=None):
+        token = RefreshToken.for_user(user or self.module.author).access_token
+        return self.client.post(self.url, data, HTTP_AUTHORIZATION=f'Bearer {token}', content_type='application/json')
+
+    def test_reorder_in_two_statements(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'order': self.ids[::-1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual([lesson['id'] for lesson in response.json()['all_lessons']], self.ids[::-1])
+        self.assertEqual(
+            list(self.module.lessons.order_by('order').values_list('order', flat=True)),
+            list(range(1, len(self.ids) + 1))
+        )
+
+    def test_reorder_and_import(self):
+        response = self.post({
+            'order': [self.ids[1], self.ids[0], *self.ids[2:]],
+            'lessons': [
+                {'title': 'Impor 1', 'content': '# Satu', 'lesson_type': 'lesson'},
+                {'title': 'Impor 2', 'content': '# Dua', 'lesson_type': 'lesson'},
+            ]
+        })
+        data = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([l['id'] for l in data['all_lessons']], [self.ids[1], self.ids[0], *self.ids[2:], *data['created']])
+        self.assertEqual(Lesson.objects.get(id=data['created'][1]).content, '# Dua')
+
+    def test_rejects_partial_order(self):
+        response = self.post({'order': self.ids[:-1], 'lessons': [{'title': 'X', 'content': 'x'}]})
+        self.assertEqual(response.status_code, 400)
+        # Nothing was written
+        self.assertFalse(Lesson.objects.filter(title='X').exists())
+        student = User.objects.filter(role__name='Student').first()
+        self.assertEqual(self.post({'order': self.ids}, user=student).status_code, 403)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_DERIVATIVES=False)
+class ModuleArchiveTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.module = Module.objects.filter(lessons__isnull=False).select_related('author').distinct().first()
+        self.teacher = self.module.author
+        self.image = default_storage.save('uploads/archive-test.png', ContentFile(PNG_BYTES))
+        self.lesson = self.module.lessons.order_by('order').first()
+        self.lesson.content = f'![Gambar](http://old.example/media/{self.image})'
+        self.lesson.save()
+
+    def api(self, method, url, **kwargs):
+        token = RefreshToken.for_user(self.teacher).access_token
+        return getattr(self.client, method)(url, HTTP_AUTHORIZATION=f'Bearer {token}', **kwargs)
+
+    def test_export_and_import(self):
+        response = self.api('get', '/api/modules/export', data={'ids': self.module.id})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(archive.read(f'media/{self.image}'), PNG_BYTES)
+            self.assertIn(f'media://{self.image}', archive.read('lessons.ndjson').decode())
+
+        lessons = list(self.module.lessons.order_by('order').values_list('title', 'lesson_type', 'order'))
+        self.module.delete()
+        default_storage.delete(self.image)
+
+        response = self.api('post', '/api/modules/import', data={'archive': SimpleUploadedFile('modules.zip', content)})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['modules'], 1)
+        self.assertEqual(response.json()['media'], 1)
+        module = Module.objects.get(title=self.module.title)
+        self.assertEqual(module.author, self.teacher)
+        self.assertEqual(list(module.lessons.order_by('order').values_list('title', 'lesson_type', 'order')), lessons)
+        # Stored by content hash, like uploads
+        image = f'uploads/{hashlib.sha256(PNG_BYTES).hexdigest()}.png'
+        self.assertEqual(module.lessons.get(order=self.lesson.order).content, f'![Gambar](http://testserver/media/{image})')
+        self.assertTrue(default_storage.exists(image))
+
+        # The titles are taken now
+        response = self.api('post', '/api/modules/import', data={'archive': SimpleUploadedFile('modules.zip', content)})
+        self.assertEqual(response.json()['skipped'], [self.module.title])
+
+    def import_with_media(self, name, data):
+        content = b''.join(export_archive(Module.objects.filter(id=self.module.id)))
+        self.module.delete()
+        archive_file = BytesIO(content)
+        with zipfile.ZipFile(archive_file, 'a') as archive:
+            archive.writestr(name, data)
+        return self.api('post', '/api/modules/import', data={'archive': SimpleUploadedFile('modules.zip', archive_file.getvalue())})
+
+    def test_rejects_media_that_is_not_an_image(self):
+        page = b'<script>alert(document.cookie)</script>'
+        response = self.import_with_media('media/uploads/evil.html', page)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Module.objects.filter(title=self.module.title).exists())
+        self.assertFalse(default_storage.exists(f'uploads/{hashlib.sha256(page).hexdigest()}.html'))
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1000, ARCHIVE_MEDIA_MAX_SIZE=10000)
+    def test_rejects_oversized_media(self):
+        # Compresses to almost nothing, like a zip bomb
+        response = self.import_with_media('media/uploads/huge.png', PNG_BYTES + bytes(5000))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('larger than 1000 bytes', response.json()['error'])
+
+    def import_with_lessons(self, edit):
+        """Import the module's archive with its lessons passed through edit(lessons) first"""
+        content = b''.join(export_archive(Module.objects.filter(id=self.module.id)))
+        self.module.delete()
+        archive_file = BytesIO()
+        with zipfile.ZipFile(BytesIO(content)) as source, zipfile.ZipFile(archive_file, 'w') as archive:
+            for name in source.namelist():
+                data = source.read(name)
+                if name == 'lessons.ndjson':
+                    lessons = edit([json.loads(line) for line in data.splitlines()])
+                    data = ''.join(json.dumps(lesson) + '\n' for lesson in lessons).encode()
+                archive.writestr(name, data)
+        return self.api('post', '/api/modules/import', data={'archive': SimpleUploadedFile('modules.zip', archive_file.getvalue())})
+
+    def test_rejects_lessons_the_database_refuses(self):
+        def same_order(lessons):
+            lessons[1]['order'] = lessons[0]['order']
+            return lessons
+
+        def unknown_type(lessons):
+            lessons[0]['lesson_type'] = 'quiz'
+            return lessons
+
+        for edit in (same_order, unknown_type):
+            with self.subTest(edit=edit.__name__):
+                response = self.import_with_lessons(edit)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(Module.objects.filter(title=self.module.title).exists())
+                self.module = Module.objects.create(title=self.module.title, author=self.teacher, deadline=timezone.now())
+                Lesson.objects.bulk_create([Lesson(module_id=self.module, title=f'L{n}', order=n) for n in (1, 2)])
+
+    @override_settings(ARCHIVE_LINE_MAX_SIZE=1000)
+    def test_rejects_long_lines(self):
+        def inflate(lessons):
+            # Compresses to almost nothing, like a zip bomb
+            lessons[0]['content'] = 'a' * 5000
+            return lessons
+
+        response = self.import_with_lessons(inflate)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('longer than 1000 bytes', response.json()['error'])
+
+    @override_settings(ARCHIVE_DATA_MAX_SIZE=100)
+    def test_rejects_large_data(self):
+        response = self.import_with_lessons(lambda lessons: lessons)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('larger than 100 bytes', response.json()['error'])
+
+    def test_rejects_other_files(self):
+        response = self.api('post', '/api/modules/import', data={'archive': SimpleUploadedFile('modules.zip', b'not a zip')})
+        self.assertEqual(response.status_code, 400)
+        student = User.objects.filter(role__name='Student').first()
+        token = RefreshToken.for_user(student).access_token
+        self.assertEqual(self.client.get('/api/modules/export', HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 403)
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    CHUNKED_UPLOAD_DIR=tempfile.mkdtemp(),
+    IMAGE_DERIVATIVES=False
+)
+class ImageUploadTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User.objects.filter(role__name='Teacher').first()
+        token = RefreshToken.for_user(self.teacher).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def upload(self, name, content):
+        return self.client.post('/api/upload/image', {'image': SimpleUploadedFile(name, content)})
+
+    def test_type_comes_from_content(self):
+        response = self.upload('photo.gif', PNG_BYTES)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['filename'].endswith('.png'))
+        with default_storage.open(f'uploads/{response.json()["filename"]}') as stored:
+            self.assertEqual(stored.read(), PNG_BYTES)
+
+        response = self.upload('photo.png', b'<?php echo "not an image"; ?>')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid file type', response.json()['error'])
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024 * 1024)
+    def test_rejects_large_files(self):
+        response = self.upload('photo.png', PNG_BYTES + bytes(1024 * 1024))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'File size too large. Maximum size is 1MB')
+        response = self.client.post('/api/upload/image', {'photo': SimpleUploadedFile('photo.png', PNG_BYTES)})
+        self.assertEqual(response.json()['error'], 'No image file provided')
+
+    def test_resumable_upload(self):
+        response = self.client.post('/api/upload/image/sessions', {'size': len(PNG_BYTES)}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        url = f'/api/upload/image/sessions/{response.json()["upload_id"]}'
+
+        def put(offset, chunk):
+            return self.client.put(url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+        self.assertEqual(put(0, PNG_BYTES[:20]).json()['offset'], 20)
+        # A chunk sent again after a lost response
+        self.assertEqual(put(0, PNG_BYTES[:20]).status_code, 409)
+        self.assertEqual(self.client.get(url).json()['offset'], 20)
+
+        response = put(20, PNG_BYTES[20:])
+        self.assertEqual(response.status_code, 201)
+        with default_storage.open(f'uploads/{response.json()["filename"]}') as stored:
+            self.assertEqual(stored.read(), PNG_BYTES)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        student = User.objects.filter(role__name='Student').first()
+        session = UploadSession.create(student, len(PNG_BYTES))
+        self.assertEqual(self.client.get(f'/api/upload/image/sessions/{session.id}').status_code, 404)
+
+    def test_same_image_is_stored_once(self):
+        first = self.upload('photo.png', PNG_BYTES).json()
+        self.assertEqual(first['filename'], f'{hashlib.sha256(PNG_BYTES).hexdigest()}.png')
+        self.assertEqual(self.upload('copy.png', PNG_BYTES).json()['url'], first['url'])
+        self.assertEqual(default_storage.listdir('uploads')[1].count(first['filename']), 1)
+
+    def test_clean_uploads(self):
+        used = self.upload('photo.png', PNG_BYTES).json()
+        unused = self.upload('other.png', PNG_BYTES + b'other').json()
+        default_storage.save(f'uploads/{used["filename"][:-4]}-320w.webp', ContentFile(b'derivative'))
+        lesson = Lesson.objects.filter(lesson_type='lesson').first()
+        lesson.content = f'![Gambar]({used["url"]})'
+        lesson.save()
+
+        # Just uploaded, probably about to be linked
+        call_command('clean_uploads', stdout=StringIO())
+        self.assertTrue(default_storage.exists(f'uploads/{unused["filename"]}'))
+
+        call_command('clean_uploads', min_age=0, stdout=StringIO())
+        self.assertFalse(default_storage.exists(f'uploads/{unused["filename"]}'))
+        self.assertTrue(default_storage.exists(f'uploads/{used["filename"]}'))
+        self.assertTrue(default_storage.exists(f'uploads/{used["filename"][:-4]}-320w.webp'))
+
+    def test_image_uploaded_again_is_kept(self):
+        content = PNG_BYTES + b'again'
+        filename = self.upload('photo.png', content).json()['filename']
+        derivative = default_storage.save(f'uploads/{filename[:-4]}-320w.webp', ContentFile(b'derivative'))
+        # Unused for two days
+        two_days_ago = time.time() - 2 * 24 * 60 * 60
+        for path in (f'uploads/{filename}', derivative):
+            os.utime(default_storage.path(path), (two_days_ago, two_days_ago))
+
+        # Uploaded again before the lesson linking it is saved
+        self.upload('photo.png', content)
+        call_command('clean_uploads', stdout=StringIO())
+        self.assertTrue(default_storage.exists(f'uploads/{filename}'))
+        self.assertTrue(default_storage.exists(derivative))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaServingTests(SeededTestCase):
+    seed_options = None
+
+    def setUp(self):
+        self.name = f'{hashlib.sha256(PNG_BYTES).hexdigest()}.png'
+        if not default_storage.exists(f'uploads/{self.name}'):
+            default_storage.save(f'uploads/{self.name}', ContentFile(PNG_BYTES))
+
+    def test_content_addressed_files_are_immutable(self):
+        response = self.client.get(f'/media/uploads/{self.name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), PNG_BYTES)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        response = self.client.get(f'/media/uploads/{self.name}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/media/uploads/missing.png').status_code, 404)
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/uploads/{self.name}', HTTP_RANGE='bytes=1-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), PNG_BYTES[1:4])
+        self.assertEqual(response['Content-Range'], f'bytes 1-3/{len(PNG_BYTES)}')
+
+        response = self.client.get(f'/media/uploads/{self.name}', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), PNG_BYTES[-4:])
+        response = self.client.get(f'/media/uploads/{self.name}', HTTP_RANGE=f'bytes={len(PNG_BYTES)}-')
+        self.assertEqual(response.status_code, 416)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_proxy_sends_the_file(self):
+        response = self.client.get(f'/media/uploads/{self.name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/uploads/{self.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_private_media_for_staff_only(self):
+        default_storage.save('exports/report.csv', ContentFile(b'id\n1\n'))
+        self.assertEqual(self.client.get('/media/exports/report.csv').status_code, 404)
+
+        self.seed()
+        token = RefreshToken.for_user(User.objects.get(username='admin')).access_token
+        response = self.client.get('/media/exports/report.csv', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+
+@skipUnless(images.Image, 'Pillow is not installed')
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    IMAGE_DERIVATIVES=True,
+    IMAGE_DERIVATIVE_WORKERS=0
+)
+class ImageDerivativeTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.module = Module.objects.select_related('author').first()
+        token = RefreshToken.for_user(self.module.author).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def upload(self, width, height):
+        exif = images.Image.Exif()
+        exif[0x010F] = 'Camera Maker'
+        image = BytesIO()
+        images.Image.new('RGB', (width, height), 'red').save(image, 'JPEG', exif=exif)
+        # A host URLField accepts
+        return self.client.post('/api/upload/image', {'image': SimpleUploadedFile('photo.jpg', image.getvalue())}, HTTP_HOST='localhost').json()
+
+    def test_derivatives_and_srcset(self):
+        upload = self.upload(1600, 900)
+        path = f'uploads/{upload["filename"]}'
+        self.assertEqual(images.read_manifest(path), {fmt: [320, 640, 1280] for fmt in images.formats()})
+        with default_storage.open(images.derivative_path(path, 640, 'webp')) as derivative:
+            image = images.Image.open(derivative)
+            self.assertEqual(image.size, (640, 360))
+            self.assertEqual(dict(image.getexif()), {})
+
+        response = self.client.patch(f'/api/modules/{self.module.id}/', {'cover_image': upload['url']}, content_type='application/json')
+        base = upload['url'].rsplit('.', 1)[0]
+        self.assertEqual(response.json()['cover_image_srcset']['webp'], f'{base}-320w.webp 320w, {base}-640w.webp 640w, {base}-1280w.webp 1280w')
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/detail').json()['module']['cover_image_srcset'], response.json()['cover_image_srcset'])
+
+    def test_small_images_are_not_enlarged(self):
+        upload = self.upload(200, 100)
+        self.assertEqual(images.read_manifest(f'uploads/{upload["filename"]}')['webp'], [200])
+
+    def test_srcset_filled_in_when_built(self):
+        # The photo is saved before its derivatives exist
+        user = self.module.author
+        user.profile_photo = 'http://testserver/media/uploads/later.png'
+        user.save()
+        self.assertEqual(user.profile_photo_srcset, {})
+        images.Image.new('RGBA', (800, 800)).save(os.path.join(settings.MEDIA_ROOT, 'uploads', 'later.png'))
+
+        images.schedule('uploads/later.png')
+        user.refresh_from_db()
+        self.assertIn('http://testserver/media/uploads/later-640w.webp 640w', user.profile_photo_srcset['webp'])
+        self.assertEqual(images.srcset('https://picsum.photos/seed/1/400/300'), {})
+
+
+class SearchTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User.objects.get(username='teacher_john')
+        self.student = User.objects.filter(role__name='Student').first()
+        self.module = Module.objects.create(
+            title='Pemrograman Dasar', description='Belajar <b>logika</b> pemrograman', author=self.teacher,
+            deadline=timezone.now(), is_published=True
+        )
+        self.lesson = Lesson.objects.create(
+            module_id=self.module, title='Perulangan', order=1, is_published=True,
+            content='Perulangan for dan while dipakai untuk mengulang perintah. Contoh: for i in range(3).'
+        )
+
+    def search(self, user=None, **params):
+        token = RefreshToken.for_user(user or self.student).access_token
+        return self.client.get('/api/search', params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_prefix_match_with_highlights(self):
+        response = self.search(q='pemrog')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['results'][0]
+        self.assertEqual((result['type'], result['id']), ('module', self.module.id))
+        self.assertEqual(result['title'], '<mark>Pemrograman</mark> Dasar')
+        # The matched text is marked, the rest escaped
+        self.assertIn('&lt;b&gt;logika&lt;/b&gt; <mark>pemrograman</mark>', result['snippet'])
+
+        lesson = self.search(q='mengul perin', type='lesson').json()['results']
+        self.assertEqual([(r['type'], r['id'], r['module_id']) for r in lesson], [('lesson', self.lesson.id, self.module.id)])
+        self.assertIn('<mark>mengulang</mark> <mark>perintah</mark>', lesson[0]['snippet'])
+
+    def test_titles_rank_first_and_ignore_accents(self):
+        Lesson.objects.create(module_id=self.module, title='Fungsi', order=2, is_published=True, content='Perulangan lagi')
+        results = self.search(q='PERULANGAN').json()['results']
+        self.assertEqual([r['id'] for r in results][:2], [self.lesson.id, self.lesson.id + 1])
+        self.assertEqual(self.search(q='pérulangan').json()['count'], 2)
+        # Operators and quotes are dropped, not passed to the database
+        self.assertEqual(self.search(q='"perul*" -(').json()['count'], 2)
+        self.assertEqual(self.search(q='').json()['count'], 0)
+
+    def test_index_follows_changes(self):
+        self.lesson.title = 'Percabangan'
+        self.lesson.content = 'if dan else'
+        self.lesson.save()
+        self.assertEqual(self.search(q='perulangan').json()['count'], 0)
+        self.assertEqual(self.search(q='percabangan else').json()['results'][0]['id'], self.lesson.id)
+
+        Lesson.objects.bulk_create([Lesson(module_id=self.module, title='Rekursi', order=2, is_published=True, content='Fungsi memanggil dirinya')])
+        self.assertEqual(self.search(q='memanggil').json()['count'], 1)
+
+        self.module.delete()
+        self.assertEqual(self.search(q='rekursi').json()['count'], 0)
+        results = self.search(q='program').json()['results']
+        self.assertTrue(results)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search(q='program').json()['results'], results)
+
+    def test_drafts_are_visible_to_their_author_and_staff(self):
+        self.module.is_published = False
+        self.module.save()
+        admin = User.objects.get(username='admin')
+        self.assertEqual(self.search(q='pemrog').json()['count'], 0)
+        self.assertEqual(self.search(self.teacher, q='pemrog').json()['count'], 1)
+        self.assertEqual(self.search(admin, q='pemrog').json()['count'], 1)
+        self.assertEqual(self.search(q='x', limit=0).status_code, 400)
+        self.assertEqual(self.search(q='x', type='user').status_code, 400)
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'rendered': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rendered'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LessonHTMLTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.filter(lesson_type='lesson').select_related('module_id__author').first()
+        self.url = f'/api/modules/{self.lesson.module_id_id}/lessons/{self.lesson.id}'
+        token = RefreshToken.for_user(self.lesson.module_id.author).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_sanitize(self):
+        html = rendering.sanitize(
+            '<p onclick="x()">Hi <script>alert(1)</script><b>there</b></p>'
+            '<a href="javascript:alert(1)">a</a><a href=" JaVa\tscript:x">b</a><a href="/modules/1">c</a>'
+            '<img src="data:image/png;base64,AAAA" alt="x"><iframe src="https://evil"></iframe><ul><li>open'
+        )
+        self.assertEqual(html, (
+            '<p>Hi <b>there</b></p>'
+            '<a rel="nofollow noopener noreferrer">a</a><a rel="nofollow noopener noreferrer">b</a>'
+            '<a href="/modules/1" rel="nofollow noopener noreferrer">c</a>'
+            '<img alt="x"><ul><li>open</li></ul>'
+        ))
+        self.assertEqual(rendering.sanitize('1 &lt; 2 &amp;&amp; <3'), '1 &lt; 2 &amp;&amp; &lt;3')
+        self.assertEqual(
+            rendering.sanitize(
+                '<iframe src="https://www.youtube.com/embed/abc" width="560" frameborder="0" allowfullscreen onload="x()"></iframe>'
+                '<iframe src="https://evil.example/embed"><p>fallback</p></iframe><p>after</p>'
+            ),
+            '<iframe src="https://www.youtube.com/embed/abc" width="560" frameborder="0" allowfullscreen></iframe><p>after</p>'
+        )
+
+    @override_settings(LESSON_HTML_RENDERING=False)
+    def test_html_variant_needs_rendering(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'html'}).status_code, 501)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @skipUnless(rendering.markdown, 'Markdown is not installed')
+    @override_settings(LESSON_HTML_RENDERING=True)
+    def test_html_variant(self):
+        self.lesson.content = '# Judul\n\n```python\nprint("halo")\n```\n\n<script>alert(1)</script>'
+        self.lesson.save()
+        digest = rendering.content_hash(self.lesson.content)
+        self.assertEqual(LessonContent.objects.get(lesson=self.lesson).content_hash, digest)
+        # Rendered when saved
+        self.assertIsNotNone(caches['rendered'].get(rendering.cache_key(digest)))
+
+        # Served under the stored hash, the content is not hashed again
+        with mock.patch('modules.rendering.content_hash', side_effect=AssertionError):
+            data = self.client.get(self.url, {'format': 'html'}).json()
+        self.assertNotIn('content', data['lesson'])
+        self.assertIn('<h1>Judul</h1>', data['lesson']['content_html'])
+        self.assertIn('class="codehilite"', data['lesson']['content_html'])
+        self.assertNotIn('<script', data['lesson']['content_html'])
+        # The Markdown variant is cached separately
+        self.assertEqual(self.client.get(self.url).json()['lesson']['content'], self.lesson.content)
+
+    @skipUnless(rendering.markdown, 'Markdown is not installed')
+    @override_settings(LESSON_HTML_RENDERING=True)
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_lesson_html', workers=0, stdout=out)
+        digests = set(LessonContent.objects.filter(lesson__lesson_type='lesson').values_list('content_hash', flat=True))
+        self.assertIn(f'Rendered {len(digests)} lesson bodies, 0 already cached', out.getvalue())
+        cached = caches['rendered'].get_many([rendering.cache_key(digest) for digest in digests])
+        self.assertEqual(len(cached), len(digests))
+
+        out = StringIO()
+        call_command('rebuild_lesson_html', workers=0, stdout=out)
+        self.assertIn(f'Rendered 0 lesson bodies, {len(digests)} already cached', out.getvalue())
+
+
+class AuthorNameTests(SeededTestCase):
+    def test_payloads_are_invalidated_when_an_author_is_renamed(self):
+        author = Module.objects.select_related('author').first().author
+        student = User.objects.filter(role__name='Student').first()
+        version = payload_cache._version()
+        author.save()
+        student.full_name = 'Nama Baru'
+        student.save()
+        self.assertEqual(payload_cache._version(), version)
+
+        author.full_name = 'Nama Baru'
+        author.save()
+        self.assertNotEqual(payload_cache._version(), version)
+        version = payload_cache._version()
+        author.save()
+        self.assertEqual(payload_cache._version(), version)
@@ -0,0 +1,327 @@
+"""
+Streaming image uploads.
+
+Single request uploads go through ImageUploadHandler, which streams the
+multipart body to a temporary file, checks the image type on the first chunk
+and the size on every chunk, so a file is rejected as soon as it crosses the
+limit and is never held in memory.
+
+Uploads are content-addressed: stored once as uploads/<sha256><ext>, so
+the same image uploaded again gets the URL of the stored file. The
+clean_uploads command deletes the files no module, lesson or user refers to.
+
+Resumable uploads are kept as a partial file plus a small JSON description in
+CHUNKED_UPLOAD_DIR, shared by every worker on the host: a client creates a
+session with the total size, appends chunks at the offset the server reports
+and, after a dropped connection, asks for the offset and continues from there.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from users.models import User
+from . import images
+from .models import LessonContent, Module
+
+
+CHUNK_SIZE = 64 * 1024
+# Sessions not completed within this many seconds are deleted
+SESSION_EXPIRY = 24 * 60 * 60
+SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+UPLOAD_REFERENCE = re.compile(re.escape(settings.MEDIA_URL) + r'(uploads/[\w\-][\w.\-]*)')
+# Rows read per query when looking for links to uploads
+BATCH_SIZE = 1000
+
+ALLOWED_TYPES = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_size():
+    return settings.IMAGE_UPLOAD_MAX_SIZE
+
+
+def size_error():
+    return f'File size too large. Maximum size is {max_size() // (1024 * 1024)}MB'
+
+
+def type_error():
+    return f'Invalid file type. Allowed types: {", ".join(ALLOWED_TYPES)}'
+
+
+def sniff_image_type(header):
+    """Extension of the image format the first bytes belong to, None for anything else"""
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if header.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if header.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+def content_path(digest, extension):
+    return f'uploads/{digest}{extension}'
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(file, extension, digest=None):
+    """
+    Store an uploaded image under the hash of its content, returns its
+    storage path. An identical image is stored once.
+    """
+    path = content_path(digest or file_digest(file), extension)
+    if _refresh(path):
+        return path
+    stored = default_storage.save(path, file)
+    if stored != path:
+        # The same image was stored by a concurrent upload, the storage picked another name
+        default_storage.delete(stored)
+        return path
+    images.schedule(path)
+    return path
+
+
+def _refresh(path):
+    """
+    Whether the upload is stored, with its modification time reset if so: an
+    image uploaded again is about to be linked, clean_uploads must keep it
+    however long it went unused before.
+    """
+    try:
+        os.utime(default_storage.path(path))
+        return True
+    except FileNotFoundError:
+        return False
+    except NotImplementedError:
+        # Storage without local files
+        return default_storage.exists(path)
+
+
+def referenced_uploads():
+    """Storage paths of the uploads linked from modules, lesson contents and profile photos"""
+    referenced = set()
+    texts = (
+        Module.objects.values_list('cover_image', 'description'),
+        LessonContent.objects.values_list('content'),
+        User.objects.exclude(profile_photo=None).values_list('profile_photo'),
+    )
+    for rows in texts:
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            for text in row:
+                if text:
+                    referenced.update(UPLOAD_REFERENCE.findall(text))
+    return referenced
+
+
+def unused_uploads(min_age):
+    """
+    Stored uploads nothing links to, with their derivatives. An image with a
+    file younger than min_age seconds is kept with all its files: an image is
+    uploaded before the module, lesson or profile linking to it is saved, and
+    an image uploaded again is younger than the derivatives built the first time.
+    """
+    referenced = {os.path.splitext(path)[0] for path in referenced_uploads()}
+    cutoff = time.time() - min_age
+    if not default_storage.exists('uploads'):
+        return
+    _, names = default_storage.listdir('uploads')
+    old = []
+    young = set()
+    for name in sorted(names):
+        path = f'uploads/{name}'
+        stem = images.original_stem(path)
+        if stem in referenced:
+            continue
+        if default_storage.get_modified_time(path).timestamp() >= cutoff:
+            young.add(stem)
+        else:
+            old.append((stem, path))
+    for stem, path in old:
+        if stem not in young:
+            yield path
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams the file of the "image" field to a temporary file, hashing it on
+    the way. The type is sniffed from the first bytes and the size checked on
+    every chunk; a rejected file is skipped and the reason kept in error.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.extension = None
+        self.digest = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != 'image':
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_size():
+            self.error = size_error()
+            self.file.close()
+            raise SkipFile()
+
+        if self.extension is None:
+            self.header += raw_data[:16 - len(self.header)]
+            if len(self.header) >= 12:
+                self.extension = sniff_image_type(self.header)
+                if self.extension is None:
+                    self.error = type_error()
+                    self.file.close()
+                    raise SkipFile()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.extension is None:
+            # Shorter than any image header
+            self.extension = sniff_image_type(self.header)
+            if self.extension is None:
+                self.error = type_error()
+                self.file.close()
+                return None
+        self.digest = self.hasher.hexdigest()
+        return super().file_complete(file_size)
+
+
+class UploadSession:
+    """A resumable upload: the bytes received so far and its description"""
+
+    def __init__(self, upload_id, user_id, size, created):
+        self.id = upload_id
+        self.user_id = user_id
+        self.size = size
+        self.created = created
+
+    @staticmethod
+    def directory():
+        directory = settings.CHUNKED_UPLOAD_DIR
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @classmethod
+    def path(cls, upload_id, suffix):
+        return os.path.join(cls.directory(), f'{upload_id}{suffix}')
+
+    @classmethod
+    def create(cls, user, size):
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('size must be the total number of bytes of the file')
+        if size > max_size():
+            raise UploadError(size_error())
+
+        cls.delete_expired()
+        session = cls(uuid.uuid4().hex, user.id, size, time.time())
+        open(cls.path(session.id, '.part'), 'xb').close()
+        with open(cls.path(session.id, '.json'), 'x') as description:
+            json.dump({'user_id': session.user_id, 'size': session.size, 'created': session.created}, description)
+        return session
+
+    @classmethod
+    def get(cls, upload_id, user):
+        if not SESSION_ID.match(upload_id):
+            raise UploadError('Upload not found', status=404)
+        try:
+            with open(cls.path(upload_id, '.json')) as description:
+                data = json.load(description)
+        except FileNotFoundError:
+            raise UploadError('Upload not found', status=404)
+        if data['user_id'] != user.id:
+            raise UploadError('Upload not found', status=404)
+        return cls(upload_id, data['user_id'], data['size'], data['created'])
+
+    @classmethod
+    def delete_expired(cls):
+        cutoff = time.time() - SESSION_EXPIRY
+        for name in os.listdir(cls.directory()):
+            path = os.path.join(cls.directory(), name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def offset(self):
+        return os.path.getsize(self.path(self.id, '.part'))
+
+    def append(self, stream, offset, length):
+        """
+        Append length bytes read from stream at offset, which must be the
+        current offset. Returns the new offset.
+        """
+        lock = self.path(self.id, '.lock')
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            raise UploadError('Another chunk of this upload is being written', status=409)
+        try:
+            if offset != self.offset:
+                raise UploadError(f'Expected offset {self.offset}', status=409)
+            if offset + length > self.size:
+                raise UploadError('The chunk goes past the declared size')
+
+            with open(self.path(self.id, '.part'), 'ab') as part:
+                remaining = length
+                check_type = offset == 0
+                while remaining:
+                    data = stream.read(min(CHUNK_SIZE, remaining))
+                    if not data:
+                        break
+                    if check_type and len(data) >= 12:
+                        # Reject anything but an image before storing it
+                        check_type = False
+                        if sniff_image_type(data[:16]) is None:
+                            raise UploadError(type_error())
+                    part.write(data)
+                    remaining -= len(data)
+            return self.offset
+        finally:
+            os.remove(lock)
+
+    def complete(self):
+        """Move the finished upload into storage, returns its storage path"""
+        part_path = self.path(self.id, '.part')
+        with open(part_path, 'rb') as part:
+            extension = sniff_image_type(part.read(16))
+            if extension is None:
+                self.delete()
+                raise UploadError(type_error())
+            part.seek(0)
+            file_path = save_upload(File(part), extension)
+        self.delete()
+        return file_path
+
+    def delete(self):
+        for suffix in ('.part', '.json'):
+            try:
+                os.remove(self.path(self.id, suffix))
+            except FileNotFoundError:
+                pass
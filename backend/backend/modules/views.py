@@ -1,19 +1,26 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
 from django.db.models import Count, Q
 from django.db.models.functions import TruncMonth
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
+from backend import payload_cache, purge
+from backend.projection import projection_for
+from . import rendering, revisions
 from .models import (
     Module,
     Lesson
 )
 from .serializers import (
+    LessonImportSerializer,
+    LessonRevisionSerializer,
     LessonSerializer,
+    LessonSummarySerializer,
     LessonCreateUpdateSerializer,
     ModuleSerializer,
     ModuleWithLessonsSerializer,
@@ -34,8 +41,10 @@ class ModuleView(ModelViewSet):
         user = self.request.user
         if hasattr(user, 'role') and user.role.name == 'Teacher':  # Teacher role
             # Teachers see only their own modules
-            return Module.objects.filter(author=user)
-        return super().get_queryset()
+            queryset = Module.objects.filter(author=user)
+        else:
+            queryset = super().get_queryset()
+        return queryset.select_related('author')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -45,10 +54,19 @@ class ModuleView(ModelViewSet):
             return ModuleWithLessonsSerializer
         return ModuleSerializer
     
+    def list(self, request, *args, **kwargs):
+        """List modules with their lessons without per-object serializer work"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(projection_for(ModuleWithLessonsSerializer).project(queryset))
+    
     def perform_create(self, serializer):
         """Set the author to the current user when creating a module"""
         serializer.save(author=self.request.user)
     
+    def perform_destroy(self, instance):
+        """Delete without loading the lessons and activities, see backend.purge"""
+        purge.delete(instance)
+    
     def perform_update(self, serializer):
         """Custom update to validate exam requirement before publishing"""
         module = self.get_object()
@@ -94,13 +112,96 @@ class LessonView(ModelViewSet):
         user = self.request.user
         if hasattr(user, 'role') and user.role.name == 'Teacher':  # Teacher role
             # Teachers see only lessons in their own modules
-            return Lesson.objects.filter(module_id__author=user)
-        return super().get_queryset()
+            queryset = Lesson.objects.filter(module_id__author=user)
+        else:
+            queryset = super().get_queryset()
+        queryset = queryset.visible()
+        if self.action != 'list':
+            queryset = queryset.select_related('lesson_content')
+        return queryset
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return LessonCreateUpdateSerializer
         return LessonSerializer
+    
+    def list(self, request, *args, **kwargs):
+        """List lessons, without their content, without per-object serializer work"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(projection_for(LessonSummarySerializer).project(queryset))
+
+    def get_history_lesson(self):
+        """The lesson, for its module's author and admins only"""
+        lesson = self.get_object()
+        user = self.request.user
+        if not (user.is_staff or lesson.module_id.author_id == user.id):
+            return None
+        return lesson
+
+    @action(detail=True)
+    def revisions(self, request, pk=None):
+        """Saved versions of the lesson's content, oldest first"""
+        lesson = self.get_history_lesson()
+        if lesson is None:
+            return Response({
+                'success': False,
+                'error': 'Access denied. Only the module author can view revisions.'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        revisions_data = LessonRevisionSerializer(lesson.revisions.select_related('body'), many=True).data
+        return Response({
+            'success': True,
+            'count': len(revisions_data),
+            'revisions': revisions_data
+        })
+
+    @action(detail=True, url_path=r'revisions/(?P<number>[0-9]+)/diff', url_name='revision-diff')
+    def revision_diff(self, request, pk=None, number=None):
+        """
+        Unified diff of a revision against an older one (?against=, default the
+        previous revision), with ?context= lines around each change (default 3).
+        """
+        lesson = self.get_history_lesson()
+        if lesson is None:
+            return Response({
+                'success': False,
+                'error': 'Access denied. Only the module author can view revisions.'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            number = int(number)
+            against = int(request.query_params.get('against', number - 1))
+            context = int(request.query_params.get('context', 3))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'against and context must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        found = {
+            revision.number: revision
+            for revision in lesson.revisions.filter(number__in=[number, against]).select_related('body')
+        }
+        if number not in found or (against and against not in found):
+            return Response({
+                'success': False,
+                'error': 'Revision not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Revision 0 is the empty body, against it the diff shows the whole first revision
+        old = found[against].body.get_content() if against else ''
+        new = found[number].body.get_content()
+        diff, added, removed = revisions.unified_diff(
+            old, new, f'revision {against}', f'revision {number}', max(context, 0)
+        )
+        return Response({
+            'success': True,
+            'from': against,
+            'to': number,
+            'added': added,
+            'removed': removed,
+            'diff': diff
+        })
 
 
 @api_view(['GET'])
@@ -110,14 +211,36 @@ def modules_overview(request):
     Get all modules with their lessons nested inside and user progress.
     This provides a complete overview of all available modules and their content.
     """
-    modules = Module.objects.all().prefetch_related('lessons').order_by('-date_created')
-    serializer = ModuleWithProgressSerializer(modules, many=True, context={'request': request})
+    modules = Module.objects.with_lesson_counts().select_related('author').order_by('-date_created')
     
-    return Response({
+    # Load the user's progress for every module in one query
+    progress_by_module = {}
+    if request.user.is_authenticated:
+        from activities.models import Activity
+        progress_by_module = dict(
+            Activity.objects.filter(student_id=request.user).values_list('modules_id', 'progress')
+        )
+    
+    # Without any progress the catalogue is the same for everyone
+    if not progress_by_module:
+        response = payload_cache.get_response(request, 'catalogue', 'overview')
+        if response is not None:
+            return response
+    
+    serializer = ModuleWithProgressSerializer(
+        modules,
+        many=True,
+        context={'request': request, 'progress_by_module': progress_by_module}
+    )
+    
+    data = {
         'success': True,
         'count': modules.count(),
         'modules': serializer.data
-    }, status=status.HTTP_200_OK)
+    }
+    if not progress_by_module:
+        return payload_cache.store_response(request, 'catalogue', 'overview', data)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -135,13 +258,74 @@ def teacher_modules(request):
         }, status=status.HTTP_403_FORBIDDEN)
     
     # Get teacher's modules with lessons
-    teacher_modules = Module.objects.filter(author=user).prefetch_related('lessons').order_by('-date_created')
-    serializer = ModuleWithLessonsSerializer(teacher_modules, many=True)
+    teacher_modules = Module.objects.filter(author=user).order_by('-date_created')
+    modules_data = projection_for(ModuleWithLessonsSerializer).project(teacher_modules)
     
     return Response({
         'success': True,
-        'count': teacher_modules.count(),
-        'modules': serializer.data
+        'count': len(modules_data),
+        'modules': modules_data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_lessons(request, module_id):
+    """
+    Reorder the lessons of a module and/or add new ones, in one transaction.
+    "order" lists the ids of every lesson of the module in their new order,
+    "lessons" are new lessons added after the last one.
+    Returns the lessons of the module, as in lesson_detail's all_lessons.
+    """
+    try:
+        module = Module.objects.get(id=module_id)
+    except Module.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Module not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    user = request.user
+    if not (user.is_staff or module.author_id == user.id):
+        return Response({
+            'success': False,
+            'error': 'Access denied. Only the module author can change its lessons.'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    order = request.data.get('order')
+    if order is not None and (not isinstance(order, list) or not all(isinstance(i, int) for i in order)):
+        return Response({
+            'success': False,
+            'error': 'order must be a list of lesson ids'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    serializer = LessonImportSerializer(data=request.data.get('lessons', []), many=True)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            reordered = Lesson.objects.reorder(module, order) if order is not None else 0
+            created = Lesson.objects.append(module, [Lesson(**item) for item in serializer.validated_data])
+    except ValidationError as e:
+        return Response({
+            'success': False,
+            'error': e.messages[0]
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Bulk queries send no post_save signals
+    if reordered or created:
+        payload_cache.invalidate()
+
+    return Response({
+        'success': True,
+        'reordered': reordered,
+        'created': [lesson.id for lesson in created],
+        'all_lessons': projection_for(LessonSummarySerializer).project(
+            Lesson.objects.filter(module_id=module).order_by('order')
+        )
     }, status=status.HTTP_200_OK)
 
 
@@ -151,14 +335,17 @@ def module_detail_with_lessons(request, module_id):
     """
     Get a specific module with all its lessons.
     """
+    response = payload_cache.get_response(request, 'module', module_id)
+    if response is not None:
+        return response
+    
     try:
-        module = Module.objects.prefetch_related('lessons').get(id=module_id)
-        serializer = ModuleWithLessonsSerializer(module)
+        module_data = projection_for(ModuleWithLessonsSerializer).project_one(Module.objects.filter(id=module_id))
         
-        return Response({
+        return payload_cache.store_response(request, 'module', module_id, {
             'success': True,
-            'module': serializer.data
-        }, status=status.HTTP_200_OK)
+            'module': module_data
+        })
     except Module.DoesNotExist:
         return Response({
             'success': False,
@@ -171,18 +358,32 @@ def module_detail_with_lessons(request, module_id):
 def lesson_detail(request, module_id, lesson_id):
     """
     Get a specific lesson with module context and navigation info.
+    With ?format=html the lesson comes with content_html, its Markdown rendered
+    to sanitized HTML, instead of content.
     """
+    as_html = request.query_params.get('format') == 'html'
+    if as_html and not rendering.is_available():
+        return Response({
+            'success': False,
+            'error': 'HTML rendering is not available'
+        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    cache_key = f'{module_id}:{lesson_id}:html' if as_html else f'{module_id}:{lesson_id}'
+    response = payload_cache.get_response(request, 'lesson', cache_key)
+    if response is not None:
+        return response
+    
     try:
-        lesson = Lesson.objects.select_related('module_id').get(id=lesson_id, module_id=module_id)
+        lesson = Lesson.objects.visible().select_related('module_id', 'lesson_content').get(id=lesson_id, module_id=module_id)
         
         # Get all lessons in the same module for navigation
         # For students, include all lessons to enable navigation to exams
         # even if they're not published yet
         all_lessons = Lesson.objects.filter(module_id=module_id).order_by('order')
         
-        # Find previous and next lessons
-        lesson_list = list(all_lessons)
-        current_index = next((i for i, l in enumerate(lesson_list) if l.id == lesson.id), None)
+        # Serialize all lessons, without their content, for the sidebar and navigation
+        lessons_for_sidebar = projection_for(LessonSummarySerializer).project(all_lessons)
+        current_index = next((i for i, l in enumerate(lessons_for_sidebar) if l['id'] == lesson.id), None)
         
         prev_lesson = None
         next_lesson = None
@@ -190,30 +391,32 @@ def lesson_detail(request, module_id, lesson_id):
         if current_index is not None:
             if current_index > 0:
                 prev_lesson = {
-                    'id': lesson_list[current_index - 1].id,
-                    'title': lesson_list[current_index - 1].title
+                    'id': lessons_for_sidebar[current_index - 1]['id'],
+                    'title': lessons_for_sidebar[current_index - 1]['title']
                 }
-            if current_index < len(lesson_list) - 1:
+            if current_index < len(lessons_for_sidebar) - 1:
                 next_lesson = {
-                    'id': lesson_list[current_index + 1].id,
-                    'title': lesson_list[current_index + 1].title
+                    'id': lessons_for_sidebar[current_index + 1]['id'],
+                    'title': lessons_for_sidebar[current_index + 1]['title']
                 }
         
         # Serialize lesson data
         lesson_data = LessonSerializer(lesson).data
+        if as_html and lesson.lesson_type == 'lesson':
+            # Exam content is JSON questions, not Markdown. The stored hash saves hashing the content again
+            lesson_data['content_html'] = rendering.get_html(lesson.content, lesson.stored_content_hash())
+            lesson_data.pop('content', None)
         
         # Add module info
         module_data = {
             'id': lesson.module_id.id,
             'title': lesson.module_id.title,
             'description': lesson.module_id.description,
-            'cover_image': lesson.module_id.cover_image
+            'cover_image': lesson.module_id.cover_image,
+            'cover_image_srcset': lesson.module_id.cover_image_srcset
         }
         
-        # Get all lessons for sidebar
-        lessons_for_sidebar = LessonSerializer(all_lessons, many=True).data
-        
-        return Response({
+        return payload_cache.store_response(request, 'lesson', cache_key, {
             'success': True,
             'lesson': lesson_data,
             'module': module_data,
@@ -222,7 +425,7 @@ def lesson_detail(request, module_id, lesson_id):
                 'next': next_lesson
             },
             'all_lessons': lessons_for_sidebar
-        }, status=status.HTTP_200_OK)
+        })
         
     except Lesson.DoesNotExist:
         return Response({
@@ -250,7 +453,7 @@ def teacher_stats(request):
     total_modules = teacher_modules.count()
     
     # Get total lessons created by teacher
-    total_lessons = Lesson.objects.filter(module_id__author=user).count()
+    total_lessons = Lesson.objects.visible().filter(module_id__author=user).count()
     
     # Get total students enrolled (unique students with activities on teacher's modules)
     from activities.models import Activity
@@ -267,6 +470,7 @@ def teacher_stats(request):
             'title': last_module.title,
             'description': last_module.description,
             'cover_image': last_module.cover_image,
+            'cover_image_srcset': last_module.cover_image_srcset,
             'date_created': last_module.date_created,
             'lessons_count': last_module.lessons.count(),
             'is_published': last_module.is_published
@@ -283,7 +487,7 @@ def teacher_stats(request):
     ).order_by('month')
     
     # Get lessons created in the same period
-    monthly_lessons = Lesson.objects.filter(
+    monthly_lessons = Lesson.objects.visible().filter(
         module_id__author=user,
         date_created__gte=six_months_ago
     ).annotate(
@@ -0,0 +1,80 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .archive import ArchiveError, export_archive, import_archive
+from .models import Module
+
+
+def is_teacher(user):
+    return hasattr(user, 'role') and user.role is not None and user.role.name == 'Teacher'
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_modules(request):
+    """
+    Download modules with their lessons and images as a zip archive.
+    ?ids=1,2 selects modules; teachers export their own modules, admins any.
+    """
+    user = request.user
+    if user.is_staff:
+        modules = Module.objects.all()
+    elif is_teacher(user):
+        modules = Module.objects.filter(author=user)
+    else:
+        return Response({
+            'success': False,
+            'error': 'Access denied. Teachers only.'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    ids = request.query_params.get('ids')
+    if ids:
+        try:
+            modules = modules.filter(id__in=[int(i) for i in ids.split(',')])
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'ids must be a comma separated list of module ids'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(export_archive(modules), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="modules-{timezone.now():%Y%m%d-%H%M%S}.zip"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_modules(request):
+    """
+    Create the modules of an uploaded archive (field "archive"), authored by the
+    current user. Modules whose title already exists are skipped.
+    """
+    user = request.user
+    if not (user.is_staff or is_teacher(user)):
+        return Response({
+            'success': False,
+            'error': 'Access denied. Teachers only.'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if 'archive' not in request.FILES:
+        return Response({
+            'success': False,
+            'error': 'No archive file provided'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = import_archive(request.FILES['archive'], user, request.build_absolute_uri(settings.MEDIA_URL))
+    except ArchiveError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        **result
+    }, status=status.HTTP_201_CREATED)
@@ -0,0 +1,139 @@
+"""
+Serving of uploaded media.
+
+The view only decides whether a file may be read and which cache headers it
+gets; with MEDIA_ACCEL set the bytes are sent by the front proxy
+(X-Accel-Redirect for nginx, X-Sendfile for Apache mod_xsendfile and
+lighttpd). Without it the file is streamed with FileResponse, honouring
+single Range requests so videos and large images can be resumed.
+
+Content-addressed uploads (uploads/<sha256>...) never change, so they are
+cached for a year as immutable and revalidated by their hash.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Originals and resized copies named after the SHA-256 of the upload
+CONTENT_ADDRESSED = re.compile(r'^uploads/[0-9a-f]{64}(?:-\d+w)?\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _Range:
+    """File object reading length bytes from the current position, for FileResponse"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def can_read(request, path):
+    """Public media for anyone, the rest for staff authenticated with a bearer token"""
+    if path.startswith(settings.MEDIA_PUBLIC_PREFIXES):
+        return True
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def parse_range(header, size):
+    """(start, length) of a single satisfiable byte range, None to send the whole file"""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        # The last bytes
+        length = min(int(end), size)
+        if length == 0:
+            raise ValueError('Unsatisfiable range')
+        return size - length, length
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError('Unsatisfiable range')
+    return start, end - start + 1
+
+
+@require_safe
+def serve_media(request, path):
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if os.path.basename(path).startswith('.') or not os.path.isfile(full_path):
+        raise Http404('File not found')
+    if not can_read(request, path):
+        # Same answer as a missing file, private names are not confirmed
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    if CONTENT_ADDRESSED.match(path):
+        # The name is the hash of the content
+        etag = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+        not_modified = etag in parse_etags(request.headers.get('If-None-Match', ''))
+    else:
+        etag = None
+        cache_control = ('public' if path.startswith(settings.MEDIA_PUBLIC_PREFIXES) else 'private') + f', max-age={settings.MEDIA_CACHE_MAX_AGE}'
+        not_modified = (
+            'If-Modified-Since' in request.headers
+            and not was_modified_since(request.headers['If-Modified-Since'], stat.st_mtime)
+        )
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if not_modified:
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_ACCEL == 'nginx':
+        # nginx answers Range requests of the redirected file itself
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + path)
+    elif settings.MEDIA_ACCEL == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        try:
+            byte_range = parse_range(request.headers.get('Range', ''), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        file = open(full_path, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            start, length = byte_range
+            file.seek(start)
+            response = FileResponse(_Range(file, length), status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{start + length - 1}/{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['Cache-Control'] = cache_control
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if etag:
+        response['ETag'] = etag
+    return response
@@ -0,0 +1,38 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from . import search
+
+MAX_LIMIT = 50
+KINDS = ('module', 'lesson')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_content(request):
+    """
+    Search module titles and descriptions and lesson titles and content.
+    ?q= words matched as prefixes, ?type=module|lesson, ?limit= (max 50) and ?offset= page the results.
+    Students find published content, teachers also their own drafts, admins everything.
+    """
+    query = request.query_params.get('q', '').strip()
+    kind = request.query_params.get('type') or None
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), MAX_LIMIT)
+        offset = int(request.query_params.get('offset', 0))
+    except ValueError:
+        limit = offset = -1
+    if limit < 1 or offset < 0 or kind not in (None, *KINDS):
+        return Response({
+            'success': False,
+            'error': 'limit must be 1 to 50, offset at least 0 and type module or lesson'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    results = search.search(query, request.user, kind=kind, limit=limit, offset=offset)
+    return Response({
+        'success': True,
+        'query': query,
+        'count': len(results),
+        'results': results
+    }, status=status.HTTP_200_OK)
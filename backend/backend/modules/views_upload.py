@@ -3,10 +3,23 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.conf import settings
 import os
-import uuid
+from .uploads import CHUNK_SIZE, ImageUploadHandler, UploadError, UploadSession, save_upload
+
+
+# Suggested size of the chunks of a resumable upload
+RESUMABLE_CHUNK_SIZE = 16 * CHUNK_SIZE
+
+
+def uploaded_response(request, file_path):
+    # Generate absolute URL
+    file_url = request.build_absolute_uri(default_storage.url(file_path))
+
+    return Response({
+        'success': True,
+        'url': file_url,
+        'filename': os.path.basename(file_path)
+    }, status=status.HTTP_201_CREATED)
 
 
 @api_view(['POST'])
@@ -14,42 +27,84 @@ import uuid
 def upload_image(request):
     """
     Upload an image file and return its URL.
+    The file is streamed to disk; its type comes from its first bytes, not its name.
     """
+    # Must be set before the body is parsed
+    handler = ImageUploadHandler(request._request)
+    request._request.upload_handlers = [handler]
+
     if 'image' not in request.FILES:
         return Response({
             'success': False,
-            'error': 'No image file provided'
+            'error': handler.error or 'No image file provided'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    image_file = request.FILES['image']
-    
-    # Validate file type
-    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
-    ext = os.path.splitext(image_file.name)[1].lower()
-    if ext not in allowed_extensions:
+
+    # Moves the temporary file into place without reading it, unless the same image is stored already
+    file_path = save_upload(request.FILES['image'], handler.extension, handler.digest)
+    return uploaded_response(request, file_path)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    """
+    Start a resumable image upload of {"size": total bytes}.
+    Chunks are then sent with PUT to the session, each with an Upload-Offset header.
+    """
+    try:
+        session = UploadSession.create(request.user, request.data.get('size'))
+    except UploadError as e:
         return Response({
             'success': False,
-            'error': f'Invalid file type. Allowed types: {", ".join(allowed_extensions)}'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Validate file size (max 5MB)
-    if image_file.size > 5 * 1024 * 1024:
+            'error': str(e)
+        }, status=e.status)
+
+    return Response({
+        'success': True,
+        'upload_id': session.id,
+        'offset': 0,
+        'size': session.size,
+        'chunk_size': RESUMABLE_CHUNK_SIZE
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session(request, upload_id):
+    """
+    GET: the offset to resume from.
+    PUT: append the request body at the Upload-Offset header; the last chunk
+    stores the image and returns its URL like upload_image.
+    DELETE: abort the upload.
+    """
+    try:
+        session = UploadSession.get(upload_id, request.user)
+
+        if request.method == 'DELETE':
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PUT':
+            try:
+                offset = int(request.headers['Upload-Offset'])
+                length = int(request.headers.get('Content-Length') or 0)
+            except (KeyError, ValueError):
+                raise UploadError('Upload-Offset and Content-Length headers are required')
+            # Read from the request body stream, never loaded as a whole
+            new_offset = session.append(request._request, offset, length)
+            if new_offset == session.size:
+                return uploaded_response(request, session.complete())
+        else:
+            new_offset = session.offset
+    except UploadError as e:
         return Response({
             'success': False,
-            'error': 'File size too large. Maximum size is 5MB'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4().hex}{ext}"
-    
-    # Save file to media directory
-    file_path = default_storage.save(f"uploads/{unique_filename}", ContentFile(image_file.read()))
-    
-    # Generate absolute URL
-    file_url = request.build_absolute_uri(default_storage.url(file_path))
-    
+            'error': str(e)
+        }, status=e.status)
+
     return Response({
         'success': True,
-        'url': file_url,
-        'filename': unique_filename
-    }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        'upload_id': session.id,
+        'offset': new_offset,
+        'size': session.size
+    }, status=status.HTTP_200_OK)
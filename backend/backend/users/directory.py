@@ -0,0 +1,136 @@
+"""
+Filtering, paging and export of the admin user directory.
+
+Filters are query parameters shared by the list and the export:
+
+    q                 prefix of the username, email or full name, any case
+    role              role name (Student, Teacher, Admin)
+    institution       exact institution
+    semester          semester number
+    registered_from   first registration date, YYYY-MM-DD
+    registered_to     last registration date, YYYY-MM-DD (inclusive)
+
+The prefix search compares lower(column) against a range, which the
+expression indexes on User can answer on SQLite and PostgreSQL alike; LIKE
+and ILIKE would scan the table. Pages are keyset paginated on the id
+(newest first): ?cursor=<next_cursor of the previous page> costs the same on
+the last page as on the first, unlike OFFSET.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import User
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+SEARCH_FIELDS = ('username', 'email', 'full_name')
+EXPORT_FIELDS = (
+    'id', 'username', 'email', 'full_name', 'institution', 'semester', 'role__name', 'is_active', 'is_staff', 'date_registered'
+)
+# Spreadsheets run CSV cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class DirectoryError(Exception):
+    pass
+
+
+def prefix_range(prefix):
+    """(low, high) bounds of the strings starting with prefix: low <= value < high"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _integer(params, name):
+    try:
+        return int(params[name])
+    except ValueError:
+        raise DirectoryError(f'{name} must be a number')
+
+
+def _date(params, name):
+    value = parse_date(params[name])
+    if value is None:
+        raise DirectoryError(f'{name} must be a date (YYYY-MM-DD)')
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def filter_users(params):
+    """Users matching the filters in params (a QueryDict), newest first, without the ones being purged"""
+    users = User.objects.filter(deleted_at=None)
+
+    prefix = params.get('q', '').strip().lower()
+    if prefix:
+        low, high = prefix_range(prefix)
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}_lower__gte': low, f'{field}_lower__lt': high})
+        users = users.annotate(**{f'{field}_lower': Lower(field) for field in SEARCH_FIELDS}).filter(condition)
+
+    if params.get('role'):
+        users = users.filter(role__name=params['role'])
+    if params.get('institution'):
+        users = users.filter(institution=params['institution'])
+    if params.get('semester'):
+        users = users.filter(semester=_integer(params, 'semester'))
+    if params.get('registered_from'):
+        users = users.filter(date_registered__gte=_date(params, 'registered_from'))
+    if params.get('registered_to'):
+        users = users.filter(date_registered__lt=_date(params, 'registered_to') + timedelta(days=1))
+
+    return users.order_by('-id')
+
+
+def page(users, params):
+    """(users of the page, next_cursor or None on the last page) for ?cursor= and ?limit="""
+    limit = _integer(params, 'limit') if params.get('limit') else DEFAULT_PAGE_SIZE
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise DirectoryError(f'limit must be 1 to {MAX_PAGE_SIZE}')
+    if params.get('cursor'):
+        users = users.filter(id__lt=_integer(params, 'cursor'))
+
+    # One row more tells whether there is a next page
+    rows = list(users[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+class _Echo:
+    """File-like object handing csv.writer's output back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _rows(users):
+    for row in users.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = list(row)
+        row[-1] = row[-1].isoformat()
+        yield row
+
+
+def _cell(value):
+    """value quoted with a ' when a spreadsheet would run it as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def export_csv(users):
+    """CSV lines of users, read in chunks so memory stays flat however many there are"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([field.replace('__name', '') for field in EXPORT_FIELDS])
+    for row in _rows(users):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def export_ndjson(users):
+    """One JSON object per user and line, see export_csv()"""
+    names = [field.replace('__name', '') for field in EXPORT_FIELDS]
+    for row in _rows(users):
+        yield json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
@@ -0,0 +1,64 @@
+"""
+Published headlines of the landing page, served from a copy in each worker.
+
+Every page load reads the headlines while admins change them a few times a
+week, so each process keeps the rendered response of the published ones,
+tagged with a stamp of the table: the newest date_updated, which every save
+moves, and the row count, which every delete changes. The stamp is read from
+the database, which all workers share whatever the cache backend: a read
+costs one aggregate over the few headlines, and a change shows in every
+worker on its next read.
+
+The copy also expires at the next publish_from or publish_until, so
+scheduled headlines appear and disappear on time without a write.
+"""
+import hashlib
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from backend import metrics
+from .models import Headline
+
+# (stamp, expires or None, body, etag) of this process
+_published = None
+
+
+def stamp():
+    """Changes with every save or delete of a headline"""
+    return tuple(Headline.objects.aggregate(updated=Max('date_updated'), count=Count('id')).values())
+
+
+def published(now):
+    """(headlines published at now in order, time the published set changes next or None)"""
+    headlines = Headline.objects.filter(Q(publish_until=None) | Q(publish_until__gt=now)).values_list(
+        'id', 'title', 'url', 'publish_from', 'publish_until'
+    )
+    current = []
+    changes = []
+    for headline_id, title, url, publish_from, publish_until in headlines:
+        if publish_from is not None and publish_from > now:
+            changes.append(publish_from)
+            continue
+        if publish_until is not None:
+            changes.append(publish_until)
+        current.append({'id': headline_id, 'title': title, 'url': url})
+    return current, min(changes, default=None)
+
+
+def get():
+    """(rendered body, etag) of the published headlines"""
+    global _published
+    # Read before the headlines: a change committed meanwhile then only costs one more reload
+    version = stamp()
+    now = timezone.now()
+    copy = _published
+    hit = copy is not None and copy[0] == version and (copy[1] is None or now < copy[1])
+    metrics.record_cache('headlines', hit)
+    if hit:
+        return copy[2], copy[3]
+
+    headlines, expires = published(now)
+    body = api_settings.DEFAULT_RENDERER_CLASSES[0]().render({'success': True, 'headlines': headlines})
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    _published = (version, expires, body, etag)
+    return body, etag
@@ -0,0 +1,354 @@
+import json
+import platform
+import statistics
+import tempfile
+import time
+import zipfile
+from io import BytesIO, StringIO
+from urllib.parse import urlencode
+from django import get_version
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Headline, User
+from modules.archive import export_archive
+from modules.uploads import UploadSession
+from modules.models import Lesson, Module
+from activities.models import Activity, UserOverview
+
+
+# Smallest valid PNG, used for the upload endpoint
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082'
+)
+
+# Endpoints hashing a password on every call are far slower, they run fewer iterations
+SLOW_ENDPOINTS = {'token_obtain_pair', 'login', 'register', 'change-password', 'admin-create-user', 'admin-provision-users', 'admin-change-user-password'}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def iter_routes(patterns, prefix=''):
+    """Yield the full route of every URL pattern, skipping format suffix duplicates"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, prefix + str(pattern.pattern).removeprefix('^'))
+        elif isinstance(pattern, URLPattern) and 'format>' not in str(pattern.pattern):
+            # Same normalization as ResolverMatch.route
+            yield prefix + str(pattern.pattern).removeprefix('^')
+
+
+def renamed_archive(content):
+    """The module archive with new module titles, so importing it creates every module instead of skipping them"""
+    output = BytesIO()
+    with zipfile.ZipFile(BytesIO(content)) as source, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in source.namelist():
+            data = source.read(name)
+            if name == 'modules.ndjson':
+                modules = [json.loads(line) for line in data.splitlines()]
+                data = ''.join(json.dumps({**module, 'title': f'Imported {module["title"]}'}) + '\n' for module in modules).encode()
+            archive.writestr(name, data)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API endpoint against a generated dataset and write latency, query and size results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000, help='Synthetic students passed to seed_data')
+        parser.add_argument('--teachers', type=int, default=10, help='Synthetic teachers passed to seed_data')
+        parser.add_argument('--modules', type=int, default=100, help='Synthetic modules passed to seed_data')
+        parser.add_argument('--lessons-per-module', type=int, default=20, help='Lessons per synthetic module passed to seed_data')
+        parser.add_argument('--activities-per-student', type=int, default=10, help='Activities per synthetic student passed to seed_data')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed passed to seed_data')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per endpoint')
+        parser.add_argument('--slow-iterations', type=int, default=3, help='Timed requests per password hashing endpoint')
+        parser.add_argument('--endpoint', action='append', default=[], help='Only run endpoints whose URL name contains this text (repeatable)')
+        parser.add_argument('--output', type=str, default='benchmark.json', help='File the JSON results are written to')
+        parser.add_argument('--compare', type=str, help='Previous results file, report and fail on regressions')
+        parser.add_argument('--threshold', type=float, default=1.25, help='Allowed p95 slowdown ratio when comparing')
+
+    def handle(self, *args, **options):
+        # Never touch the real database: seed and benchmark a throwaway test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        media_root = tempfile.TemporaryDirectory()
+        try:
+            with override_settings(
+                DEBUG=False, DATABASE_REPLICAS=[], MEDIA_ROOT=media_root.name,
+                CHUNKED_UPLOAD_DIR=f'{media_root.name}/upload_sessions', IMAGE_DERIVATIVES=False
+            ):
+                results = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            media_root.cleanup()
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        # Their timings and query counts measure an error page, not the endpoint
+        failed = [result for result in results['endpoints'].values() if result['status'] >= 500]
+        for result in failed:
+            self.stdout.write(self.style.ERROR(f'{result["key"]}: status {result["status"]}'))
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+        if failed:
+            raise CommandError(f'{len(failed)} endpoints failed with a server error')
+
+    def run_benchmark(self, options):
+        self.stdout.write('Seeding benchmark dataset...')
+        started = time.monotonic()
+        call_command(
+            'seed_data',
+            students=options['students'],
+            teachers=options['teachers'],
+            modules=options['modules'],
+            lessons_per_module=options['lessons_per_module'],
+            activities_per_student=options['activities_per_student'],
+            seed=options['seed'],
+            stdout=StringIO()
+        )
+        self.stdout.write(f'Seeded in {time.monotonic() - started:.1f}s')
+
+        client = Client(raise_request_exception=False)
+        endpoints = self.build_endpoints()
+        if options['endpoint']:
+            endpoints = [e for e in endpoints if any(text in e['name'] for text in options['endpoint'])]
+
+        results = {}
+        self.stdout.write(f'{"endpoint":<72} {"status":>6} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8} {"bytes":>10}')
+        for endpoint in endpoints:
+            iterations = options['slow_iterations'] if endpoint['name'] in SLOW_ENDPOINTS else options['iterations']
+            result = self.measure(client, endpoint, iterations)
+            results[result['key']] = result
+            self.stdout.write(
+                f'{result["key"]:<72} {result["status"]:>6} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                f'{result["p99_ms"]:>8.2f} {result["queries"]:>8} {result["response_bytes"]:>10}'
+            )
+
+        if not options['endpoint']:
+            covered = {result['route'] for result in results.values()}
+            for route in sorted(set(iter_routes(get_resolver().url_patterns)) - covered):
+                self.stdout.write(self.style.WARNING(f'Not benchmarked: {route}'))
+
+        return {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'django': get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in ('students', 'teachers', 'modules', 'lessons_per_module', 'activities_per_student', 'seed')},
+                'iterations': options['iterations'],
+            },
+            'endpoints': results
+        }
+
+    def build_endpoints(self):
+        """Describe how to call every endpoint registered in backend/urls.py"""
+        admin = User.objects.get(username='admin')
+        student = User.objects.filter(username='student_000001').first() or User.objects.get(username='student_alice')
+        other_student = User.objects.filter(role__name='Student').exclude(id=student.id).first()
+
+        activity = Activity.objects.filter(student_id=student).first()
+        exam = Lesson.objects.filter(module_id=activity.modules_id, lesson_type='exam').first() or Lesson.objects.filter(lesson_type='exam').first()
+        module = exam.module_id
+        lesson = Lesson.objects.filter(module_id=module, lesson_type='lesson').order_by('order').first()
+        teacher = module.author
+        overview = UserOverview.objects.filter(user_id=student).first()
+        # An edit, so the lesson has revisions 1 and 2 to compare
+        lesson.content = lesson.content + '\n'
+        lesson.save()
+        role = student.role
+        headline = Headline.objects.first() or Headline.objects.create(title='Benchmark', url='/')
+
+        module_ids = {'module_id': module.id}
+        lesson_ids = {'module_id': module.id, 'lesson_id': lesson.id}
+        upload = UploadSession.create(teacher, len(PNG_BYTES))
+        module_archive = renamed_archive(b''.join(export_archive(Module.objects.filter(id=module.id))))
+        module_lesson_ids = list(Lesson.objects.filter(module_id=module).order_by('order').values_list('id', flat=True))
+        user_data = {
+            'username': 'benchmark_user', 'email': 'benchmark@student.edu', 'password': 'benchmark123',
+            'full_name': 'Benchmark User', 'institution': 'Taneyan Lanjeng University', 'semester': 1, 'role': role.id
+        }
+        # A cohort sharing its first password, hashed once
+        cohort = [
+            {
+                'username': f'benchmark_cohort_{n}', 'email': f'benchmark_cohort_{n}@student.edu', 'full_name': f'Cohort Student {n}',
+                'institution': 'Taneyan Lanjeng University', 'semester': 1, 'role': 'Student'
+            }
+            for n in range(100)
+        ]
+
+        endpoints = [
+            {'name': 'token_obtain_pair', 'method': 'post', 'data': {'username': student.username, 'password': 'student123'}},
+            {'name': 'token_refresh', 'method': 'post', 'data': {'refresh': str(RefreshToken.for_user(student))}},
+            {'name': 'login', 'method': 'post', 'data': {'username': student.username, 'password': 'student123'}},
+            {'name': 'register', 'method': 'post', 'data': user_data},
+            {'name': 'modules-overview', 'user': student},
+            {'name': 'teacher-modules', 'user': teacher},
+            {'name': 'modules-export', 'user': teacher},
+            {'name': 'modules-import', 'method': 'post', 'user': teacher, 'files': {'archive': ('benchmark.zip', module_archive, 'application/zip')}},
+            {'name': 'search', 'user': student, 'query': {'q': 'program'}},
+            {'name': 'module-detail-with-lessons', 'user': student, 'kwargs': module_ids},
+            {'name': 'lesson-detail', 'user': student, 'kwargs': lesson_ids},
+            {'name': 'module-lessons-bulk', 'method': 'post', 'user': teacher, 'kwargs': module_ids, 'data': {'order': module_lesson_ids[::-1]}},
+            {'name': 'teacher-stats', 'user': teacher},
+            {'name': 'student-stats', 'user': student},
+            {'name': 'student-exam-history', 'user': student},
+            {'name': 'update-lesson-progress', 'method': 'post', 'user': student, 'kwargs': lesson_ids},
+            {'name': 'user-profile', 'user': student},
+            {'name': 'update-user-profile', 'method': 'patch', 'user': student, 'data': {'full_name': 'Updated Name'}},
+            {'name': 'headlines'},
+            {'name': 'change-password', 'method': 'post', 'user': student, 'data': {'current_password': 'student123', 'new_password': 'student456'}},
+            {'name': 'submit-exam-answers', 'method': 'post', 'user': student, 'kwargs': {'lesson_id': exam.id}, 'data': {'answers': {'1': 'Option A'}}},
+            {'name': 'upload-image', 'method': 'post', 'user': teacher, 'files': {'image': ('benchmark.png', PNG_BYTES, 'image/png')}},
+            {'name': 'upload-image-sessions', 'method': 'post', 'user': teacher, 'data': {'size': len(PNG_BYTES)}},
+            {'name': 'upload-image-session', 'user': teacher, 'kwargs': {'upload_id': upload.id}},
+            {'name': 'admin-stats', 'user': admin},
+            {'name': 'admin-metrics', 'user': admin},
+            {'name': 'admin-get-all-users', 'user': admin},
+            {'name': 'admin-get-all-users', 'user': admin, 'query': {'q': 'stu', 'role': 'Student', 'limit': 50}},
+            {'name': 'admin-export-users', 'user': admin},
+            {'name': 'admin-export-users', 'user': admin, 'query': {'format': 'ndjson', 'role': 'Teacher'}},
+            {'name': 'admin-create-user', 'method': 'post', 'user': admin, 'data': user_data},
+            {'name': 'admin-provision-users', 'method': 'post', 'user': admin, 'data': {'users': cohort, 'default_password': 'benchmark-pass'}},
+            {'name': 'admin-update-user', 'method': 'put', 'user': admin, 'kwargs': {'user_id': other_student.id}, 'data': {'full_name': 'Updated Name'}},
+            {'name': 'admin-delete-user', 'method': 'delete', 'user': admin, 'kwargs': {'user_id': other_student.id}},
+            {'name': 'admin-change-user-password', 'method': 'post', 'user': admin, 'kwargs': {'user_id': other_student.id}, 'data': {'new_password': 'student456'}},
+            {'name': 'admin-get-all-modules', 'user': admin},
+            {'name': 'admin-delete-module', 'method': 'delete', 'user': admin, 'kwargs': module_ids},
+            {'name': 'admin-get-headlines', 'user': admin},
+            {'name': 'admin-create-headline', 'method': 'post', 'user': admin, 'data': {'title': 'Benchmark', 'url': '/'}},
+            {'name': 'admin-update-headline', 'method': 'put', 'user': admin, 'kwargs': {'headline_id': headline.id}, 'data': {'title': 'Benchmark', 'url': '/'}},
+            {'name': 'admin-delete-headline', 'method': 'delete', 'user': admin, 'kwargs': {'headline_id': headline.id}},
+            {'name': 'api-root', 'user': student},
+            {'name': 'role-list'},
+            {'name': 'role-detail', 'kwargs': {'pk': role.id}},
+            {'name': 'user-list', 'user': admin},
+            {'name': 'user-detail', 'user': admin, 'kwargs': {'pk': student.id}},
+            {'name': 'module-list', 'user': student},
+            {'name': 'module-list', 'method': 'post', 'user': teacher, 'data': {'title': 'Benchmark Module', 'deadline': timezone.now().isoformat()}},
+            {'name': 'module-detail', 'user': student, 'kwargs': {'pk': module.id}},
+            {'name': 'module-detail', 'method': 'patch', 'user': teacher, 'kwargs': {'pk': module.id}, 'data': {'description': 'Updated'}},
+            {'name': 'lesson-list', 'user': student},
+            {'name': 'lesson-detail', 'user': student, 'kwargs': {'pk': lesson.id}},
+            {'name': 'lesson-detail', 'method': 'patch', 'user': teacher, 'kwargs': {'pk': lesson.id}, 'data': {'duration_minutes': 45}},
+            {'name': 'lesson-revisions', 'user': teacher, 'kwargs': {'pk': lesson.id}},
+            {'name': 'lesson-revision-diff', 'user': teacher, 'kwargs': {'pk': lesson.id, 'number': 2}},
+            {'name': 'activity-list', 'user': student},
+            {'name': 'activity-detail', 'user': student, 'kwargs': {'pk': activity.id}},
+            {'name': 'useroverview-list', 'user': student},
+            {'name': 'useroverview-detail', 'user': student, 'kwargs': {'pk': overview.id}},
+        ]
+
+        tokens = {}
+        for endpoint in endpoints:
+            endpoint['path'] = reverse(endpoint['name'], kwargs=endpoint.get('kwargs'))
+            endpoint['route'] = resolve(endpoint['path']).route
+            endpoint['key'] = f'{endpoint.get("method", "get").upper()} {endpoint["route"]}'
+            if endpoint.get('query'):
+                # Also in the key: the same route can be benchmarked with several queries
+                endpoint['path'] += f'?{urlencode(endpoint["query"])}'
+                endpoint['key'] += f'?{urlencode(endpoint["query"])}'
+            if endpoint.get('user'):
+                user = endpoint['user']
+                if user.id not in tokens:
+                    tokens[user.id] = str(RefreshToken.for_user(user).access_token)
+                endpoint['token'] = tokens[user.id]
+        return endpoints
+
+    def request(self, client, endpoint):
+        path = endpoint['path']
+        method = endpoint.get('method', 'get')
+        headers = {}
+        if endpoint.get('user'):
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {endpoint["token"]}'
+        if endpoint.get('files'):
+            files = {
+                field: SimpleUploadedFile(name, content, content_type=content_type)
+                for field, (name, content, content_type) in endpoint['files'].items()
+            }
+            return client.post(path, files, **headers)
+        if method == 'get':
+            return client.get(path, **headers)
+        return getattr(client, method)(path, json.dumps(endpoint.get('data', {})), content_type='application/json', **headers)
+
+    def call(self, client, endpoint):
+        """Make one request, rolling back whatever a mutating request wrote"""
+        if endpoint.get('method', 'get') == 'get':
+            response = self.request(client, endpoint)
+        else:
+            with transaction.atomic():
+                response = self.request(client, endpoint)
+                transaction.set_rollback(True)
+        if getattr(response, 'streaming', False):
+            return response, sum(len(chunk) for chunk in response.streaming_content)
+        return response, len(response.content)
+
+    def measure(self, client, endpoint, iterations):
+        # Warm-up request, also used to count queries without slowing the timed runs
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response, size = self.call(client, endpoint)
+        # Captured queries are read lazily from the connection, count them before the next request
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            self.call(client, endpoint)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        return {
+            'key': endpoint['key'],
+            'name': endpoint['name'],
+            'route': endpoint['route'],
+            'method': endpoint.get('method', 'get').upper(),
+            'path': endpoint['path'],
+            'status': response.status_code,
+            'iterations': iterations,
+            'mean_ms': round(statistics.fmean(timings), 3) if timings else None,
+            'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+            'p99_ms': round(percentile(timings, 99), 3) if timings else None,
+            'queries': query_count,
+            'response_bytes': size,
+        }
+
+    def compare(self, results, baseline_path, threshold):
+        """Fail when an endpoint got slower than the threshold or runs more queries than before"""
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)['endpoints']
+
+        regressions = []
+        for key, result in results['endpoints'].items():
+            before = baseline.get(key)
+            if not before:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f'{key}: queries {before["queries"]} -> {result["queries"]}')
+            # Ignore sub-millisecond noise on fast endpoints
+            if result['p95_ms'] and before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * threshold and result['p95_ms'] - before['p95_ms'] > 1:
+                regressions.append(f'{key}: p95 {before["p95_ms"]:.2f}ms -> {result["p95_ms"]:.2f}ms')
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(regressions)} regressions compared to {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions compared to {baseline_path}'))
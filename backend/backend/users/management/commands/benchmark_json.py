@@ -0,0 +1,68 @@
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from backend.renderers import ORJSONParser, ORJSONRenderer
+from modules.models import Module
+from modules.serializers import ModuleWithLessonsSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and peak memory of the stdlib and orjson renderers and parsers on ModuleWithLessonsSerializer output'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', type=int, default=100, help='Synthetic modules passed to seed_data')
+        parser.add_argument('--lessons-per-module', type=int, default=20, help='Lessons per synthetic module passed to seed_data')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed runs per renderer and parser')
+
+    def handle(self, *args, **options):
+        # Never touch the real database: seed a throwaway test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command(
+                'seed_data',
+                modules=options['modules'],
+                lessons_per_module=options['lessons_per_module'],
+                stdout=StringIO()
+            )
+            modules = Module.objects.select_related('author').prefetch_related('lessons').order_by('-date_created')
+            data = ModuleWithLessonsSerializer(modules, many=True).data
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        content = JSONRenderer().render(data)
+        self.stdout.write(f'Payload: {len(data)} modules, {len(content) / 1024 / 1024:.2f} MB')
+        if ORJSONRenderer().render(data) != content:
+            self.stdout.write(self.style.WARNING('orjson output differs from JSONRenderer output'))
+
+        self.stdout.write(f'{"":<24} {"ms/op":>8} {"MB/s":>8} {"peak MB":>8}')
+        for name, operation in (
+            ('JSONRenderer', lambda: JSONRenderer().render(data)),
+            ('ORJSONRenderer', lambda: ORJSONRenderer().render(data)),
+            ('JSONParser', lambda: JSONParser().parse(BytesIO(content))),
+            ('ORJSONParser', lambda: ORJSONParser().parse(BytesIO(content))),
+        ):
+            self.report(name, operation, len(content), options['iterations'])
+
+    def report(self, name, operation, size, iterations):
+        operation()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        elapsed = (time.perf_counter() - started) / iterations
+
+        tracemalloc.start()
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'{name:<24} {elapsed * 1000:>8.2f} {size / elapsed / 1024 / 1024:>8.1f} {peak / 1024 / 1024:>8.2f}'
+        )
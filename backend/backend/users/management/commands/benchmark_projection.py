@@ -0,0 +1,74 @@
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from backend.projection import projection_for
+from modules.models import Module, Lesson
+from modules.serializers import LessonSerializer, ModuleWithLessonsSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare the serializer-free projections with LessonSerializer and ModuleWithLessonsSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', type=int, default=500, help='Synthetic modules passed to seed_data')
+        parser.add_argument('--lessons-per-module', type=int, default=20, help='Lessons per synthetic module passed to seed_data')
+        parser.add_argument('--iterations', type=int, default=5, help='Timed runs per serializer and projection')
+
+    def handle(self, *args, **options):
+        # Never touch the real database: seed a throwaway test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command(
+                'seed_data',
+                modules=options['modules'],
+                lessons_per_module=options['lessons_per_module'],
+                stdout=StringIO()
+            )
+            self.run_benchmark(options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmark(self, iterations):
+        # Orderings without ties, so both paths list the rows in the same order
+        lessons = Lesson.objects.select_related('lesson_content').order_by('id')
+        modules = Module.objects.order_by('id')
+        cases = (
+            (
+                f'{lessons.count()} lessons',
+                lambda: LessonSerializer(lessons.all(), many=True).data,
+                lambda: projection_for(LessonSerializer).project(lessons.all()),
+            ),
+            (
+                f'{modules.count()} modules with lessons',
+                lambda: ModuleWithLessonsSerializer(
+                    modules.select_related('author').prefetch_related('lessons'), many=True
+                ).data,
+                lambda: projection_for(ModuleWithLessonsSerializer).project(modules.all()),
+            ),
+        )
+
+        self.stdout.write(f'{"":<28} {"serializer ms":>14} {"projection ms":>14} {"speedup":>8}')
+        for name, serialize, project in cases:
+            if JSONRenderer().render(serialize()) != JSONRenderer().render(project()):
+                self.stdout.write(self.style.ERROR(f'{name}: projection output differs from the serializer'))
+            serializer_time = self.time(serialize, iterations)
+            projection_time = self.time(project, iterations)
+            self.stdout.write(
+                f'{name:<28} {serializer_time * 1000:>14.1f} {projection_time * 1000:>14.1f} '
+                f'{serializer_time / projection_time:>7.1f}x'
+            )
+
+    def time(self, operation, iterations):
+        """Best time of the runs, queries included"""
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from users.provisioning import RosterError, provision_users, read_roster
+
+
+class Command(BaseCommand):
+    help = 'Create the teachers and students of a CSV or JSON roster; invalid rows are listed and skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', type=str, help='Roster file (.csv with a header row, or .json)')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Roster format (default from the file extension)')
+        parser.add_argument('--default-password', type=str, help='Password of the rows without one')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default PASSWORD_HASH_WORKERS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the roster')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        roster_format = options['format'] or options['roster'].rsplit('.', 1)[-1].lower()
+        try:
+            with open(options['roster'], 'rb') as roster:
+                rows = read_roster(roster, roster_format)
+        except (OSError, RosterError) as e:
+            raise CommandError(str(e))
+
+        result = provision_users(
+            rows, default_password=options['default_password'], dry_run=options['dry_run'], workers=options['workers']
+        )
+        for error in result['errors']:
+            details = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f'Row {error["row"]} ({error["username"] or "no username"}): {details}'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{result["valid"]} valid rows, {len(result["errors"])} invalid'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result["created"]} users, skipped {len(result["errors"])} invalid rows '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
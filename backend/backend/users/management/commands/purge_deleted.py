@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from backend import purge
+
+
+class Command(BaseCommand):
+    help = ('Delete the soft deleted users and modules with everything depending on them, then the lesson bodies '
+            'no revision uses, reporting progress')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows to delete without deleting them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['dry_run']:
+            for queryset in purge.soft_deleted():
+                for model, rows, field in purge.plan(queryset):
+                    count = rows.count()
+                    if count and field:
+                        self.stdout.write(f'{model._meta.db_table}: {count} rows to set {field} to null')
+                    elif count:
+                        self.stdout.write(f'{model._meta.db_table}: {count} rows')
+            # Without the bases they leave unused
+            self.stdout.write(f'modules_lessonbody: {purge.unused_lesson_bodies().count()} unused rows')
+            return
+
+        def progress(model, deleted):
+            self.stdout.write(f'{model._meta.db_table}: {deleted} rows deleted ({time.perf_counter() - started:.1f}s)')
+
+        deleted = purge.purge_deleted(progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {sum(deleted.values())} rows from {len([count for count in deleted.values() if count])} tables '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -1,77 +1,88 @@
+import json
+import random
+import time
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
 from django.utils import timezone
 from datetime import timedelta
 from users.models import User, Role
-from modules.models import Module, Lesson
+from modules.models import Module, Lesson, LessonContent, SearchDocument
 from activities.models import Activity, UserOverview, TestHistory
+from activities import overviews
+from backend import payload_cache
 
 
-class Command(BaseCommand):
-    help = 'Seed the database with dummy data'
+FIRST_NAMES = ['Ahmad', 'Budi', 'Citra', 'Dewi', 'Eko', 'Fitri', 'Gilang', 'Hana', 'Indra', 'Joko',
+               'Kartika', 'Lestari', 'Mega', 'Nur', 'Oki', 'Putri', 'Rizky', 'Sari', 'Teguh', 'Wulan']
+LAST_NAMES = ['Pratama', 'Saputra', 'Wijaya', 'Hidayat', 'Santoso', 'Kusuma', 'Nugroho', 'Setiawan',
+              'Rahmawati', 'Lestari', 'Purnomo', 'Siregar', 'Hakim', 'Fauzi', 'Maulana']
+INSTITUTIONS = ['Taneyan Lanjeng University', 'State University', 'Universitas Trunojoyo Madura',
+                'Institut Teknologi Sepuluh Nopember', 'Universitas Airlangga']
+MODULE_TOPICS = ['Introduction to Programming', 'Data Structures and Algorithms', 'Web Development Fundamentals',
+                 'Database Management Systems', 'Object-Oriented Programming', 'Computer Networks',
+                 'Operating Systems', 'Software Engineering', 'Machine Learning Basics', 'Mobile Development']
+
 
+class Command(BaseCommand):
+    help = 'Seed the database with dummy data, optionally followed by a large synthetic load-test dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=0, help='Number of synthetic students to generate')
+        parser.add_argument('--teachers', type=int, default=10, help='Number of synthetic teachers authoring the synthetic modules')
+        parser.add_argument('--modules', type=int, default=0, help='Number of synthetic modules to generate')
+        parser.add_argument('--lessons-per-module', type=int, default=10, help='Lessons per synthetic module, the last one is an exam')
+        parser.add_argument('--activities-per-student', type=int, default=5, help='Modules each synthetic student has progress in')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, the same seed generates the same dataset')
+
+    @transaction.atomic
     def handle(self, *args, **kwargs):
+        started = time.monotonic()
+        self.batch_size = kwargs['batch_size']
         self.stdout.write(self.style.SUCCESS('Starting database seeding...'))
 
         # Clear existing data (optional)
         self.stdout.write('Clearing existing data...')
-        TestHistory.objects.all().delete()
-        UserOverview.objects.all().delete()
-        Activity.objects.all().delete()
-        Lesson.objects.all().delete()
-        Module.objects.all().delete()
-        User.objects.all().delete()
-        Role.objects.all().delete()
+        # Truncate the tables directly, deleting through the ORM loads every row into memory
+        seeded_models = [SearchDocument, TestHistory, UserOverview, Activity, LessonContent, Lesson, Module, User, Role]
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(
+            no_style(),
+            [model._meta.db_table for model in seeded_models],
+            reset_sequences=True,
+            allow_cascade=True
+        ))
 
         # Create Roles
         self.stdout.write('Creating roles...')
-        role_admin = Role.objects.create(name='Admin')
-        role_teacher = Role.objects.create(name='Teacher')
-        role_student = Role.objects.create(name='Student')
+        role_admin, role_teacher, role_student = Role.objects.bulk_create([
+            Role(name='Admin'),
+            Role(name='Teacher'),
+            Role(name='Student'),
+        ])
         self.stdout.write(self.style.SUCCESS(f'Created {Role.objects.count()} roles'))
 
         # Create Users
         self.stdout.write('Creating users...')
-        
-        # Admin user
-        admin_user = User.objects.create_user(
-            username='admin',
-            email='admin@taneyanlanjeng.edu',
-            password='admin123',
-            full_name='Administrator',
-            institution='Taneyan Lanjeng University',
-            semester=0,
-            profile_photo='https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=400'
+
+        # Hash every distinct password once instead of once per user
+        self.passwords = {}
+
+        admin_user = self.build_user(
+            'admin', 'admin@taneyanlanjeng.edu', 'admin123', 'Administrator', 'Taneyan Lanjeng University', 0,
+            'https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=400', role_admin, is_staff=True
         )
-        admin_user.role = role_admin
-        admin_user.save()
-
-        # Teacher users
-        teacher1 = User.objects.create_user(
-            username='teacher_john',
-            email='john.doe@taneyanlanjeng.edu',
-            password='teacher123',
-            full_name='John Doe',
-            institution='Taneyan Lanjeng University',
-            semester=0,
-            profile_photo='https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400'
+        teacher1 = self.build_user(
+            'teacher_john', 'john.doe@taneyanlanjeng.edu', 'teacher123', 'John Doe', 'Taneyan Lanjeng University', 0,
+            'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400', role_teacher
         )
-        teacher1.role = role_teacher
-        teacher1.save()
-
-        teacher2 = User.objects.create_user(
-            username='teacher_jane',
-            email='jane.smith@taneyanlanjeng.edu',
-            password='teacher_jane',
-            full_name='Jane Smith',
-            institution='Taneyan Lanjeng University',
-            semester=0,
-            profile_photo='https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400'
+        teacher2 = self.build_user(
+            'teacher_jane', 'jane.smith@taneyanlanjeng.edu', 'teacher_jane', 'Jane Smith', 'Taneyan Lanjeng University', 0,
+            'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400', role_teacher
         )
-        teacher2.role = role_teacher
-        teacher2.save()
 
         # Student users
-        students = []
         student_data = [
             ('student_alice', 'alice@student.edu', 'Alice Johnson', 'Taneyan Lanjeng University', 3, 'https://images.unsplash.com/photo-1494790108377-be9c29b29330?w=400'),
             ('student_bob', 'bob@student.edu', 'Bob Wilson', 'Taneyan Lanjeng University', 2, 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400'),
@@ -79,21 +90,12 @@ class Command(BaseCommand):
             ('student_diana', 'diana@student.edu', 'Diana Prince', 'State University', 5, 'https://images.unsplash.com/photo-1534528741775-53994a69daeb?w=400'),
             ('student_ethan', 'ethan@student.edu', 'Ethan Hunt', 'State University', 1, 'https://images.unsplash.com/photo-1504257432389-52343af06ae3?w=400'),
         ]
+        students = [
+            self.build_user(username, email, 'student123', full_name, institution, semester, profile_photo, role_student)
+            for username, email, full_name, institution, semester, profile_photo in student_data
+        ]
 
-        for username, email, full_name, institution, semester, profile_photo in student_data:
-            student = User.objects.create_user(
-                username=username,
-                email=email,
-                password='student123',
-                full_name=full_name,
-                institution=institution,
-                semester=semester,
-                profile_photo=profile_photo
-            )
-            student.role = role_student
-            student.save()
-            students.append(student)
-
+        User.objects.bulk_create([admin_user, teacher1, teacher2, *students])
         self.stdout.write(self.style.SUCCESS(f'Created {User.objects.count()} users'))
 
         # Create Modules
@@ -106,9 +108,8 @@ class Command(BaseCommand):
             ('Object-Oriented Programming', teacher1, 35, 'Advanced OOP concepts and design patterns', 'https://images.unsplash.com/photo-1515879218367-8466d910aaa4?w=400'),
         ]
 
-        modules = []
-        for title, author, days_until_deadline, description, cover_image in modules_data:
-            module = Module.objects.create(
+        modules = Module.objects.bulk_create([
+            Module(
                 title=title,
                 description=description,
                 deadline=timezone.now() + timedelta(days=days_until_deadline),
@@ -116,7 +117,8 @@ class Command(BaseCommand):
                 cover_image=cover_image,
                 is_published=True
             )
-            modules.append(module)
+            for title, author, days_until_deadline, description, cover_image in modules_data
+        ])
 
         self.stdout.write(self.style.SUCCESS(f'Created {Module.objects.count()} modules'))
 
@@ -1107,22 +1109,22 @@ Implement the Observer design pattern.''', 90),
             ],
         }
 
-        lesson_count = 0
-        for module in modules:
-            if module.title in lessons_data:
-                for order, (title, lesson_type, content, duration) in enumerate(lessons_data[module.title], start=1):
-                    Lesson.objects.create(
-                        module_id=module,
-                        title=title,
-                        content=content,
-                        lesson_type=lesson_type,
-                        order=order,
-                        duration_minutes=duration,
-                        is_published=True
-                    )
-                    lesson_count += 1
-
-        self.stdout.write(self.style.SUCCESS(f'Created {lesson_count} lessons'))
+        lessons = [
+            Lesson(
+                module_id=module,
+                title=title,
+                content=content,
+                lesson_type=lesson_type,
+                order=order,
+                duration_minutes=duration,
+                is_published=True
+            )
+            for module in modules
+            for order, (title, lesson_type, content, duration) in enumerate(lessons_data.get(module.title, []), start=1)
+        ]
+        Lesson.objects.bulk_create(lessons, batch_size=self.batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(lessons)} lessons'))
 
         # Create Activities for students
         self.stdout.write('Creating activities...')
@@ -1132,54 +1134,47 @@ Implement the Observer design pattern.''', 90),
                 # Vary progress for different students and modules
                 progress = (i + 1) * 20 if i < len(students) else 100
                 progress = min(progress, 100)
-                
-                activity = Activity.objects.create(
-                    student_id=student,
-                    modules_id=module,
-                    progress=progress
-                )
-                activities.append(activity)
+                activities.append(Activity(student_id=student, modules_id=module, progress=progress))
+        Activity.objects.bulk_create(activities, batch_size=self.batch_size)
 
-        self.stdout.write(self.style.SUCCESS(f'Created {Activity.objects.count()} activities'))
+        self.stdout.write(self.style.SUCCESS(f'Created {len(activities)} activities'))
 
         # Create UserOverview for each student
         self.stdout.write('Creating user overviews...')
-        for i, student in enumerate(students):
-            # Get activities for this student
-            student_activities = Activity.objects.filter(student_id=student)
-            
-            # Pick a last module learned (the one with highest progress)
-            last_module = student_activities.order_by('-progress').first().modules_id
-            
-            overview = UserOverview.objects.create(
-                user_id=student,
-                last_module_learned_id=last_module
-            )
-            
-            # Add activities to the many-to-many relationship
-            overview.user_activities.set(student_activities)
-
-        self.stdout.write(self.style.SUCCESS(f'Created {UserOverview.objects.count()} user overviews'))
+        overviews_count = self.create_overviews(activities)
+        self.stdout.write(self.style.SUCCESS(f'Created {overviews_count} user overviews'))
 
         # Create TestHistory
         self.stdout.write('Creating test history...')
-        test_count = 0
-        for student in students[:3]:  # Only first 3 students have test history
-            # Get exam lessons for the first 2 modules
-            exam_lessons = Lesson.objects.filter(module_id__in=modules[:2], lesson_type='exam')
-            for lesson in exam_lessons:
-                # Create test history with proper data
-                TestHistory.objects.create(
-                    student=student,
-                    lesson=lesson,
-                    score=85.0,  # Sample score
-                    max_score=100.0,
-                    answers={"1": "Option A", "2": "Option B"},  # Sample answers
-                    correct_answers={"1": "Option A", "2": "Option C"}  # Sample correct answers
-                )
-                test_count += 1
+        # Only the first 3 students have test history, for the exams of the first 2 modules
+        exam_lessons = [lesson for lesson in lessons if lesson.lesson_type == 'exam' and lesson.module_id in modules[:2]]
+        test_histories = [
+            TestHistory(
+                student=student,
+                lesson=lesson,
+                score=85.0,  # Sample score
+                max_score=100.0,
+                answers={"1": "Option A", "2": "Option B"},  # Sample answers
+                correct_answers={"1": "Option A", "2": "Option C"}  # Sample correct answers
+            )
+            for student in students[:3]
+            for lesson in exam_lessons
+        ]
+        TestHistory.objects.bulk_create(test_histories)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(test_histories)} test history records'))
+
+        if kwargs['students'] or kwargs['modules']:
+            lesson_bodies = [
+                (content, duration)
+                for module_lessons in lessons_data.values()
+                for _, lesson_type, content, duration in module_lessons
+                if lesson_type == 'lesson'
+            ]
+            self.generate_synthetic_data(kwargs, role_teacher, role_student, lesson_bodies)
 
-        self.stdout.write(self.style.SUCCESS(f'Created {test_count} test history records'))
+        # Bulk inserts send no signals, drop the cached payloads of the old data
+        payload_cache.invalidate()
 
         # Summary
         self.stdout.write(self.style.SUCCESS('\n=== Database Seeding Complete ==='))
@@ -1190,8 +1185,134 @@ Implement the Observer design pattern.''', 90),
         self.stdout.write(f'Activities: {Activity.objects.count()}')
         self.stdout.write(f'User Overviews: {UserOverview.objects.count()}')
         self.stdout.write(f'Test History: {TestHistory.objects.count()}')
-        
+        self.stdout.write(f'Finished in {time.monotonic() - started:.1f}s')
+
         self.stdout.write(self.style.SUCCESS('\n=== Login Credentials ==='))
         self.stdout.write('Admin: username=admin, password=admin123')
         self.stdout.write('Teachers: username=teacher_john/teacher_jane, password=teacher123')
-        self.stdout.write('Students: username=student_alice/bob/charlie/dian qa/ethan, password=student123')
+        self.stdout.write('Students: username=student_alice/bob/charlie/diana/ethan, password=student123')
+        if kwargs['students'] or kwargs['modules']:
+            self.stdout.write('Synthetic users: username=teacher_000001.../student_000001..., password=student123')
+
+    def build_user(self, username, email, password, full_name, institution, semester, profile_photo, role, is_staff=False):
+        """Build an unsaved user with a pre-hashed password"""
+        if password not in self.passwords:
+            self.passwords[password] = make_password(password)
+        return User(
+            username=username,
+            email=email,
+            password=self.passwords[password],
+            full_name=full_name,
+            institution=institution,
+            semester=semester,
+            profile_photo=profile_photo,
+            role=role,
+            is_active=True,
+            is_staff=is_staff
+        )
+
+    def create_overviews(self, activities):
+        """Summarize the progress of the students of activities, bulk created without Activity.save()"""
+        return overviews.refresh({activity.student_id_id for activity in activities})
+
+    def generate_synthetic_data(self, options, role_teacher, role_student, lesson_bodies):
+        """Generate a deterministic load-test dataset in batches"""
+        rng = random.Random(options['seed'])
+        batch_size = self.batch_size
+        lessons_per_module = max(options['lessons_per_module'], 1)
+
+        # Teachers
+        self.stdout.write(f'Generating {options["teachers"]} teachers...')
+        teachers = [
+            self.build_user(
+                f'teacher_{n:06d}', f'teacher_{n:06d}@taneyanlanjeng.edu', 'teacher123',
+                f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', rng.choice(INSTITUTIONS), 0, None, role_teacher
+            )
+            for n in range(1, max(options['teachers'], 1) + 1)
+        ]
+        User.objects.bulk_create(teachers, batch_size=batch_size)
+
+        # Modules and their lessons, the last lesson of every module is an exam
+        self.stdout.write(f'Generating {options["modules"]} modules with {lessons_per_module} lessons each...')
+        module_ids = []
+        exam_ids = {}
+        for start in range(0, options['modules'], batch_size):
+            modules = Module.objects.bulk_create([
+                Module(
+                    title=f'{rng.choice(MODULE_TOPICS)} {n}',
+                    description=f'Synthetic module number {n} for load testing',
+                    deadline=timezone.now() + timedelta(days=rng.randint(7, 180)),
+                    author=rng.choice(teachers),
+                    cover_image=f'https://picsum.photos/seed/module{n}/400/300',
+                    is_published=True
+                )
+                for n in range(start + 1, min(start + batch_size, options['modules']) + 1)
+            ])
+            lessons = []
+            for module in modules:
+                for order in range(1, lessons_per_module):
+                    content, duration = rng.choice(lesson_bodies)
+                    lessons.append(Lesson(
+                        module_id=module, title=f'Lesson {order}', content=content,
+                        lesson_type='lesson', order=order, duration_minutes=duration, is_published=True
+                    ))
+                lessons.append(Lesson(
+                    module_id=module, title=f'Final Exam - {module.title}', content=self.build_exam(rng),
+                    lesson_type='exam', order=lessons_per_module, duration_minutes=90, is_published=True
+                ))
+            Lesson.objects.bulk_create(lessons, batch_size=batch_size)
+            module_ids.extend(module.id for module in modules)
+            exam_ids.update((lesson.module_id_id, lesson.id) for lesson in lessons if lesson.lesson_type == 'exam')
+
+        if not module_ids:
+            module_ids = list(Module.objects.values_list('id', flat=True))
+            exam_ids = dict(Lesson.objects.filter(lesson_type='exam').values_list('module_id', 'id'))
+
+        # Students with their activities, overviews and exam results
+        activities_per_student = min(options['activities_per_student'], len(module_ids))
+        self.stdout.write(f'Generating {options["students"]} students with {activities_per_student} activities each...')
+        for start in range(0, options['students'], batch_size):
+            students = [
+                self.build_user(
+                    f'student_{n:06d}', f'student_{n:06d}@student.edu', 'student123',
+                    f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', rng.choice(INSTITUTIONS),
+                    rng.randint(1, 8), None, role_student
+                )
+                for n in range(start + 1, min(start + batch_size, options['students']) + 1)
+            ]
+            User.objects.bulk_create(students)
+
+            activities = [
+                Activity(student_id_id=student.id, modules_id_id=module_id, progress=rng.choice((0, 10, 25, 50, 75, 90, 100)))
+                for student in students
+                for module_id in rng.sample(module_ids, activities_per_student)
+            ]
+            Activity.objects.bulk_create(activities, batch_size=batch_size)
+            self.create_overviews(activities)
+
+            test_histories = []
+            for activity in activities:
+                exam_id = exam_ids.get(activity.modules_id_id)
+                if activity.progress == 100 and exam_id:
+                    score = float(rng.randint(0, 10))
+                    test_histories.append(TestHistory(
+                        student_id=activity.student_id_id, lesson_id=exam_id, score=score, max_score=10.0,
+                        answers={}, correct_answers={}
+                    ))
+            TestHistory.objects.bulk_create(test_histories, batch_size=batch_size)
+
+            self.stdout.write(f'  {start + len(students)}/{options["students"]} students')
+
+    def build_exam(self, rng, questions=10):
+        """Build exam content in the JSON question format graded by submit_exam_answers"""
+        exam = []
+        for question_id in range(1, questions + 1):
+            correct = rng.randint(0, 3)
+            exam.append({
+                'id': question_id,
+                'question': f'Question {question_id}: which option is correct?',
+                'type': 'multiple-choice',
+                'options': [{'text': f'Option {"ABCD"[i]}', 'isCorrect': i == correct} for i in range(4)],
+                'points': 1
+            })
+        return json.dumps(exam)
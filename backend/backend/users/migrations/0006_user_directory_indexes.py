@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_profile_photo_srcset'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='user_username_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='user_full_name_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['institution', 'semester'], name='user_institution_semester'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_registered'], name='user_date_registered'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:36
+
+from django.db import migrations, models
+
+
+# The headlines views_admin kept in memory until now
+DEFAULT_HEADLINES = [
+    ('Welcome to Taneyan Lanjeng Learning Platform', '/'),
+    ('New Python Programming Module Available', '/modules'),
+    ('Upcoming Maintenance on Saturday', '/'),
+]
+
+
+def add_default_headlines(apps, schema_editor):
+    Headline = apps.get_model('users', 'Headline')
+    Headline.objects.bulk_create([
+        Headline(title=title, url=url, order=order) for order, (title, url) in enumerate(DEFAULT_HEADLINES, 1)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Headline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('url', models.CharField(max_length=500)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('publish_from', models.DateTimeField(blank=True, null=True)),
+                ('publish_until', models.DateTimeField(blank=True, null=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['order', 'id'],
+                'constraints': [models.CheckConstraint(condition=models.Q(('publish_from', None), ('publish_until', None), ('publish_until__gt', models.F('publish_from')), _connector='OR'), name='headline_publish_window')],
+            },
+        ),
+        migrations.RunPython(add_default_headlines, migrations.RunPython.noop),
+    ]
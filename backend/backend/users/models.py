@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager)
+from modules import images
 
 # Create your models here.
 
@@ -33,11 +36,15 @@ class User(AbstractBaseUser):
     institution = models.CharField(max_length=100)
     semester = models.IntegerField()
     profile_photo = models.URLField(max_length=500, null=True, blank=True)
+    # Resized copies of an uploaded photo, format -> srcset (see modules.images)
+    profile_photo_srcset = models.JSONField(default=dict, blank=True, editable=False)
     role = models.ForeignKey(Role, on_delete=models.CASCADE, null=True, blank=True)
     is_active = models.BooleanField()
     is_staff = models.BooleanField()
     date_registered = models.DateTimeField(auto_now_add=True, editable=False)
     date_updated = models.DateTimeField(auto_now_add=True, editable=False)
+    # Set when the user is deactivated until backend.purge deletes them
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = UserManager()
 
@@ -45,8 +52,68 @@ class User(AbstractBaseUser):
 
     REQUIRED_FIELDS = ['email']
 
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix search of the admin user directory (see users.directory)
+            models.Index(Lower('username'), name='user_username_lower'),
+            models.Index(Lower('email'), name='user_email_lower'),
+            models.Index(Lower('full_name'), name='user_full_name_lower'),
+            models.Index(fields=['institution', 'semester'], name='user_institution_semester'),
+            models.Index(fields=['date_registered'], name='user_date_registered'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        if 'full_name' in field_names:
+            # Compared on save: payloads show the names of module authors (see modules.signals)
+            user._loaded_full_name = user.full_name
+        return user
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'profile_photo' in update_fields:
+            self.profile_photo_srcset = images.srcset(self.profile_photo)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'profile_photo_srcset'}
+        super().save(*args, **kwargs)
+
+    def soft_delete(self):
+        """Deactivate the user and hide their modules until backend.purge deletes them"""
+        from backend import payload_cache
+        from modules.models import Module
+
+        now = timezone.now()
+        self.deleted_at = now
+        self.is_active = False
+        self.save(update_fields=['deleted_at', 'is_active'])
+        Module.objects.filter(author=self).update(deleted_at=now)
+        # Updates send no post_save signals
+        payload_cache.invalidate()
+
     def has_perm(self, perm, obj=None):
         return True
 
     def has_module_perms(self, app_label):
         return True
+
+
+class Headline(models.Model):
+    """News item of the landing page ticker, shown between publish_from and publish_until (open ended when null)"""
+    title = models.CharField(max_length=255)
+    # Absolute URL or a path of the frontend, such as /modules
+    url = models.CharField(max_length=500)
+    order = models.PositiveIntegerField(default=0)
+    publish_from = models.DateTimeField(null=True, blank=True)
+    publish_until = models.DateTimeField(null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True, editable=False)
+    date_updated = models.DateTimeField(auto_now=True, editable=False)
+
+    class Meta:
+        ordering = ['order', 'id']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(publish_from=None) | models.Q(publish_until=None) | models.Q(publish_until__gt=models.F('publish_from')),
+                name='headline_publish_window',
+            ),
+        ]
@@ -0,0 +1,179 @@
+"""
+Bulk creation of student and teacher accounts from a roster.
+
+A roster is a CSV file with a header row or a JSON list of objects, with the
+fields of create_user: username, email, password, full_name, institution,
+semester and role (name or id). Every row is validated first and the valid
+ones are created together:
+
+- uniqueness of usernames and emails is checked with one IN query per
+  CHUNK_SIZE rows, and within the roster itself;
+- each distinct password is hashed once (as seed_data does), in a pool of
+  PASSWORD_HASH_WORKERS processes, the slow part at ~0.5s per PBKDF2 hash;
+- users are inserted with bulk_create, CHUNK_SIZE at a time, in one
+  transaction.
+
+Invalid rows are reported with their errors and do not stop the others.
+"""
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from .models import Role, User
+
+CHUNK_SIZE = 5000
+REQUIRED_FIELDS = ('username', 'email', 'full_name', 'institution', 'role')
+FIELDS = (*REQUIRED_FIELDS, 'password', 'semester', 'profile_photo')
+
+
+class RosterError(ValueError):
+    pass
+
+
+def read_roster(file, roster_format):
+    """List of row dicts of a CSV or JSON roster (a binary file)"""
+    if roster_format not in ('csv', 'json'):
+        raise RosterError('The roster format must be csv or json')
+    try:
+        if roster_format == 'csv':
+            return list(csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')))
+        rows = json.load(file)
+    except (UnicodeDecodeError, csv.Error, ValueError) as e:
+        raise RosterError(f'Invalid {roster_format.upper()} roster: {e}')
+    if isinstance(rows, dict):
+        rows = rows.get('users')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise RosterError('A JSON roster must be a list of user objects')
+    return rows
+
+
+def hash_passwords(passwords, workers=None):
+    """{password: hash} for every distinct password, hashed in worker processes when there are several"""
+    passwords = list(set(passwords))
+    workers = settings.PASSWORD_HASH_WORKERS if workers is None else workers
+    # The hasher is sent to the workers, which may not share the settings of this process
+    hasher = get_hasher()
+    if workers <= 1 or len(passwords) < 2:
+        return {password: make_password(password, hasher=hasher) for password in passwords}
+    # Spawned, not forked: forking a threaded server process is unsafe
+    with ProcessPoolExecutor(min(workers, len(passwords)), mp_context=get_context('spawn')) as pool:
+        hashes = pool.map(make_password, passwords, [None] * len(passwords), [hasher] * len(passwords), chunksize=16)
+        return dict(zip(passwords, hashes))
+
+
+def _clean(row, roles, default_password):
+    """(user fields, errors) of one roster row, before the uniqueness checks"""
+    values = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    errors = {field: 'This field is required' for field in REQUIRED_FIELDS if not values[field]}
+
+    if values['email']:
+        values['email'] = User.objects.normalize_email(values['email'])
+        try:
+            validate_email(values['email'])
+        except ValidationError:
+            errors['email'] = 'Enter a valid email address'
+    for field in ('username', 'full_name', 'institution'):
+        if len(values[field]) > User._meta.get_field(field).max_length:
+            errors[field] = 'Too long'
+
+    role = roles.get(values['role'].lower())
+    if values['role'] and role is None:
+        errors['role'] = 'Invalid role'
+    elif role is not None and role.name == 'Admin':
+        errors['role'] = 'Cannot create admin users through this API'
+
+    semester = 0
+    if values['semester']:
+        try:
+            semester = int(values['semester'])
+            if semester < 0:
+                raise ValueError
+        except ValueError:
+            errors['semester'] = 'Semester must be a whole number'
+    elif role is not None and role.name != 'Teacher':
+        errors['semester'] = 'Semester is required for students'
+
+    password = values['password'] or default_password
+    if not password:
+        errors['password'] = 'This field is required'
+
+    return {
+        'username': values['username'],
+        'email': values['email'],
+        'password': password,
+        'full_name': values['full_name'],
+        'institution': values['institution'],
+        'semester': semester,
+        'profile_photo': values['profile_photo'] or None,
+        'role': role,
+    }, errors
+
+
+def provision_users(rows, default_password=None, dry_run=False, workers=None, max_passwords=None):
+    """
+    Create the users of roster rows.
+    Returns {'valid': rows without errors, 'created': users created, 'errors': [{'row', 'username', 'errors'}]},
+    rows numbered from 1. With max_passwords, a roster whose valid rows have
+    more distinct passwords raises RosterError before anything is hashed.
+    """
+    roles = {}
+    for role in Role.objects.all():
+        roles[role.name.lower()] = roles[str(role.id)] = role
+
+    cleaned = []
+    usernames = {}
+    emails = {}
+    for number, row in enumerate(rows, 1):
+        values, row_errors = _clean(row, roles, default_password)
+        # Duplicates within the roster: the first row wins
+        if values['username'] and usernames.setdefault(values['username'], number) != number:
+            row_errors.setdefault('username', f'Same username as row {usernames[values["username"]]}')
+        if values['email'] and emails.setdefault(values['email'], number) != number:
+            row_errors.setdefault('email', f'Same email as row {emails[values["email"]]}')
+        cleaned.append((number, values, row_errors))
+
+    for start in range(0, len(cleaned), CHUNK_SIZE):
+        chunk = cleaned[start:start + CHUNK_SIZE]
+        existing = User.objects.filter(
+            Q(username__in=[values['username'] for _, values, _ in chunk])
+            | Q(email__in=[values['email'] for _, values, _ in chunk])
+        ).values_list('username', 'email')
+        taken_usernames, taken_emails = set(), set()
+        for username, email in existing:
+            taken_usernames.add(username)
+            taken_emails.add(email)
+        for _, values, row_errors in chunk:
+            if values['username'] in taken_usernames:
+                row_errors.setdefault('username', 'Username already exists')
+            if values['email'] in taken_emails:
+                row_errors.setdefault('email', 'Email already exists')
+
+    valid = [values for _, values, row_errors in cleaned if not row_errors]
+    errors = [
+        {'row': number, 'username': values['username'], 'errors': row_errors}
+        for number, values, row_errors in cleaned if row_errors
+    ]
+    passwords = {values['password'] for values in valid}
+    if max_passwords is not None and len(passwords) > max_passwords:
+        raise RosterError(
+            f'The roster has {len(passwords)} distinct passwords, at most {max_passwords} can be hashed in one request. '
+            'Use a default_password, or the provision_users management command for larger rosters.'
+        )
+    if dry_run or not valid:
+        return {'valid': len(valid), 'created': 0, 'errors': errors}
+
+    hashes = hash_passwords(passwords, workers)
+    with transaction.atomic():
+        for start in range(0, len(valid), CHUNK_SIZE):
+            User.objects.bulk_create([
+                User(**{**values, 'password': hashes[values['password']]}, is_active=True, is_staff=False)
+                for values in valid[start:start + CHUNK_SIZE]
+            ], batch_size=CHUNK_SIZE)
+    return {'valid': len(valid), 'created': len(valid), 'errors': errors}
@@ -1,5 +1,5 @@
 from rest_framework.serializers import ModelSerializer, CharField, ValidationError
-from .models import (Role, User)
+from .models import (Headline, Role, User)
 
 
 class RoleSerializer(ModelSerializer):
@@ -11,7 +11,7 @@ class RoleSerializer(ModelSerializer):
 class UserSerializer(ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'password', 'full_name', 'institution', 'semester', 'profile_photo', 'role']
+        fields = ['id', 'username', 'email', 'password', 'full_name', 'institution', 'semester', 'profile_photo', 'profile_photo_srcset', 'role']
         extra_kwargs = {
             'password': {'write_only': True}
         }
@@ -82,4 +82,16 @@ class LoginSerializer(ModelSerializer):
     
     class Meta:
         model = User
-        fields = ['username', 'password']
\ No newline at end of file
+        fields = ['username', 'password']
+
+class HeadlineSerializer(ModelSerializer):
+    class Meta:
+        model = Headline
+        fields = ['id', 'title', 'url', 'order', 'publish_from', 'publish_until']
+
+    def validate(self, attrs):
+        publish_from = attrs.get('publish_from', getattr(self.instance, 'publish_from', None))
+        publish_until = attrs.get('publish_until', getattr(self.instance, 'publish_until', None))
+        if publish_from is not None and publish_until is not None and publish_until <= publish_from:
+            raise ValidationError({'publish_until': 'Must be later than publish_from'})
+        return attrs
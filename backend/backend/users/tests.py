@@ -1,3 +1,213 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.models import Headline, User
+from backend.testing import SeededTestCase
 
-# Create your tests here.
+
+class UserDirectoryTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.get(username='admin')
+
+    def get(self, url, **params):
+        token = RefreshToken.for_user(self.admin).access_token
+        return self.client.get(url, params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def usernames(self, **params):
+        return [user['username'] for user in self.get('/api/admin/users', **params).json()['users']]
+
+    def test_filters_and_prefix_search(self):
+        self.assertEqual(self.usernames(q='DIA'), ['student_diana'])
+        # Username, email and full name prefixes, any case
+        self.assertEqual(self.usernames(q='bob@'), ['student_bob'])
+        self.assertEqual(self.usernames(q='charlie b'), ['student_charlie'])
+        self.assertEqual(self.usernames(role='Student', institution='State University'), ['student_ethan', 'student_diana'])
+        self.assertEqual(self.usernames(role='Student', semester=3), ['student_alice'])
+        User.objects.filter(username='student_bob').update(date_registered=timezone.now() - timezone.timedelta(days=30))
+        day = (timezone.localdate() - timezone.timedelta(days=30)).isoformat()
+        self.assertEqual(self.usernames(registered_from=day, registered_to=day), ['student_bob'])
+        self.assertNotIn('student_bob', self.usernames(registered_from=timezone.localdate().isoformat()))
+        self.assertEqual(self.get('/api/admin/users', semester='x').status_code, 400)
+
+    def test_keyset_pages(self):
+        everyone = self.usernames(limit=500)
+        pages, cursor = [], None
+        while True:
+            data = self.get('/api/admin/users', limit=3, **({'cursor': cursor} if cursor else {})).json()
+            pages.extend(user['username'] for user in data['users'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(pages, everyone)
+        self.assertEqual(len(everyone), User.objects.count())
+
+    def test_streaming_export(self):
+        response = self.get('/api/admin/users/export', role='Student', institution='State University')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'username', 'email'])
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['student_ethan', 'student_diana'])
+
+        response = self.get('/api/admin/users/export', format='ndjson', q='alice')
+        users = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(user['username'], user['role'], user['semester']) for user in users], [('student_alice', 'Student', 3)])
+        self.assertNotIn('password', users[0])
+        self.assertEqual(self.get('/api/admin/users/export', format='xml').status_code, 400)
+
+    def test_csv_export_quotes_formulas(self):
+        User.objects.filter(username='student_alice').update(full_name='=HYPERLINK("http://evil")', institution='@SUM(A1)')
+        response = self.get('/api/admin/users/export', q='alice')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[1][3:5], ['\'=HYPERLINK("http://evil")', "'@SUM(A1)"])
+
+        # Only the CSV is meant for spreadsheets
+        response = self.get('/api/admin/users/export', format='ndjson', q='alice')
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['full_name'], '=HYPERLINK("http://evil")')
+
+
+@override_settings(PASSWORD_HASH_WORKERS=0)
+class ProvisioningTests(SeededTestCase):
+    ROSTER = (
+        'username,email,password,full_name,institution,semester,role\n'
+        'cohort_1,cohort1@student.edu,rahasia123,Siti Aminah,State University,1,Student\n'
+        'cohort_2,cohort2@student.edu,,Budi Santoso,State University,1,student\n'
+        'cohort_3,alice@student.edu,,Duplicate Email,State University,1,Student\n'
+        'cohort_1,cohort4@student.edu,,Same Username,State University,1,Student\n'
+        'cohort_5,not-an-email,,,State University,,Student\n'
+        'cohort_6,cohort6@staff.edu,,Dosen Baru,State University,,Teacher\n'
+        'cohort_7,cohort7@staff.edu,,Admin Baru,State University,,Admin\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.token = RefreshToken.for_user(User.objects.get(username='admin')).access_token
+
+    def post(self, data, **kwargs):
+        return self.client.post('/api/admin/users/provision', data, HTTP_AUTHORIZATION=f'Bearer {self.token}', **kwargs)
+
+    def test_csv_roster_with_row_errors(self):
+        roster = SimpleUploadedFile('cohort.csv', self.ROSTER.encode(), content_type='text/csv')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post({'roster': roster, 'default_password': 'awal12345'})
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['success']), (3, False))
+        self.assertEqual({error['row']: set(error['errors']) for error in data['errors']}, {
+            3: {'email'}, 4: {'username'}, 5: {'email', 'full_name', 'semester'}, 7: {'role', 'semester'}
+        })
+        # Roles, one uniqueness check and the inserts
+        self.assertEqual(len([q for q in queries if 'users_user' in q['sql'] and q['sql'].startswith('SELECT')]), 2)
+
+        created = {user.username: user for user in User.objects.filter(username__startswith='cohort_')}
+        self.assertEqual(sorted(created), ['cohort_1', 'cohort_2', 'cohort_6'])
+        self.assertTrue(created['cohort_1'].check_password('rahasia123'))
+        self.assertTrue(created['cohort_2'].check_password('awal12345'))
+        self.assertEqual((created['cohort_6'].role.name, created['cohort_6'].semester), ('Teacher', 0))
+        self.assertTrue(created['cohort_2'].is_active)
+
+    def test_json_body_and_dry_run(self):
+        users = [{'username': 'json_1', 'email': 'json1@student.edu', 'password': 'x' * 8, 'full_name': 'Json', 'institution': 'U', 'semester': 2, 'role': 'Student'}]
+        response = self.post({'users': users, 'dry_run': True}, content_type='application/json')
+        self.assertEqual(response.json(), {'success': True, 'valid': 1, 'created': 0, 'errors': []})
+        self.assertFalse(User.objects.filter(username='json_1').exists())
+        self.assertEqual(self.post({'users': users}, content_type='application/json').status_code, 201)
+        self.assertEqual(self.post({'users': 'x'}, content_type='application/json').status_code, 400)
+
+    @override_settings(PROVISION_MAX_PASSWORDS=1)
+    def test_distinct_passwords_are_capped(self):
+        users = [
+            {'username': f'cap_{n}', 'email': f'cap{n}@student.edu', 'password': f'sandi{n}', 'full_name': 'Cap',
+             'institution': 'U', 'semester': 1, 'role': 'Student'}
+            for n in range(2)
+        ]
+        response = self.post({'users': users}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('provision_users', response.json()['message'])
+        self.assertFalse(User.objects.filter(username__startswith='cap_').exists())
+
+        for user in users:
+            del user['password']
+        response = self.post({'users': users, 'default_password': 'awal12345'}, content_type='application/json')
+        self.assertEqual(response.json()['created'], 2)
+
+    def test_command_hashes_in_worker_processes(self):
+        path = os.path.join(tempfile.mkdtemp(), 'cohort.json')
+        with open(path, 'w') as roster:
+            json.dump([
+                {'username': f'pool_{n}', 'email': f'pool{n}@student.edu', 'password': f'sandi{n}', 'full_name': 'Pool',
+                 'institution': 'U', 'semester': 1, 'role': 'Student'}
+                for n in range(3)
+            ], roster)
+        output = StringIO()
+        call_command('provision_users', path, workers=2, stdout=output)
+        self.assertIn('Created 3 users', output.getvalue())
+        self.assertTrue(User.objects.get(username='pool_2').check_password('sandi2'))
+
+
+class HeadlineTests(SeededTestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = RefreshToken.for_user(User.objects.get(username='admin')).access_token
+
+    def admin(self, method, url, data=None):
+        return getattr(self.client, method)(url, data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def published(self):
+        return [headline['title'] for headline in self.client.get('/api/headlines').json()['headlines']]
+
+    def test_reads_are_served_from_the_process_copy_until_a_change(self):
+        self.assertEqual(self.published(), [
+            'Welcome to Taneyan Lanjeng Learning Platform', 'New Python Programming Module Available', 'Upcoming Maintenance on Saturday',
+        ])
+        # Only the stamp of the headlines is read
+        with self.assertNumQueries(1):
+            etag = self.client.get('/api/headlines', HTTP_AUTHORIZATION=f'Bearer {self.token}')['ETag']
+        self.assertEqual(self.client.get('/api/headlines', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.admin('post', '/api/admin/headlines/create', {'title': 'Exams start Monday', 'url': '/modules'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['headline']['order'], 4)
+        self.assertEqual(self.published()[-1], 'Exams start Monday')
+
+        first = Headline.objects.first()
+        self.admin('put', f'/api/admin/headlines/{first.id}/update', {'title': 'Welcome', 'url': '/', 'order': 9})
+        self.assertEqual(self.published()[-1], 'Welcome')
+        self.admin('delete', f'/api/admin/headlines/{first.id}/delete')
+        self.assertNotIn('Welcome', self.published())
+        self.assertEqual(self.client.get('/api/headlines', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_publish_windows_apply_without_a_change(self):
+        now = timezone.now()
+        Headline.objects.all().delete()
+        Headline.objects.create(title='Expired', url='/', publish_until=now)
+        Headline.objects.create(title='Current', url='/', publish_until=now + timezone.timedelta(hours=1))
+        Headline.objects.create(title='Scheduled', url='/', publish_from=now + timezone.timedelta(minutes=30))
+
+        self.assertEqual(self.published(), ['Current'])
+        with mock.patch('users.headlines.timezone.now', return_value=now + timezone.timedelta(minutes=45)):
+            self.assertEqual(self.published(), ['Current', 'Scheduled'])
+        with mock.patch('users.headlines.timezone.now', return_value=now + timezone.timedelta(hours=2)):
+            self.assertEqual(self.published(), ['Scheduled'])
+
+    def test_invalid_headlines_are_rejected(self):
+        response = self.admin('post', '/api/admin/headlines/create', {'title': 'No URL'})
+        self.assertEqual(response.status_code, 400)
+        response = self.admin('post', '/api/admin/headlines/create', {
+            'title': 'Backwards', 'url': '/', 'publish_from': '2026-02-01T00:00:00Z', 'publish_until': '2026-01-01T00:00:00Z',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('publish_until', response.json()['errors'])
+        self.assertEqual(self.admin('put', '/api/admin/headlines/999999/update', {'title': 'x', 'url': '/'}).status_code, 404)
+        self.assertEqual(self.admin('delete', '/api/admin/headlines/999999/delete').status_code, 404)
+        self.assertEqual(Headline.objects.count(), 3)
@@ -6,7 +6,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.settings import api_settings
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.status import (
     HTTP_401_UNAUTHORIZED,
     HTTP_400_BAD_REQUEST,
@@ -14,6 +15,8 @@ from rest_framework.status import (
     HTTP_200_OK
 )
 from datetime import timedelta
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from .models import (
     Role,
     User
@@ -24,6 +27,8 @@ from .serializers import (
     RegisterSerializer,
     LoginSerializer
 )
+from backend import metrics
+from . import headlines
 
 # Create your views here.
 
@@ -37,7 +42,7 @@ class RoleView(ModelViewSet):
 class UserView(ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    authentication_classes = [IsAdminUser]
+    permission_classes = [IsAdminUser]
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -57,6 +62,7 @@ class LoginView(APIView):
         user = authenticate(username=username, password=password)
 
         if user is not None:
+            metrics.login_attempts_total.inc(result='success')
             refresh = RefreshToken.for_user(user)
             
             # Serialize user data
@@ -80,6 +86,7 @@ class LoginView(APIView):
 
             return response
         
+        metrics.login_attempts_total.inc(result='failure')
         return Response(
             {"message": "Nama pengguna atau kata sandi salah"},
             status=HTTP_401_UNAUTHORIZED
@@ -213,3 +220,21 @@ def change_password(request):
         status=HTTP_200_OK
     )
 
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def published_headlines(request):
+    """
+    Headlines of the landing page, without a query in the common case (see users.headlines).
+    Anonymous, so a token does not cost a user lookup either.
+    """
+    body, etag = headlines.get()
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=api_settings.DEFAULT_RENDERER_CLASSES[0].media_type)
+    response['ETag'] = etag
+    # Revalidated on every load: a changed headline shows at once
+    response['Cache-Control'] = 'no-cache'
+    return response
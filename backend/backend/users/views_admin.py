@@ -2,11 +2,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
-from .models import User, Role
+from django.db.models import Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from .directory import DirectoryError, export_csv, export_ndjson, filter_users, page
+from .models import Headline, User, Role
+from .provisioning import RosterError, read_roster
+from . import provisioning
 from modules.models import Module, Lesson
-from .serializers import UserSerializer
+from .serializers import HeadlineSerializer, UserSerializer
 from modules.serializers import ModuleSerializer
+from backend import metrics, purge
 
 
 @api_view(['GET'])
@@ -15,9 +23,11 @@ def admin_dashboard_stats(request):
     """
     Get admin dashboard statistics
     """
-    total_users = User.objects.count()
-    total_teachers = User.objects.filter(role__name='Teacher').count()
-    total_students = User.objects.filter(role__name='Student').count()
+    # Users being purged are gone already for the admin
+    users = User.objects.filter(deleted_at=None)
+    total_users = users.count()
+    total_teachers = users.filter(role__name='Teacher').count()
+    total_students = users.filter(role__name='Student').count()
     total_modules = Module.objects.count()
     
     return Response({
@@ -31,20 +41,67 @@ def admin_dashboard_stats(request):
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def admin_metrics(request):
+    """
+    Get API and database metrics in the Prometheus text format
+    """
+    return HttpResponse(metrics.generate_latest(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def get_all_users(request):
     """
-    Get all users for admin management
+    Get users for admin management, newest first, one page at a time.
+    Filters and paging parameters are described in users/directory.py.
     """
-    users = User.objects.all().select_related('role')
+    try:
+        users, next_cursor = page(filter_users(request.query_params).select_related('role'), request.query_params)
+    except DirectoryError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     serializer = UserSerializer(users, many=True)
     return Response({
         'success': True,
+        'count': len(users),
+        'next_cursor': next_cursor,
         'users': serializer.data
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def export_users(request):
+    """
+    Download every user matching the directory filters as CSV, or NDJSON with ?format=ndjson.
+    Streamed while it is read from the database.
+    """
+    export_format = request.query_params.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return Response({
+            'success': False,
+            'error': 'format must be csv or ndjson'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        users = filter_users(request.query_params)
+    except DirectoryError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(export_csv(users), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(export_ndjson(users), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="users-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def create_user(request):
@@ -117,6 +174,44 @@ def create_user(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def provision_users(request):
+    """
+    Create many teachers and students at once from a roster: a CSV or JSON file
+    (field "roster") or a JSON body {"users": [...]}. Optional "default_password"
+    for rows without one and "dry_run" to only validate. Valid rows are created,
+    invalid ones returned with their errors. Passwords are hashed in the request,
+    so at most PROVISION_MAX_PASSWORDS distinct ones are accepted: larger rosters
+    go through the provision_users command.
+    """
+    try:
+        if 'roster' in request.FILES:
+            roster = request.FILES['roster']
+            roster_format = request.data.get('format') or roster.name.rsplit('.', 1)[-1].lower()
+            rows = read_roster(roster, roster_format)
+        elif isinstance(request.data.get('users'), list):
+            rows = request.data['users']
+        else:
+            raise RosterError('No roster provided')
+        result = provisioning.provision_users(
+            rows,
+            default_password=request.data.get('default_password') or None,
+            dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true'),
+            max_passwords=settings.PROVISION_MAX_PASSWORDS
+        )
+    except RosterError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': not result['errors'],
+        **result
+    }, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def update_user(request, user_id):
@@ -201,10 +296,11 @@ def update_user(request, user_id):
 @permission_classes([IsAuthenticated, IsAdminUser])
 def delete_user(request, user_id):
     """
-    Delete a user
+    Delete a user with their modules, activities and exam history.
+    Users with much data are deactivated at once and purged in the background (202).
     """
     try:
-        user = User.objects.get(id=user_id)
+        user = User.objects.select_related('role').get(id=user_id, deleted_at=None)
         
         # Prevent admin from deleting other admins
         if user.role.name == 'Admin':
@@ -213,12 +309,15 @@ def delete_user(request, user_id):
                 'message': 'Cannot delete admin users'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        user.delete()
-        
+        if purge.delete(user):
+            return Response({
+                'success': True,
+                'message': 'User deleted successfully'
+            }, status=status.HTTP_200_OK)
         return Response({
             'success': True,
-            'message': 'User deleted successfully'
-        }, status=status.HTTP_200_OK)
+            'message': 'User deactivated, their data is being deleted'
+        }, status=status.HTTP_202_ACCEPTED)
         
     except User.DoesNotExist:
         return Response({
@@ -275,7 +374,7 @@ def get_all_modules(request):
     """
     Get all modules for admin management
     """
-    modules = Module.objects.all().select_related('author')
+    modules = Module.objects.with_lesson_counts().select_related('author').order_by('-date_created')
     serializer = ModuleSerializer(modules, many=True)
     return Response({
         'success': True,
@@ -287,16 +386,20 @@ def get_all_modules(request):
 @permission_classes([IsAuthenticated, IsAdminUser])
 def delete_module(request, module_id):
     """
-    Delete a module
+    Delete a module with its lessons and the students' progress in it.
+    Modules with much data are hidden at once and purged in the background (202).
     """
     try:
         module = Module.objects.get(id=module_id)
-        module.delete()
-        
+        if purge.delete(module):
+            return Response({
+                'success': True,
+                'message': 'Module deleted successfully'
+            }, status=status.HTTP_200_OK)
         return Response({
             'success': True,
-            'message': 'Module deleted successfully'
-        }, status=status.HTTP_200_OK)
+            'message': 'Module hidden, its data is being deleted'
+        }, status=status.HTTP_202_ACCEPTED)
         
     except Module.DoesNotExist:
         return Response({
@@ -310,52 +413,55 @@ def delete_module(request, module_id):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-# In-memory storage for headlines (in a real application, this would be in a database)
-HEADLINES = [
-    {"id": 1, "title": "Welcome to Taneyan Lanjeng Learning Platform", "url": "/"},
-    {"id": 2, "title": "New Python Programming Module Available", "url": "/modules"},
-    {"id": 3, "title": "Upcoming Maintenance on Saturday", "url": "/"},
-]
-
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def get_headlines(request):
     """
-    Get all headlines for admin management
+    Get all headlines for admin management, scheduled and expired ones included
     """
     return Response({
         'success': True,
-        'headlines': HEADLINES
+        'headlines': HeadlineSerializer(Headline.objects.all(), many=True).data
     }, status=status.HTTP_200_OK)
 
 
+def _save_headline(request, headline=None):
+    """Validate the headline of request.data and save it, returns (headline, error response)"""
+    if not request.data.get('title') or not request.data.get('url'):
+        return None, Response({
+            'success': False,
+            'message': 'Title and URL are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = HeadlineSerializer(headline, data=request.data)
+    if not serializer.is_valid():
+        return None, Response({
+            'success': False,
+            'message': 'Invalid headline',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if headline is None and 'order' not in request.data:
+        # New headlines go last
+        last = Headline.objects.aggregate(last=Max('order'))['last']
+        return serializer.save(order=0 if last is None else last + 1), None
+    return serializer.save(), None
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def create_headline(request):
     """
     Create a new headline
     """
-    title = request.data.get('title')
-    url = request.data.get('url')
-    
-    if not title or not url:
-        return Response({
-            'success': False,
-            'message': 'Title and URL are required'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Generate new ID
-    new_id = max([h['id'] for h in HEADLINES]) + 1 if HEADLINES else 1
-    
-    # Add new headline
-    new_headline = {"id": new_id, "title": title, "url": url}
-    HEADLINES.append(new_headline)
-    
+    headline, error = _save_headline(request)
+    if error:
+        return error
+
     return Response({
         'success': True,
         'message': 'Headline created successfully',
-        'headline': new_headline
+        'headline': HeadlineSerializer(headline).data
     }, status=status.HTTP_201_CREATED)
 
 
@@ -365,35 +471,22 @@ def update_headline(request, headline_id):
     """
     Update a headline
     """
-    title = request.data.get('title')
-    url = request.data.get('url')
-    
-    if not title or not url:
-        return Response({
-            'success': False,
-            'message': 'Title and URL are required'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Find headline
-    headline_index = None
-    for i, headline in enumerate(HEADLINES):
-        if headline['id'] == headline_id:
-            headline_index = i
-            break
-    
-    if headline_index is None:
+    try:
+        headline = Headline.objects.get(id=headline_id)
+    except Headline.DoesNotExist:
         return Response({
             'success': False,
             'message': 'Headline not found'
         }, status=status.HTTP_404_NOT_FOUND)
-    
-    # Update headline
-    HEADLINES[headline_index] = {"id": headline_id, "title": title, "url": url}
-    
+
+    headline, error = _save_headline(request, headline)
+    if error:
+        return error
+
     return Response({
         'success': True,
         'message': 'Headline updated successfully',
-        'headline': HEADLINES[headline_index]
+        'headline': HeadlineSerializer(headline).data
     }, status=status.HTTP_200_OK)
 
 
@@ -403,25 +496,14 @@ def delete_headline(request, headline_id):
     """
     Delete a headline
     """
-    global HEADLINES
-    
-    # Find headline
-    headline_index = None
-    for i, headline in enumerate(HEADLINES):
-        if headline['id'] == headline_id:
-            headline_index = i
-            break
-    
-    if headline_index is None:
+    deleted, _ = Headline.objects.filter(id=headline_id).delete()
+    if not deleted:
         return Response({
             'success': False,
             'message': 'Headline not found'
         }, status=status.HTTP_404_NOT_FOUND)
-    
-    # Remove headline
-    HEADLINES.pop(headline_index)
-    
+
     return Response({
         'success': True,
         'message': 'Headline deleted successfully'
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
@@ -1,5 +1,6 @@
 import React, { useState } from 'react'
 import Button from './atoms/Button'
+import { authFetch } from '../utils/auth'
 
 // Use environment variable for API base URL
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api';
@@ -29,12 +30,8 @@ export default function ImageUploadModal({ isOpen, onClose, onImageSelected }: I
       const formData = new FormData()
       formData.append('image', file)
 
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`${API_BASE_URL}/upload/image`, {
+      const response = await authFetch(`${API_BASE_URL}/upload/image`, {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
         body: formData
       })
 
@@ -4,7 +4,7 @@ import DashboardCard from "../components/atoms/DashboardCard";
 import Headline from "../components/atoms/Headline";
 import RootLayout from "../layouts/RootLayout";
 import { useNavigate } from "react-router-dom";
-import { getUser } from "../utils/auth";
+import { authFetch, getUser } from "../utils/auth";
 
 // Use environment variable for API base URL
 
@@ -85,20 +85,24 @@ export default function Home() {
   const isStudent = rolesLoaded && roles.Student && user?.role === roles.Student;
   const isAdmin = rolesLoaded && roles.Admin && user?.role === roles.Admin;
   
-  const data = [
-    {
-      title: "Ini hanya berita",
-      url: "/",
-    },
-    {
-      title: "Ini hanya berita",
-      url: "/home",
-    },
-    {
-      title: "Ini hanya berita",
-      url: "/",
-    },
-  ];
+  const [headlines, setHeadlines] = useState<{ title: string; url: string }[]>([]);
+
+  // Fetch the published headlines, public and cheap to read on every load
+  useEffect(() => {
+    async function fetchHeadlines() {
+      try {
+        const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/headlines`);
+        if (response.ok) {
+          const headlinesData = await response.json();
+          setHeadlines(headlinesData.headlines);
+        }
+      } catch (error) {
+        console.error('Error fetching headlines:', error);
+      }
+    }
+
+    fetchHeadlines();
+  }, []);
 
   // Navigate to admin dashboard if user is admin
   useEffect(() => {
@@ -121,13 +125,8 @@ export default function Home() {
 
       try {
         setIsLoading(true);
-        const token = localStorage.getItem('access_token');
         const endpoint = isTeacher ? 'teacher/stats' : 'student/stats';
-        const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/${endpoint}`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        });
+        const response = await authFetch(`${import.meta.env.VITE_API_BASE_URL}/${endpoint}`);
         
         if (response.ok) {
           const data = await response.json();
@@ -193,7 +192,7 @@ export default function Home() {
   if (isTeacher) {
     return (
       <RootLayout>
-        <Headline news={data} />
+        {headlines.length > 0 && <Headline news={headlines} />}
         
         {/* Teacher Dashboard Cards */}
         <div className="flex w-full gap-6 mt-12">
@@ -303,7 +302,7 @@ export default function Home() {
   // Render Student Dashboard (default)
   return (
     <RootLayout>
-      <Headline news={data} />
+      {headlines.length > 0 && <Headline news={headlines} />}
       
       {/* Student Dashboard Cards */}
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6 mt-12">
@@ -4,7 +4,7 @@ import Breadcrumps from "../../components/atoms/Breadcrumps"
 import { Link } from "react-router-dom"
 import RootLayout from "../../layouts/RootLayout"
 import { fetchModulesOverview } from "../../utils/api"
-import { getUser } from "../../utils/auth"
+import { authFetch, getUser } from "../../utils/auth"
 import type { Module } from "../../types/modules"
 
 // Use environment variable for API base URL
@@ -105,12 +105,8 @@ export default function Modules() {
     }
 
     try {
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`${API_BASE_URL}/modules/${moduleId}/`, {
-        method: 'DELETE',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
+      const response = await authFetch(`${API_BASE_URL}/modules/${moduleId}/`, {
+        method: 'DELETE'
       })
 
       if (response.ok) {
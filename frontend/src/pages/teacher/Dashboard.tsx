@@ -4,6 +4,7 @@ import { Icon } from '@iconify/react'
 import RootLayout from '../../layouts/RootLayout'
 import DashboardCard from '../../components/atoms/DashboardCard'
 import Button from '../../components/atoms/Button'
+import { authFetch } from '../../utils/auth'
 
 interface TeacherStats {
   total_modules: number
@@ -32,12 +33,7 @@ export default function TeacherDashboard() {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        const token = localStorage.getItem('access_token')
-        const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/teacher/stats)`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        })
+        const response = await authFetch(`${import.meta.env.VITE_API_BASE_URL}/teacher/stats)`)
 
         if (response.ok) {
           const data = await response.json()
@@ -11,6 +11,7 @@ import Input from '../../components/atoms/Input'
 import Select from '../../components/atoms/Select'
 import ImageUploadModal from '../../components/ImageUploadModal'
 import ExamQuestionEditor from '../../components/ExamQuestionEditor'
+import { authFetch } from '../../utils/auth'
 
 // Use environment variable for API base URL
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api'
@@ -60,13 +61,8 @@ export default function LessonEditor() {
   useEffect(() => {
     const fetchModules = async () => {
       try {
-        const token = localStorage.getItem('access_token')
         // Use the teacher-specific endpoint to get teacher's modules with lessons
-        const response = await fetch(`${API_BASE_URL}/modules/teacher`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        })
+        const response = await authFetch(`${API_BASE_URL}/modules/teacher`)
         if (response.ok) {
           const data = await response.json()
           setModules(data.modules)
@@ -120,12 +116,7 @@ export default function LessonEditor() {
     if (lesson_id) {
       const fetchLesson = async () => {
         try {
-          const token = localStorage.getItem('access_token')
-          const response = await fetch(`${API_BASE_URL}/lessons/${lesson_id}/`, {
-            headers: {
-              'Authorization': `Bearer ${token}`
-            }
-          })
+          const response = await authFetch(`${API_BASE_URL}/lessons/${lesson_id}/`)
           if (response.ok) {
             const data = await response.json()
             setFormData({
@@ -153,17 +144,15 @@ export default function LessonEditor() {
   const handleSave = async () => {
     setIsSaving(true)
     try {
-      const token = localStorage.getItem('access_token')
       const url = lesson_id 
         ? `${API_BASE_URL}/lessons/${lesson_id}/`
         : `${API_BASE_URL}/lessons/`
       
       const method = lesson_id ? 'PUT' : 'POST'
       
-      const response = await fetch(url, {
+      const response = await authFetch(url, {
         method,
         headers: {
-          'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
         },
         body: JSON.stringify(formData)
@@ -2,6 +2,7 @@ import { Icon } from "@iconify/react"
 import { useState, useEffect } from "react"
 import { Link, useParams } from "react-router-dom"
 import DetailLayout from "../../layouts/DetailLayout"
+import { authFetch } from "../../utils/auth"
 
 // Use environment variable for API base URL
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api'
@@ -9,7 +10,6 @@ const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000
 interface Lesson {
   id: number
   title: string
-  content: string
   lesson_type: 'lesson' | 'exam'
   order: number
   duration_minutes: number
@@ -48,13 +48,8 @@ export default function TeacherModuleDetail() {
       try {
         setIsLoading(true)
         setError(null)
-        const token = localStorage.getItem('access_token')
         
-        const response = await fetch(`${API_BASE_URL}/modules/${module_id}/detail`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        })
+        const response = await authFetch(`${API_BASE_URL}/modules/${module_id}/detail`)
 
         if (response.ok) {
           const data = await response.json()
@@ -80,12 +75,8 @@ export default function TeacherModuleDetail() {
     }
 
     try {
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`${API_BASE_URL}/lessons/${lessonId}/`, {
-        method: 'DELETE',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
+      const response = await authFetch(`${API_BASE_URL}/lessons/${lessonId}/`, {
+        method: 'DELETE'
       })
 
       if (response.ok) {
@@ -4,7 +4,7 @@ import { Icon } from '@iconify/react'
 import RootLayout from '../../layouts/RootLayout'
 import Button from '../../components/atoms/Button'
 import Input from '../../components/atoms/Input'
-import { getUser } from '../../utils/auth'
+import { authFetch, getUser } from '../../utils/auth'
 import ImageUploadModal from '../../components/ImageUploadModal'
 
 // Use environment variable for API base URL
@@ -49,12 +49,7 @@ export default function ModuleEditor() {
     if (module_id) {
       const fetchModule = async () => {
         try {
-          const token = localStorage.getItem('access_token')
-          const response = await fetch(`${API_BASE_URL}/modules/${module_id}/`, {
-            headers: {
-              'Authorization': `Bearer ${token}`
-            }
-          })
+          const response = await authFetch(`${API_BASE_URL}/modules/${module_id}/`)
           if (response.ok) {
             const data = await response.json()
             // Convert deadline to date format
@@ -90,8 +85,6 @@ export default function ModuleEditor() {
 
     setIsSaving(true)
     try {
-      const token = localStorage.getItem('access_token')
-      
       // Prepare payload
       const payload = {
         title: formData.title,
@@ -108,10 +101,9 @@ export default function ModuleEditor() {
       
       const method = module_id ? 'PUT' : 'POST'
       
-      const response = await fetch(url, {
+      const response = await authFetch(url, {
         method,
         headers: {
-          'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
         },
         body: JSON.stringify(payload)
@@ -2,7 +2,7 @@ import { Icon } from "@iconify/react"
 import { useState, useEffect } from "react"
 import { Link } from "react-router-dom"
 import DetailLayout from "../../layouts/DetailLayout"
-import { getUser } from "../../utils/auth"
+import { authFetch, getUser } from "../../utils/auth"
 
 interface Module {
   id: number
@@ -32,14 +32,9 @@ export default function TeacherModules() {
       try {
         setIsLoading(true)
         setError(null)
-        const token = localStorage.getItem('access_token')
         
         // Use modules overview endpoint which includes lessons_count
-        const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/modules/overview`, {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        })
+        const response = await authFetch(`${import.meta.env.VITE_API_BASE_URL}/modules/overview`)
 
         if (response.ok) {
           const data = await response.json()
@@ -81,12 +76,8 @@ export default function TeacherModules() {
     }
 
     try {
-      const token = localStorage.getItem('access_token')
-      const response = await fetch(`http://localhost:8000/api/modules/${moduleId}/`, {
-        method: 'DELETE',
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
+      const response = await authFetch(`http://localhost:8000/api/modules/${moduleId}/`, {
+        method: 'DELETE'
       })
 
       if (response.ok) {
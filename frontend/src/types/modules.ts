@@ -13,6 +13,9 @@ export interface Lesson {
   date_updated: string;
 }
 
+// Lessons in lists are sent without their content
+export type LessonSummary = Omit<Lesson, 'content'>;
+
 export interface Module {
   id: number;
   title: string;
@@ -24,7 +27,7 @@ export interface Module {
   is_published: boolean;
   date_created: string;
   date_updated: string;
-  lessons?: Lesson[]; // Add lessons array
+  lessons?: LessonSummary[]; // Add lessons array
   lessons_count?: number;
   has_exam?: boolean;
   exam_count?: number;
@@ -55,5 +58,5 @@ export interface LessonDetailResponse {
     prev: { id: number; title: string } | null;
     next: { id: number; title: string } | null;
   };
-  all_lessons: Lesson[];
+  all_lessons: LessonSummary[];
 }
\ No newline at end of file
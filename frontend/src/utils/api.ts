@@ -9,6 +9,7 @@ import type { ModulesOverviewResponse, ModuleDetailResponse } from '../types/mod
  * @returns Promise with modules overview data
  */
 export async function fetchModulesOverview(): Promise<ModulesOverviewResponse> {
+  // Public catalogue: a guest with a stale token must not be sent to the login page
   const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/modules/overview`);
   
   if (!response.ok) {
@@ -92,13 +92,31 @@ export const refreshAccessToken = async (): Promise<string | null> => {
   return null;
 };
 
+// After a write the API returns the time (in seconds) until which this client
+// should read from the primary database; it is sent back so reads see the write
+const PIN_HEADER = 'X-DB-Pin-Until';
+
+const getPinHeader = (): Record<string, string> => {
+  const pinUntil = sessionStorage.getItem(PIN_HEADER);
+  return pinUntil && Number(pinUntil) * 1000 > Date.now() ? { [PIN_HEADER]: pinUntil } : {};
+};
+
+const rememberPin = (response: Response): void => {
+  const pinUntil = response.headers.get(PIN_HEADER);
+  if (pinUntil) {
+    sessionStorage.setItem(PIN_HEADER, pinUntil);
+  }
+};
+
 // Create fetch with JWT authentication
 export const authFetch = async (url: string, options: RequestInit = {}): Promise<Response> => {
   const token = getAccessToken();
   
   const headers = {
-    'Content-Type': 'application/json',
+    // The browser sets the multipart Content-Type of FormData bodies itself
+    ...(!(options.body instanceof FormData) && { 'Content-Type': 'application/json' }),
     ...(token && { 'Authorization': `Bearer ${token}` }),
+    ...getPinHeader(),
     ...options.headers,
   };
 
@@ -107,6 +125,7 @@ export const authFetch = async (url: string, options: RequestInit = {}): Promise
     headers,
     credentials: 'include',
   });
+  rememberPin(response);
 
   // If token is expired, try to refresh
   if (response.status === 401) {
@@ -123,6 +142,7 @@ export const authFetch = async (url: string, options: RequestInit = {}): Promise
         headers: retryHeaders,
         credentials: 'include',
       });
+      rememberPin(response);
       
       // If retry still fails, logout and redirect
       if (response.status === 401) {